@@ -2,6 +2,12 @@
 import pandas as pd
 from sqlalchemy import create_engine
 import matplotlib.pyplot as plt
+import os
+import sys
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_engine import signal_transitions, simulate_all_in_portfolio
 
 # --- DataFeeder Logic ---
 class DataFeeder:
@@ -39,8 +45,10 @@ class TradingBot:
 
 # --- Backtester Logic ---
 class Backtester:
-    def __init__(self, initial_capital=10000.0):
+    def __init__(self, initial_capital=10000.0, fee_rate=0.0, slippage=0.0):
         self.initial_capital = initial_capital
+        self.fee_rate = fee_rate # Fraction of the traded value paid per fill
+        self.slippage = slippage # Fraction of the price lost per fill
 
     def run(self, signals):
         portfolio = pd.DataFrame(index=signals.index)
@@ -49,43 +57,20 @@ class Backtester:
         
         # When signal is 1, we are "in", when 0, we are "out"
         # This is a simplified cash-based backtest.
-        positions = portfolio['signal'].diff().fillna(0)
-        
-        portfolio['cash'] = self.initial_capital - (positions * portfolio['price']).cumsum()
         portfolio['holdings_value'] = portfolio['signal'] * portfolio['price'] # Value of BTC if we hold it
         
-        # This part is tricky. Let's simplify the portfolio value calculation.
-        # We start with cash. When we buy, cash decreases. When we sell, cash increases.
-        # The 'total' value is our cash plus the value of any holdings.
-        
-        # Let's try a clearer portfolio simulation
-        portfolio['total'] = self.initial_capital
-        
-        # Create a 'holdings' column representing the number of units (e.g., BTC)
-        portfolio['holdings'] = 0.0
-        
-        # Initial state
-        portfolio.loc[portfolio.index[0], 'cash'] = self.initial_capital
-        
-        for i in range(1, len(portfolio)):
-            prev_signal = portfolio['signal'].iloc[i-1]
-            current_signal = portfolio['signal'].iloc[i]
-            price = portfolio['price'].iloc[i]
-            
-            portfolio['cash'].iloc[i] = portfolio['cash'].iloc[i-1]
-            portfolio['holdings'].iloc[i] = portfolio['holdings'].iloc[i-1]
-
-            # Going "in"
-            if current_signal == 1.0 and prev_signal == 0.0:
-                portfolio['holdings'].iloc[i] = portfolio['cash'].iloc[i-1] / price
-                portfolio['cash'].iloc[i] = 0.0
-
-            # Going "out"
-            elif current_signal == 0.0 and prev_signal == 1.0:
-                portfolio['cash'].iloc[i] = portfolio['holdings'].iloc[i-1] * price
-                portfolio['holdings'].iloc[i] = 0.0
+        # We start with cash. When we buy, all cash goes into holdings (e.g. BTC units).
+        # When we sell, all holdings go back to cash. The 'total' value is our cash plus
+        # the value of any holdings.
+        entry_bars, exit_bars = signal_transitions(portfolio['signal'])
+        result = simulate_all_in_portfolio(
+            portfolio['price'].to_numpy(), entry_bars, exit_bars,
+            initial_capital=self.initial_capital, fee_rate=self.fee_rate, slippage=self.slippage
+        )
 
-        portfolio['total'] = portfolio['cash'] + (portfolio['holdings'] * portfolio['price'])
+        portfolio['cash'] = result['cash']
+        portfolio['holdings'] = result['holdings']
+        portfolio['total'] = result['total']
         
         return portfolio
 
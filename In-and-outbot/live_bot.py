@@ -3,11 +3,16 @@ import json
 import os
 import time
 import logging
+import sys
 import pandas as pd
 from dotenv import load_dotenv
 import requests
 from datetime import datetime, timezone
 
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_data_client import MarketDataClient
+
 # --- Setup ---
 load_dotenv()
 logging.basicConfig(
@@ -88,6 +93,26 @@ def initialize_exchange():
         logger.error(f"Failed to connect to BitMEX: {e}")
         return None
 
+def connect_market_data(symbol, timeframe, history):
+    """
+    Subscribes to closed candles from market_data_daemon.py when MARKET_DATA_ADDRESS
+    is set in the .env file; returns None to poll REST instead.
+    """
+    address = os.getenv('MARKET_DATA_ADDRESS')
+    if not address:
+        return None
+    feed = MarketDataClient(address)
+    feed.subscribe('bitmex', symbol, timeframe, history=history, sandbox=True)
+    logger.info(f"Receiving {timeframe} candles from the market data daemon at {address}")
+    return feed
+
+def wait_for_next_cycle(feed, seconds=60):
+    """Waits for the next closed candle, or `seconds` without the daemon."""
+    if feed is None:
+        time.sleep(seconds)
+    else:
+        feed.wait_for_close()
+
 def load_state():
     if os.path.exists(STATE_FILE):
         with open(STATE_FILE, 'r') as f:
@@ -137,6 +162,18 @@ def fetch_position(exchange, symbol):
         logger.error(f"Could not fetch position: {e}")
         return None
 
+def fetch_ohlcv(exchange, symbol, timeframe, limit):
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            return exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        except Exception as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"Retrying market data fetch (attempt {attempt + 1}): {e}")
+                time.sleep(5)
+            else:
+                raise e
+
 def fetch_open_orders(exchange, symbol):
     try:
         max_retries = 3
@@ -299,6 +336,7 @@ def main():
 
     logger.info(f"Configuration: Trading {symbol} on {timeframe} with SMA window {sma_window}.")
     logger.info(f"Order size: {order_size_contracts} contracts. Tick size: {tick_size}")
+    feed = connect_market_data(symbol, timeframe, sma_window + 5)
 
     # Connection health check counter
     connection_errors = 0
@@ -314,21 +352,13 @@ def main():
                 resync_time(exchange)
                 last_resync_time = time.time()
             
-            # 1. Fetch market data with retry logic
+            # 1. Fetch market data with retry logic (closed candles only when they come from the daemon)
             try:
-                max_retries = 3
-                ohlcv = None
-                for attempt in range(max_retries):
-                    try:
-                        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=sma_window + 5)
-                        connection_errors = 0  # Reset error counter on success
-                        break
-                    except Exception as e:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"Retrying market data fetch (attempt {attempt + 1}): {e}")
-                            time.sleep(5)
-                        else:
-                            raise e
+                if feed is None:
+                    ohlcv = fetch_ohlcv(exchange, symbol, timeframe, sma_window + 5)
+                    connection_errors = 0  # Reset error counter on success
+                else:
+                    ohlcv = feed.candles('bitmex', symbol, timeframe, sandbox=True)
                 
                 if ohlcv is None:
                     raise Exception("Failed to fetch market data after retries")
@@ -346,7 +376,7 @@ def main():
                         logger.error("Failed to reinitialize exchange. Exiting.")
                         return
                     connection_errors = 0
-                time.sleep(60)
+                wait_for_next_cycle(feed)
                 continue
 
             # 2. Calculate signal
@@ -362,14 +392,14 @@ def main():
             save_state(state)
             if state['signal_confirm_count'] < signal_confirm_bars:
                 logger.info(f"Waiting for signal confirmation: {state['signal_confirm_count']}/{signal_confirm_bars}")
-                time.sleep(60)
+                wait_for_next_cycle(feed)
                 continue
 
             # 4. Fetch position
             logger.info("Checking current position...")
             position_size = fetch_position(exchange, symbol)
             if position_size is None:
-                time.sleep(60)
+                wait_for_next_cycle(feed)
                 continue
             state['position_size'] = position_size
             save_state(state)
@@ -423,7 +453,7 @@ def main():
             if action_taken:
                 time.sleep(5)
             else:
-                time.sleep(60)
+                wait_for_next_cycle(feed)
 
     except KeyboardInterrupt:
         logger.info("Bot stopped manually. Cancelling all open orders...")
@@ -0,0 +1,196 @@
+"""
+Array-based building blocks shared by the backtesters in this repository.
+
+Everything here works on plain NumPy arrays (a DataFrame column is used as a view),
+so a backtest over hundreds of thousands of bars runs without per-row pandas access.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# --- LRC In/Out Signal Kernel ---
+def _lrc_inout_positions_loop(low, high, lower, upper):
+    """Reference implementation of the in/out state machine, also used as the numba kernel."""
+    positions = np.zeros(len(low), dtype=np.int8)
+    position = 0
+    for i in range(len(low)):
+        if position == 0 and low[i] < lower[i]:
+            position = 1
+        elif position == 1 and high[i] > upper[i]:
+            position = 0
+        positions[i] = position
+    return positions
+
+_lrc_inout_positions_jit = njit(cache=True)(_lrc_inout_positions_loop) if njit else None
+
+def _lrc_inout_positions_numpy(low, high, lower, upper):
+    """
+    Vectorized version of the in/out state machine.
+
+    A bar that only touches the lower band always leaves us IN and a bar that only
+    touches the upper band always leaves us OUT. A bar that touches both flips the
+    position, so the position is the last one-sided event plus the number of flips
+    since then, mod 2.
+    """
+    with np.errstate(invalid='ignore'):
+        go_in = low < lower
+        go_out = high > upper
+    flips = np.cumsum(go_in & go_out)
+    one_sided = go_in ^ go_out
+
+    bars = np.arange(len(low))
+    last_event = np.maximum.accumulate(np.where(one_sided, bars, -1)) if len(low) else bars
+    has_event = last_event >= 0
+    safe_event = np.where(has_event, last_event, 0)
+
+    base_position = np.where(has_event, go_in[safe_event], 0)
+    flips_since_event = flips - np.where(has_event, flips[safe_event], 0)
+    return ((base_position + flips_since_event) % 2).astype(np.int8)
+
+def lrc_inout_positions(low, high, lower, upper, use_numba=None):
+    """
+    Runs the LRC in/out hysteresis: go IN when the low dips below the lower band,
+    go OUT when the high breaks above the upper band.
+
+    Args:
+        low, high (array-like): Candle lows and highs.
+        lower, upper (array-like): LRC band values for the same bars (NaN bars never trigger).
+        use_numba (bool): Force the numba kernel on or off. By default numba is used when installed.
+
+    Returns:
+        np.ndarray: int8 array with 1 while IN and 0 while OUT, one value per bar.
+    """
+    arrays = [np.ascontiguousarray(a, dtype=np.float64) for a in (low, high, lower, upper)]
+
+    if use_numba is None:
+        use_numba = _lrc_inout_positions_jit is not None
+    if use_numba:
+        if _lrc_inout_positions_jit is None:
+            raise ImportError("numba is not installed; call with use_numba=False.")
+        return _lrc_inout_positions_jit(*arrays)
+    return _lrc_inout_positions_numpy(*arrays)
+
+# --- Portfolio Simulation ---
+def signal_transitions(signal):
+    """
+    Finds the bars where a 0/1 signal goes in and out.
+
+    Like the original Backtester loops, bar 0 is never traded and an exit with no
+    open position is ignored, so entries and exits always alternate.
+
+    Returns:
+        tuple: (entry_bars, exit_bars) int arrays; exit_bars may be one shorter than entry_bars.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    change = np.diff(signal)
+    entries = np.flatnonzero(change > 0) + 1
+    exits = np.flatnonzero(change < 0) + 1
+    if len(exits) and (not len(entries) or exits[0] < entries[0]):
+        exits = exits[1:]
+    return entries, exits
+
+def limit_exit_transitions(price, high, positions):
+    """
+    Finds the trades of the limit-order exit model used by the SMA backtester.
+
+    A go-in signal buys at the close. A go-out signal places a sell limit at the close,
+    which fills on the first later bar whose high reaches it; until then the limit
+    chases the previous bar's close. Signals that arrive mid-trade are ignored.
+
+    Returns:
+        tuple: (entry_bars, exit_bars, exit_prices, exit_signal_bars).
+    """
+    price = np.asarray(price, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+
+    go_in_bars = np.flatnonzero(positions == 1.0)
+    go_in_bars = go_in_bars[go_in_bars >= 1]
+    go_out_bars = np.flatnonzero(positions == -1.0)
+    # A limit placed at bar j - 1's close fills at bar j if the high reaches it
+    fill_bars = np.flatnonzero(high[1:] >= price[:-1]) + 1
+
+    entries, exits, exit_prices, exit_signals = [], [], [], []
+    bar = 0
+    # One iteration per trade rather than per bar
+    while True:
+        k = np.searchsorted(go_in_bars, bar, side='left')
+        if k == len(go_in_bars):
+            break
+        entry = go_in_bars[k]
+        entries.append(entry)
+
+        k = np.searchsorted(go_out_bars, entry, side='right')
+        if k == len(go_out_bars):
+            break
+        exit_signal = go_out_bars[k]
+        exit_signals.append(exit_signal)
+
+        k = np.searchsorted(fill_bars, exit_signal, side='right')
+        if k == len(fill_bars):
+            break
+        fill = fill_bars[k]
+        exits.append(fill)
+        exit_prices.append(price[fill - 1])
+        bar = fill + 1
+
+    return (np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64),
+            np.array(exit_prices, dtype=np.float64), np.array(exit_signals, dtype=np.int64))
+
+def simulate_all_in_portfolio(price, entry_bars, exit_bars, exit_prices=None,
+                              initial_capital=10000.0, fee_rate=0.0, slippage=0.0):
+    """
+    Computes cash, holdings and total value for an all-in / all-out strategy.
+
+    Each entry spends all cash and each exit sells all holdings. The cash carried from
+    trade to trade is a cumulative product of the per-trade returns, and the per-bar
+    columns are forward-filled from the entry/exit bars, so the cost is O(N + trades).
+
+    Args:
+        price (array-like): Close price per bar; entries fill at the close.
+        entry_bars, exit_bars (array-like): Alternating trade bars, entry_bars[k] < exit_bars[k].
+        exit_prices (array-like): Fill price of each exit; defaults to the close of the exit bar.
+        initial_capital (float): Starting cash.
+        fee_rate (float): Fee charged on each fill, as a fraction of the traded value.
+        slippage (float): Adverse price move on each fill, as a fraction of the price.
+
+    Returns:
+        dict: 'cash', 'holdings' (units held) and 'total' arrays, one value per bar.
+    """
+    price = np.asarray(price, dtype=np.float64)
+    entry_bars = np.asarray(entry_bars, dtype=np.int64)
+    exit_bars = np.asarray(exit_bars, dtype=np.int64)
+    if exit_prices is None:
+        exit_prices = price[exit_bars]
+    exit_prices = np.asarray(exit_prices, dtype=np.float64)
+
+    buy_prices = price[entry_bars] * (1 + slippage)
+    sell_prices = exit_prices * (1 - slippage)
+    keep = 1 - fee_rate
+
+    # Cash available at each entry: the initial capital grown by every completed trade before it
+    closed = len(exit_bars)
+    trade_growth = keep * sell_prices / buy_prices[:closed] * keep
+    cash_at_entry = initial_capital * np.concatenate(([1.0], np.cumprod(trade_growth)))[:len(entry_bars)]
+    units = cash_at_entry * keep / buy_prices
+    cash_at_exit = units[:closed] * sell_prices * keep
+
+    # Write the state after every event, then forward-fill it to the following bars
+    event_cash = np.full(len(price), np.nan)
+    event_holdings = np.full(len(price), np.nan)
+    event_cash[entry_bars] = 0.0
+    event_holdings[entry_bars] = units
+    event_cash[exit_bars] = cash_at_exit
+    event_holdings[exit_bars] = 0.0
+
+    bars = np.arange(len(price))
+    last_event = np.maximum.accumulate(np.where(np.isnan(event_cash), -1, bars)) if len(price) else bars
+    has_event = last_event >= 0
+    safe_event = np.where(has_event, last_event, 0)
+    cash = np.where(has_event, event_cash[safe_event], initial_capital)
+    holdings = np.where(has_event, event_holdings[safe_event], 0.0)
+
+    return {'cash': cash, 'holdings': holdings, 'total': cash + holdings * price}
@@ -1,21 +1,29 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
 import pandas as pd
-from sqlalchemy import create_engine
 import matplotlib.pyplot as plt
+from backtest_engine import limit_exit_transitions, simulate_all_in_portfolio
+
+if __name__ == '__main__':
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+from candle_store import CandleStore
+from candle_cache import CandleCache
 
 # --- DataFeeder Logic ---
 class DataFeeder:
     def __init__(self, db_path='data/market_data.db'):
-        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.store = CandleStore(db_path)
+        self.cache = CandleCache(self.store)
         self.data = {}
 
-    def load_data(self, symbol, timeframe):
+    def load_data(self, symbol, timeframe, start=None, end=None):
         table_name = f"{symbol.replace('/', '_')}_{timeframe}"
         try:
-            # Use a full SQL query for robustness
-            df = pd.read_sql(f"SELECT * FROM {table_name}", self.engine, index_col='timestamp')
+            # Zero-copy views on the memory-mapped candle cache; `start` is inclusive, `end` exclusive
+            self.store.migrate_legacy_table(symbol, timeframe)
+            df = self.cache.load_dataframe(symbol, timeframe, start, end)
             print(f"Loaded {len(df)} records for {table_name}")
-            df.index = pd.to_datetime(df.index)
             self.data[table_name] = df
             return df
         except Exception as e:
@@ -34,71 +42,46 @@ class TradingBot:
         signals['price'] = self.data['close']
         signals['sma'] = self.data['close'].rolling(window=self.sma_window).mean()
         signals['signal'] = 0.0
-        signals['signal'][self.sma_window:] = (signals['price'][self.sma_window:] > signals['sma'][self.sma_window:]).astype(float)
+        signals.iloc[self.sma_window:, signals.columns.get_loc('signal')] = (signals['price'][self.sma_window:] > signals['sma'][self.sma_window:]).astype(float)
         signals['positions'] = signals['signal'].diff()
         return signals
 
 # --- Backtester Logic ---
 class Backtester:
-    def __init__(self, initial_capital=10000.0):
+    def __init__(self, initial_capital=10000.0, fee_rate=0.0, slippage=0.0):
         self.initial_capital = initial_capital
+        self.fee_rate = fee_rate # Fraction of the traded value paid per fill
+        self.slippage = slippage # Fraction of the price lost per fill
         self.data = None
 
     def run(self, signals, data):
         self.data = data
         portfolio = signals.copy()
-        portfolio['cash'] = 0.0
-        portfolio['holdings'] = 0.0
-        portfolio['total'] = 0.0
-
-        # Start with initial capital
-        portfolio.iloc[0, portfolio.columns.get_loc('cash')] = self.initial_capital
-        portfolio.iloc[0, portfolio.columns.get_loc('total')] = self.initial_capital
-        
-        status = 'OUT'
-        limit_order_price = 0.0
-
-        for i in range(1, len(portfolio)):
-            # --- Carry over portfolio from previous timestamp ---
-            portfolio.iloc[i, portfolio.columns.get_loc('cash')] = portfolio.iloc[i-1, portfolio.columns.get_loc('cash')]
-            portfolio.iloc[i, portfolio.columns.get_loc('holdings')] = portfolio.iloc[i-1, portfolio.columns.get_loc('holdings')]
-            
-            # --- Get current market data ---
-            price = portfolio.price.iloc[i]
-            high_price = self.data.high.iloc[i]
-            go_in_signal = portfolio.positions.iloc[i] == 1.0
-            go_out_signal = portfolio.positions.iloc[i] == -1.0
-
-            # --- State Machine Logic ---
-            if status == 'OUT':
-                if go_in_signal:
-                    status = 'IN'
-                    amount_to_buy = portfolio.cash.iloc[i-1] / price
-                    portfolio.iloc[i, portfolio.columns.get_loc('holdings')] = amount_to_buy
-                    portfolio.iloc[i, portfolio.columns.get_loc('cash')] = 0.0
-                    print(f"{portfolio.index[i].date()}: GO IN @ {price:.2f}")
-
-            elif status == 'IN':
-                if go_out_signal:
-                    status = 'WANTS_TO_EXIT'
-                    limit_order_price = price
-                    print(f"{portfolio.index[i].date()}: WANTS TO EXIT. Limit Sell @ {limit_order_price:.2f}")
-
-            elif status == 'WANTS_TO_EXIT':
-                if high_price >= limit_order_price:
-                    status = 'OUT'
-                    cash_from_sale = portfolio.holdings.iloc[i-1] * limit_order_price
-                    portfolio.iloc[i, portfolio.columns.get_loc('cash')] = cash_from_sale
-                    portfolio.iloc[i, portfolio.columns.get_loc('holdings')] = 0.0
-                    print(f"{portfolio.index[i].date()}: EXIT CONFIRMED @ {limit_order_price:.2f}")
-                    limit_order_price = 0.0
-                else:
-                    # Chase the price
-                    limit_order_price = price
-                    print(f"{portfolio.index[i].date()}: CHASING EXIT. New Limit @ {limit_order_price:.2f}")
 
-            # --- Update total portfolio value for the current timestamp ---
-            portfolio.iloc[i, portfolio.columns.get_loc('total')] = portfolio.cash.iloc[i] + (portfolio.holdings.iloc[i] * price)
+        # --- State Machine Logic ---
+        # OUT -> IN on a go-in signal (buy at the close). IN -> WANTS_TO_EXIT on a go-out
+        # signal, which places a limit sell at the close and chases the close until a
+        # bar's high reaches it. The trades are found once, not bar by bar.
+        entry_bars, exit_bars, exit_prices, exit_signal_bars = limit_exit_transitions(
+            portfolio['price'].to_numpy(), self.data['high'].to_numpy(), portfolio['positions'].to_numpy()
+        )
+        result = simulate_all_in_portfolio(
+            portfolio['price'].to_numpy(), entry_bars, exit_bars, exit_prices,
+            initial_capital=self.initial_capital, fee_rate=self.fee_rate, slippage=self.slippage
+        )
+
+        dates = portfolio.index
+        prices = portfolio['price'].to_numpy()
+        for k, entry in enumerate(entry_bars):
+            print(f"{dates[entry].date()}: GO IN @ {prices[entry]:.2f}")
+            if k < len(exit_signal_bars):
+                print(f"{dates[exit_signal_bars[k]].date()}: WANTS TO EXIT. Limit Sell @ {prices[exit_signal_bars[k]]:.2f}")
+            if k < len(exit_bars):
+                print(f"{dates[exit_bars[k]].date()}: EXIT CONFIRMED @ {exit_prices[k]:.2f}")
+
+        portfolio['cash'] = result['cash']
+        portfolio['holdings'] = result['holdings']
+        portfolio['total'] = result['total']
 
         return portfolio
 
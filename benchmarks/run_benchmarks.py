@@ -0,0 +1,210 @@
+"""
+Benchmarks for the hot paths of the bots and backtesters.
+
+Each benchmark runs on deterministic synthetic OHLCV (see synthetic_data.py) at
+1k, 100k and 1M bars. Wall time (best of --repeat runs) and peak traced memory
+are appended to a JSON history, and the run fails (exit code 1) when a timing is
+more than --threshold slower than the median of the previous runs.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --only lrc_channel backtester_lrc
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BENCH_DIR)
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'data'))
+
+from synthetic_data import make_ohlcv, make_signals
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, 'history.json')
+
+# --- Loading The Bot Modules ---
+def _import_from(directory, module_name):
+    """
+    Imports a module that lives in one of the bot folders. Several folders have their
+    own config.py, so the cached one is dropped to let each module import its own.
+    """
+    path = os.path.join(ROOT_DIR, directory)
+    sys.path.insert(0, path)
+    saved_config = sys.modules.pop('config', None)
+    try:
+        return importlib.import_module(module_name)
+    finally:
+        sys.path.remove(path)
+        if saved_config is not None:
+            sys.modules['config'] = saved_config
+        else:
+            sys.modules.pop('config', None)
+
+# --- Benchmarks ---
+# Each setup function builds its inputs for one size (untimed) and returns the callable to time.
+def setup_lrc_channel(num_bars):
+    lrc_calculator = _import_from('lrc_grid_bot', 'lrc_calculator')
+    ohlcv = make_ohlcv(num_bars)
+    inflection_timestamp = int(ohlcv['timestamp'].iloc[0] // 1000)
+    return lambda: lrc_calculator.calculate_lrc_channel(ohlcv, inflection_timestamp)
+
+def setup_entry_grid(num_bars):
+    # One grid per bar of the dataset, as the grid backtester generates them
+    strategy_module = _import_from('lrc_grid_bot', 'strategy')
+    lrc_calculator = _import_from('lrc_grid_bot', 'lrc_calculator')
+    grid_config = _import_from('lrc_grid_bot', 'config')
+    strategy = strategy_module.Strategy(grid_config, lrc_calculator)
+
+    lrc_params = {'slope': 0.5, 'intercept': 30000.0, 'std_dev': 120.0}
+    direction, zones = strategy.get_trade_direction_and_zones(lrc_params)
+
+    def run():
+        for index in range(num_bars):
+            strategy.generate_entry_grid(lrc_params, index, direction, zones)
+    return run
+
+def setup_backtester_lrc(num_bars):
+    lrc_in_out_bot = _import_from('lrc_io_bot', 'lrc_in_out_bot')
+    signals = make_signals(make_ohlcv(num_bars))
+    backtester = lrc_in_out_bot.Backtester(initial_capital=10000.0)
+    return lambda: backtester.run(signals)
+
+def setup_backtester_sma(num_bars):
+    backtester_module = importlib.import_module('backtester')
+    ohlcv = make_ohlcv(num_bars)
+    signals = make_signals(ohlcv)
+    data = ohlcv.set_index(signals.index)
+    backtester = backtester_module.Backtester(initial_capital=10000.0)
+
+    def run():
+        # The limit-order backtester logs every trade
+        with contextlib.redirect_stdout(io.StringIO()):
+            backtester.run(signals, data)
+    return run
+
+def setup_resample_ohlcv(num_bars):
+    app = _import_from('lrc_io_bot', 'app')
+    ohlcv_list = make_ohlcv(num_bars).to_numpy().tolist()
+    return lambda: app.resample_ohlcv(ohlcv_list, '15m')
+
+BENCHMARKS = {
+    'lrc_channel': setup_lrc_channel,
+    'entry_grid': setup_entry_grid,
+    'backtester_lrc': setup_backtester_lrc,
+    'backtester_sma': setup_backtester_sma,
+    'resample_ohlcv': setup_resample_ohlcv,
+}
+
+# --- Measuring ---
+def measure(func, repeat):
+    """Returns (best wall time in seconds, peak traced memory in MB)."""
+    func() # Warm-up (imports, JIT compilation, caches)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 1e6
+
+def run_benchmarks(names, sizes, repeat):
+    results = []
+    for name in names:
+        for size in sizes:
+            try:
+                func = BENCHMARKS[name](size)
+            except ImportError as e:
+                print(f"  {name:<16} {size:>9,} bars  skipped ({e})")
+                break
+            seconds, peak_mb = measure(func, repeat)
+            results.append({'name': name, 'size': size, 'seconds': seconds, 'peak_mb': peak_mb})
+            print(f"  {name:<16} {size:>9,} bars  {seconds * 1000:>10.2f} ms  {peak_mb:>9.1f} MB")
+    return results
+
+# --- History ---
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def find_regressions(history, results, threshold, window=5):
+    """Compares each result with the median of its last `window` recorded timings."""
+    regressions = []
+    for result in results:
+        previous = [
+            entry['seconds']
+            for run in history[-window:]
+            for entry in run['results']
+            if entry['name'] == result['name'] and entry['size'] == result['size']
+        ]
+        if not previous:
+            continue
+        baseline = float(np.median(previous))
+        if result['seconds'] > baseline * (1 + threshold):
+            regressions.append((result, baseline))
+    return regressions
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LRC, strategy, backtester and resampling hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown vs. history, e.g. 0.25 = 25%%")
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--no-save', action='store_true', help="Compare against the history without recording this run")
+    args = parser.parse_args()
+
+    print(f"Running {len(args.only)} benchmarks at sizes {args.sizes}...")
+    results = run_benchmarks(args.only, args.sizes, args.repeat)
+
+    history = load_history(args.history)
+    regressions = find_regressions(history, results, args.threshold)
+
+    if not args.no_save:
+        history.append({
+            'date': datetime.now(timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'results': results,
+        })
+        with open(args.history, 'w') as f:
+            json.dump(history, f, indent=2)
+        print(f"\nResults appended to {args.history}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:")
+        for result, baseline in regressions:
+            print(f"  {result['name']} @ {result['size']:,} bars: {result['seconds'] * 1000:.2f} ms "
+                  f"(baseline {baseline * 1000:.2f} ms)")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+if __name__ == '__main__':
+    main()
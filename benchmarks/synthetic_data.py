@@ -0,0 +1,49 @@
+"""
+Deterministic synthetic market data for the benchmarks.
+
+The same (num_bars, seed) always produces the same candles, so timings from
+different commits are measured on identical inputs.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEED = 42
+START_MS = 1_672_531_200_000 # 2023-01-01T00:00:00Z
+
+def make_ohlcv(num_bars: int, timeframe_ms: int = 60_000, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Generates a random-walk OHLCV frame like ExchangeManager.fetch_ohlcv returns before
+    timestamp conversion: 'timestamp' in ms plus float 'open', 'high', 'low', 'close', 'volume'.
+    """
+    rng = np.random.default_rng(seed)
+    closes = 30000.0 + np.cumsum(rng.normal(0.0, 15.0, num_bars))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    wicks = rng.exponential(10.0, (2, num_bars))
+
+    return pd.DataFrame({
+        'timestamp': START_MS + np.arange(num_bars, dtype=np.int64) * timeframe_ms,
+        'open': opens,
+        'high': np.maximum(opens, closes) + wicks[0],
+        'low': np.minimum(opens, closes) - wicks[1],
+        'close': closes,
+        'volume': rng.gamma(2.0, 50.0, num_bars),
+    })
+
+def make_signals(ohlcv: pd.DataFrame, seed: int = DEFAULT_SEED, mean_run: int = 50) -> pd.DataFrame:
+    """
+    Generates an in/out signal frame (indexed by datetime) with runs of about
+    `mean_run` bars, in the shape the Backtester classes expect.
+    """
+    rng = np.random.default_rng(seed + 1)
+    num_bars = len(ohlcv)
+    run_lengths = rng.geometric(1.0 / mean_run, num_bars // max(mean_run, 1) + 2)
+    # The runs are random, so their total can fall short of num_bars: draw more until it doesn't
+    while run_lengths.sum() < num_bars:
+        run_lengths = np.concatenate((run_lengths, rng.geometric(1.0 / mean_run, len(run_lengths))))
+    states = np.arange(len(run_lengths)) % 2
+    signal = np.repeat(states, run_lengths)[:num_bars].astype(float)
+
+    index = pd.to_datetime(ohlcv['timestamp'].to_numpy(), unit='ms')
+    signals = pd.DataFrame({'price': ohlcv['close'].to_numpy(), 'signal': signal}, index=index)
+    signals['positions'] = signals['signal'].diff()
+    return signals
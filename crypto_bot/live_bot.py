@@ -3,9 +3,14 @@ import json
 import os
 import time
 import logging
+import sys
 import pandas as pd
 from dotenv import load_dotenv
 
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_data_client import MarketDataClient
+
 # --- Setup ---
 load_dotenv()
 logging.basicConfig(
@@ -41,6 +46,28 @@ def initialize_exchange():
     exchange.set_sandbox_mode(True)
     return exchange
 
+def connect_market_data(symbol, timeframe, history):
+    """
+    Subscribes to closed candles from market_data_daemon.py when MARKET_DATA_ADDRESS
+    is set in the .env file; returns None to poll REST instead.
+    """
+    address = os.getenv('MARKET_DATA_ADDRESS')
+    if not address:
+        return None
+    feed = MarketDataClient(address)
+    feed.subscribe('bitmex', symbol, timeframe, history=history, sandbox=True)
+    logger.info(f"Receiving {timeframe} candles from the market data daemon at {address}")
+    return feed
+
+def wait_for_next_cycle(feed, seconds=60):
+    """Waits for the next closed candle, or `seconds` without the daemon."""
+    if feed is None:
+        logger.info(f"Sleeping for {seconds} seconds...")
+        time.sleep(seconds)
+    else:
+        logger.info("Waiting for the next candle close...")
+        feed.wait_for_close()
+
 def load_state():
     """Loads the bot's state from state.json."""
     if os.path.exists(STATE_FILE):
@@ -72,6 +99,7 @@ def main():
     
     logger.info(f"Configuration: Trading {symbol} on {timeframe} with SMA window {sma_window}.")
     logger.info(f"Order size: {order_size_contracts} contracts.")
+    feed = connect_market_data(symbol, timeframe, sma_window + 5)
 
     try:
         while True:
@@ -80,13 +108,16 @@ def main():
             # 1. Fetch market data
             logger.info(f"Fetching {sma_window + 5} candles for {symbol}...")
             try:
-                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=sma_window + 5)
+                if feed is None:
+                    ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=sma_window + 5)
+                else:
+                    ohlcv = feed.candles('bitmex', symbol, timeframe, sandbox=True)
                 df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
                 logger.info(f"Successfully fetched {len(df)} candles. Last close: {df.iloc[-1]['close']}")
             except Exception as e:
                 logger.error(f"Could not fetch market data: {e}")
-                time.sleep(60)
+                wait_for_next_cycle(feed)
                 continue
 
             # 2. Calculate strategy signal
@@ -109,7 +140,7 @@ def main():
                 logger.info(f"Current Position: {position_size_contracts} contracts.")
             except Exception as e:
                 logger.error(f"Could not fetch position: {e}")
-                time.sleep(60)
+                wait_for_next_cycle(feed)
                 continue
 
             # --- TRADING LOGIC ---
@@ -146,9 +177,7 @@ def main():
                 logger.info("No position change needed.")
 
             # Wait for the next cycle
-            sleep_duration = 60
-            logger.info(f"Sleeping for {sleep_duration} seconds...")
-            time.sleep(sleep_duration)
+            wait_for_next_cycle(feed)
 
     except KeyboardInterrupt:
         logger.info("Bot stopped manually.")
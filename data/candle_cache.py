@@ -0,0 +1,85 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from candle_store import OHLCV_COLUMNS, legacy_table_name, to_milliseconds
+
+class CandleCache:
+    """
+    Memory-mapped binary copies of candle store series.
+
+    Each series is kept as two .npy files: int64 ms timestamps and a float64 array
+    of shape (5, n) holding the open, high, low, close and volume columns, so every
+    column is contiguous. Files are mapped rather than read, which makes loading
+    millions of rows take milliseconds and lets any number of processes (e.g. sweep
+    workers) share one copy in the OS page cache.
+
+    The file names carry the store's revision of the series; a write to the store
+    makes the next load rebuild the files, streaming them from SQLite in chunks.
+    """
+
+    def __init__(self, store, cache_dir=None):
+        self.store = store
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(store.db_path)), 'cache')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, symbol, timeframe, revision):
+        prefix = os.path.join(self.cache_dir, f"{legacy_table_name(symbol, timeframe)}.r{revision}")
+        return f"{prefix}.timestamp.npy", f"{prefix}.ohlcv.npy"
+
+    def build(self, symbol, timeframe):
+        """Writes the cache files for the current revision of a series and removes older ones."""
+        revision = self.store.revision(symbol, timeframe)
+        timestamp_path, ohlcv_path = self._paths(symbol, timeframe, revision)
+        num_rows = self.store.count(symbol, timeframe)
+
+        # Write under temporary names and rename, so readers never map a half-written file
+        timestamps = np.lib.format.open_memmap(timestamp_path + '.tmp', mode='w+', dtype=np.int64, shape=(num_rows,))
+        ohlcv = np.lib.format.open_memmap(ohlcv_path + '.tmp', mode='w+', dtype=np.float64,
+                                          shape=(len(OHLCV_COLUMNS), num_rows))
+        position = 0
+        for chunk_timestamps, chunk_values in self.store.iter_chunks(symbol, timeframe):
+            end = position + len(chunk_timestamps)
+            timestamps[position:end] = chunk_timestamps
+            ohlcv[:, position:end] = chunk_values.T
+            position = end
+        timestamps.flush()
+        ohlcv.flush()
+        del timestamps, ohlcv
+        os.replace(timestamp_path + '.tmp', timestamp_path)
+        os.replace(ohlcv_path + '.tmp', ohlcv_path)
+
+        # Mappings of old revisions held by other processes stay valid after the unlink
+        for path in glob.glob(os.path.join(self.cache_dir, f"{legacy_table_name(symbol, timeframe)}.r*.npy")):
+            if path not in (timestamp_path, ohlcv_path):
+                os.remove(path)
+        return timestamp_path, ohlcv_path
+
+    def load_arrays(self, symbol, timeframe, start=None, end=None):
+        """
+        Maps a series, rebuilding the cache first if the store has changed.
+
+        Returns:
+            tuple: (timestamps, ohlcv) — int64 ms timestamps of shape (n,) and float64
+                   OHLCV of shape (5, n), as views on the mapped files restricted to
+                   start <= timestamp < end. Pages are copy-on-write: writing to the
+                   arrays never touches the files.
+        """
+        timestamp_path, ohlcv_path = self._paths(symbol, timeframe, self.store.revision(symbol, timeframe))
+        if not (os.path.exists(timestamp_path) and os.path.exists(ohlcv_path)):
+            self.build(symbol, timeframe)
+        timestamps = np.load(timestamp_path, mmap_mode='c')
+        ohlcv = np.load(ohlcv_path, mmap_mode='c')
+
+        first = 0 if start is None else np.searchsorted(timestamps, to_milliseconds(start), side='left')
+        last = len(timestamps) if end is None else np.searchsorted(timestamps, to_milliseconds(end), side='left')
+        return timestamps[first:last], ohlcv[:, first:last]
+
+    def load_dataframe(self, symbol, timeframe, start=None, end=None):
+        """
+        Returns the series as a DataFrame indexed by 'timestamp' whose columns are
+        views on the mapped files (no copy is made).
+        """
+        timestamps, ohlcv = self.load_arrays(symbol, timeframe, start, end)
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ms]'), name='timestamp', copy=False)
+        return pd.DataFrame({name: ohlcv[i] for i, name in enumerate(OHLCV_COLUMNS)}, index=index, copy=False)
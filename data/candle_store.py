@@ -0,0 +1,219 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from ohlcv_aggregator import timeframe_to_ms
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+CREATE_CANDLES_TABLE = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume REAL,
+    PRIMARY KEY (symbol, timeframe, timestamp)
+) WITHOUT ROWID
+"""
+
+# One row per series; the revision changes on every write so caches can tell they are stale
+CREATE_SERIES_TABLE = """
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (symbol, timeframe)
+) WITHOUT ROWID
+"""
+
+BUMP_REVISION = """
+INSERT INTO series (symbol, timeframe, revision) VALUES (?, ?, 1)
+ON CONFLICT (symbol, timeframe) DO UPDATE SET revision = revision + 1
+"""
+
+# A re-fetched candle (e.g. the one that was still forming) replaces the stored one
+UPSERT_CANDLE = """
+INSERT INTO candles (symbol, timeframe, timestamp, open, high, low, close, volume)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol, timeframe, timestamp) DO UPDATE SET
+    open = excluded.open, high = excluded.high, low = excluded.low,
+    close = excluded.close, volume = excluded.volume
+"""
+
+def legacy_table_name(symbol, timeframe):
+    """The per-series table name the old save_to_db wrote, e.g. BTC_USDT_1h."""
+    return f"{symbol.replace('/', '_')}_{timeframe}"
+
+def to_milliseconds(value):
+    """Converts a timestamp (ms int, datetime, or date string) to epoch milliseconds; naive times are UTC."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.value // 1_000_000
+
+class CandleStore:
+    """
+    Append-only OHLCV storage in SQLite, keyed by (symbol, timeframe, timestamp).
+
+    All series share one table whose primary key is a B-tree on the key, so
+    appending a batch costs O(batch · log n) and a time range is read with an
+    index seek, however much history is stored. Timestamps are epoch milliseconds.
+    """
+
+    def __init__(self, db_path='data/market_data.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets readers (backtests) run while the collector appends
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(CREATE_CANDLES_TABLE)
+        self.conn.execute(CREATE_SERIES_TABLE)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def append(self, symbol, timeframe, candles):
+        """
+        Inserts candles, replacing any already stored at the same timestamp.
+
+        Args:
+            symbol (str): e.g. 'BTC/USDT'.
+            timeframe (str): e.g. '1h'.
+            candles: A DataFrame with OHLCV columns and a 'timestamp' column or index
+                     (ms or datetimes), or ccxt-style [timestamp, o, h, l, c, v] rows.
+
+        Returns:
+            int: The number of candles written.
+        """
+        rows = self._to_rows(symbol, timeframe, candles)
+        with self.conn:
+            self.conn.executemany(UPSERT_CANDLE, rows)
+            self.conn.execute(BUMP_REVISION, (symbol, timeframe))
+        return len(rows)
+
+    def revision(self, symbol, timeframe):
+        """Returns a number that changes whenever the series is written to (0 if never tracked)."""
+        row = self.conn.execute(
+            "SELECT revision FROM series WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _to_rows(symbol, timeframe, candles):
+        if isinstance(candles, pd.DataFrame):
+            timestamps = candles['timestamp'] if 'timestamp' in candles.columns else candles.index.to_series()
+            if pd.api.types.is_datetime64_any_dtype(timestamps):
+                timestamps_ms = pd.DatetimeIndex(timestamps).as_unit('ms').asi8
+            else:
+                timestamps_ms = timestamps.to_numpy(dtype=np.int64)
+            values = candles[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+            return [(symbol, timeframe, ts, *row) for ts, row in zip(timestamps_ms.tolist(), values.tolist())]
+        return [(symbol, timeframe, int(row[0]), *row[1:6]) for row in candles]
+
+    def _select_range(self, symbol, timeframe, start, end):
+        query = "SELECT timestamp, open, high, low, close, volume FROM candles WHERE symbol = ? AND timeframe = ?"
+        params = [symbol, timeframe]
+        if start is not None:
+            query += " AND timestamp >= ?"
+            params.append(to_milliseconds(start))
+        if end is not None:
+            query += " AND timestamp < ?"
+            params.append(to_milliseconds(end))
+        query += " ORDER BY timestamp"
+        return self.conn.execute(query, params)
+
+    def read_range(self, symbol, timeframe, start=None, end=None):
+        """
+        Reads the candles with start <= timestamp < end (either bound may be None).
+
+        Returns:
+            pd.DataFrame: OHLCV columns indexed by a UTC-naive DatetimeIndex named 'timestamp'.
+        """
+        rows = self._select_range(symbol, timeframe, start, end).fetchall()
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), 1 + len(OHLCV_COLUMNS))
+        index = pd.DatetimeIndex(pd.to_datetime(values[:, 0].astype(np.int64), unit='ms'), name='timestamp')
+        return pd.DataFrame(values[:, 1:], index=index, columns=OHLCV_COLUMNS)
+
+    def iter_chunks(self, symbol, timeframe, start=None, end=None, chunk_size=100_000):
+        """
+        Yields the candles of a range in order as (timestamps_ms, ohlcv) array pairs of at
+        most `chunk_size` rows, so a long series can be streamed without loading it whole.
+        """
+        cursor = self._select_range(symbol, timeframe, start, end)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            # ms timestamps are far below 2**53, so they survive the float64 round trip exactly
+            values = np.array(rows, dtype=np.float64)
+            yield values[:, 0].astype(np.int64), values[:, 1:]
+
+    def last_timestamp(self, symbol, timeframe):
+        """Returns the newest stored timestamp in ms, or None if the series is empty."""
+        row = self.conn.execute(
+            "SELECT MAX(timestamp) FROM candles WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        return row[0]
+
+    def first_timestamp(self, symbol, timeframe):
+        """Returns the oldest stored timestamp in ms, or None if the series is empty."""
+        row = self.conn.execute(
+            "SELECT MIN(timestamp) FROM candles WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        return row[0]
+
+    def find_gaps(self, symbol, timeframe, interval_ms):
+        """
+        Finds missing stretches between stored candles, computed inside SQLite so the
+        series is never loaded into memory.
+
+        Args:
+            interval_ms (int): The candle length in ms, e.g. 60000 for '1m'.
+
+        Returns:
+            list: (first missing timestamp, next stored timestamp) pairs, in ms.
+        """
+        rows = self.conn.execute(
+            """
+            SELECT previous + ?, timestamp FROM (
+                SELECT timestamp, LAG(timestamp) OVER (ORDER BY timestamp) AS previous
+                FROM candles WHERE symbol = ? AND timeframe = ?
+            ) WHERE timestamp - previous > ?
+            """, (interval_ms, symbol, timeframe, interval_ms)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def count(self, symbol, timeframe):
+        """Returns the number of stored candles for a series."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM candles WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()[0]
+
+    def migrate_legacy_table(self, symbol, timeframe):
+        """
+        Copies a table written by the old save_to_db (e.g. BTC_USDT_1h) into the store.
+        Does nothing if the series already has candles or there is no such table.
+
+        Returns:
+            int: The number of candles imported.
+        """
+        table_name = legacy_table_name(symbol, timeframe)
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        if not exists or self.last_timestamp(symbol, timeframe) is not None:
+            return 0
+
+        legacy_df = pd.read_sql(f'SELECT * FROM "{table_name}"', self.conn)
+        legacy_df['timestamp'] = pd.to_datetime(legacy_df['timestamp'])
+        imported = self.append(symbol, timeframe, legacy_df)
+        print(f"Imported {imported} candles from legacy table {table_name}")
+        return imported
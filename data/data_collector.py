@@ -1,7 +1,13 @@
+import argparse
 import ccxt
 import pandas as pd
 import os
-from sqlalchemy import create_engine, inspect
+import sys
+import time
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from candle_store import CandleStore, timeframe_to_ms, to_milliseconds
 
 def fetch_data(exchange, symbol, timeframe, limit):
     """Fetches historical data from the specified exchange."""
@@ -14,47 +20,156 @@ def fetch_data(exchange, symbol, timeframe, limit):
         print(f"Error fetching data: {e}")
         return None
 
-def save_to_db(df, symbol, timeframe):
-    """Saves a DataFrame to a SQLite database."""
-    db_path = 'data/market_data.db'
-    engine = create_engine(f'sqlite:///{db_path}')
-    table_name = f"{symbol.replace('/', '_')}_{timeframe}"
-    
-    df_with_index = df.set_index('timestamp')
-
-    # Check if table exists
-    inspector = inspect(engine)
-    if inspector.has_table(table_name):
-        # Append new data, ignoring duplicates if any
-        existing_df = pd.read_sql(table_name, engine, index_col='timestamp')
-        combined_df = pd.concat([existing_df, df_with_index])
-        combined_df = combined_df[~combined_df.index.duplicated(keep='last')]
-        combined_df.to_sql(table_name, engine, if_exists='replace', index=True)
-        print(f"Appended data to table {table_name} in {db_path}")
+def save_to_db(df, symbol, timeframe, db_path='data/market_data.db'):
+    """Appends a DataFrame of candles to the candle store, replacing candles already stored at the same timestamp."""
+    store = CandleStore(db_path)
+    try:
+        # Carry over history written by the old table-per-series layout before the first append
+        store.migrate_legacy_table(symbol, timeframe)
+        written = store.append(symbol, timeframe, df)
+        print(f"Appended {written} candles for {symbol} {timeframe} to {db_path} "
+              f"({store.count(symbol, timeframe)} stored)")
+    finally:
+        store.close()
+
+
+# --- Historical Backfill ---
+def _fetch_page(exchange, symbol, timeframe, since, limit, max_retries=5):
+    """Fetches one page of candles, backing off and retrying on network errors and rate limits."""
+    for attempt in range(max_retries):
+        try:
+            return exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+        except ccxt.NetworkError as e:
+            if attempt == max_retries - 1:
+                raise
+            delay = 2 ** attempt
+            print(f"Error fetching page at {pd.to_datetime(since, unit='ms')}: {e}. Retrying in {delay}s...")
+            time.sleep(delay)
+
+def _now_ms(exchange):
+    """The exchange's clock for ccxt exchanges, the local one for other candle sources."""
+    milliseconds = getattr(exchange, 'milliseconds', None)
+    return milliseconds() if callable(milliseconds) else int(time.time() * 1000)
+
+def fetch_range(exchange, store, symbol, timeframe, start_ms, end_ms, page_limit=1000):
+    """
+    Pages forward through [start_ms, end_ms) and appends each page to the store as it
+    arrives, so memory use is one page regardless of the length of the range.
+
+    An empty page is a stretch without candles (before a listing, or an exchange
+    outage) and is skipped; paging stops early only once it reaches the present.
+
+    Returns:
+        int: The number of candles written.
+    """
+    interval_ms = timeframe_to_ms(timeframe)
+    page_ms = page_limit * interval_ms
+    cursor = start_ms
+    written = 0
+    while cursor < end_ms:
+        page = _fetch_page(exchange, symbol, timeframe, cursor, page_limit)
+        # Some exchanges return candles before `since` or past the requested range
+        page = [candle for candle in page if cursor <= candle[0] < end_ms]
+        if not page:
+            if cursor + page_ms > _now_ms(exchange):
+                break
+            cursor += page_ms
+            continue
+
+        written += store.append(symbol, timeframe, page)
+        cursor = page[-1][0] + interval_ms
+        print(f"  {symbol} {timeframe}: stored up to {pd.to_datetime(page[-1][0], unit='ms')} ({written} candles)")
+    return written
+
+def backfill(exchange, store, symbol, timeframe, since, until=None, page_limit=1000):
+    """
+    Brings a series up to date from `since`, resuming from whatever is already stored.
+
+    Fetches the history before the oldest stored candle, fills gaps between stored
+    candles, then continues from the newest stored candle (re-fetched, in case it was
+    still forming when saved). Only closed candles are requested: `until` defaults to
+    the open time of the current candle.
+
+    Args:
+        exchange: A ccxt exchange, or any object with a compatible fetch_ohlcv.
+        store (CandleStore): Where pages are written.
+        since: Start of the history (ms, datetime, or date string).
+        until: End of the history, exclusive (same types). Defaults to now.
+
+    Returns:
+        int: The number of candles written.
+    """
+    interval_ms = timeframe_to_ms(timeframe)
+    since_ms = to_milliseconds(since)
+    if until is None:
+        now_ms = int(time.time() * 1000)
+        until_ms = now_ms - now_ms % interval_ms
+    else:
+        until_ms = to_milliseconds(until)
+
+    store.migrate_legacy_table(symbol, timeframe)
+    first_ms = store.first_timestamp(symbol, timeframe)
+    last_ms = store.last_timestamp(symbol, timeframe)
+
+    if first_ms is None:
+        ranges = [(since_ms, until_ms)]
     else:
-        # Create new table
-        df_with_index.to_sql(table_name, engine, if_exists='replace', index=True)
-        print(f"Created table {table_name} in {db_path}")
+        ranges = []
+        if since_ms < first_ms:
+            ranges.append((since_ms, first_ms))
+        ranges += [gap for gap in store.find_gaps(symbol, timeframe, interval_ms) if gap[1] > since_ms]
+        ranges.append((last_ms, until_ms))
+
+    written = 0
+    for start_ms, end_ms in ranges:
+        start_ms, end_ms = max(start_ms, since_ms), min(end_ms, until_ms)
+        if start_ms >= end_ms:
+            continue
+        print(f"Fetching {symbol} {timeframe} from {pd.to_datetime(start_ms, unit='ms')} "
+              f"to {pd.to_datetime(end_ms, unit='ms')}...")
+        written += fetch_range(exchange, store, symbol, timeframe, start_ms, end_ms, page_limit)
+    return written
 
 
 def main():
     """Main function to run the data collection."""
-    exchange = ccxt.binance()
-    symbol = 'BTC/USDT'
-    timeframe = '1h' # 1-hour candles
-    limit = 1000 # Number of candles to fetch
+    parser = argparse.ArgumentParser(description="Collect OHLCV candles into the candle store.")
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--since', help="Backfill from this date (e.g. 2021-01-01), resuming from the stored data")
+    parser.add_argument('--until', help="Backfill up to this date (exclusive); defaults to now")
+    parser.add_argument('--limit', type=int, default=1000, help="Candles per request")
+    parser.add_argument('--db', default='data/market_data.db')
+    args = parser.parse_args()
+
+    exchange = getattr(ccxt, args.exchange)({'enableRateLimit': True})
+    symbol = args.symbol
+    timeframe = args.timeframe
+    limit = args.limit
+
+    # Ensure data directory exists
+    db_dir = os.path.dirname(args.db)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    if args.since:
+        store = CandleStore(args.db)
+        try:
+            written = backfill(exchange, store, symbol, timeframe, args.since, args.until, limit)
+            print(f"Backfill complete: {written} candles written, {store.count(symbol, timeframe)} stored.")
+        finally:
+            store.close()
+        return
 
     print(f"Fetching {limit} {timeframe} candles for {symbol} from {exchange.id}...")
     df = fetch_data(exchange, symbol, timeframe, limit)
 
     if df is not None and not df.empty:
         print(f"Successfully fetched {len(df)} data points.")
-        # Ensure data directory exists
-        if not os.path.exists('data'):
-            os.makedirs('data')
-        save_to_db(df, symbol, timeframe)
+        save_to_db(df, symbol, timeframe, args.db)
     else:
         print("Could not fetch data.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,26 +1,129 @@
+import os
+import sys
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from candle_store import CandleStore, OHLCV_COLUMNS, legacy_table_name, timeframe_to_ms
+from candle_cache import CandleCache
+from ohlcv_aggregator import aggregate_rows
+
+# Binance-style weekly candles open on Monday; the Unix epoch was a Thursday
+WEEK_OFFSET_MS = 4 * 86_400_000
 
 class DataFeeder:
-    def __init__(self, db_path='data/market_data.db'):
-        self.engine = create_engine(f'sqlite:///{db_path}')
-        self.data = {}
+    """
+    Serves OHLCV frames for many symbols and timeframes.
+
+    Frames are loaded on first access and kept in least-recently-used order; when
+    their total size exceeds `memory_budget_mb` the oldest ones are dropped and
+    reloaded on their next access. A timeframe that is not stored is derived from
+    the symbol's registered base timeframe (e.g. 4h from 1m).
+    """
+
+    def __init__(self, db_path='data/market_data.db', memory_budget_mb=1024):
+        self.store = CandleStore(db_path)
+        self.cache = CandleCache(self.store)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.data = OrderedDict()
+        self.base_timeframes = {}
 
-    def load_data(self, symbol, timeframe):
-        """Loads data for a specific symbol and timeframe from the database."""
-        table_name = f"{symbol.replace('/', '_')}_{timeframe}"
+    def register(self, symbols, base_timeframe='1m'):
+        """Registers one or more symbols whose other timeframes are derived from `base_timeframe`."""
+        for symbol in [symbols] if isinstance(symbols, str) else symbols:
+            self.base_timeframes[symbol] = base_timeframe
+
+    @property
+    def symbols(self):
+        return list(self.base_timeframes)
+
+    @property
+    def memory_usage(self):
+        """Bytes held by the loaded frames (memory-mapped columns count at their full size)."""
+        return sum(int(df.memory_usage(index=True).sum()) for df in self.data.values())
+
+    def load_data(self, symbol, timeframe, start=None, end=None):
+        """
+        Loads data for a specific symbol and timeframe from the candle store.
+        `start` (inclusive) and `end` (exclusive) limit the read to a time range.
+        The columns are zero-copy views on the memory-mapped candle cache.
+        """
+        table_name = legacy_table_name(symbol, timeframe)
         try:
-            self.data[table_name] = pd.read_sql(table_name, self.engine, index_col='timestamp')
-            print(f"Loaded {len(self.data[table_name])} records for {table_name}")
-            return self.data[table_name]
+            self.store.migrate_legacy_table(symbol, timeframe)
+            df = self.cache.load_dataframe(symbol, timeframe, start, end)
+            print(f"Loaded {len(df)} records for {table_name}")
+            if start is None and end is None:
+                self._remember(table_name, df)
+            return df
         except Exception as e:
             print(f"Error loading data for {table_name}: {e}")
             return None
 
     def get_data(self, symbol, timeframe):
-        """Returns the loaded data for a symbol and timeframe."""
-        table_name = f"{symbol.replace('/', '_')}_{timeframe}"
-        return self.data.get(table_name)
+        """
+        Returns the data for a symbol and timeframe, loading it (or deriving it from
+        the base timeframe) if it is not in memory.
+        """
+        table_name = legacy_table_name(symbol, timeframe)
+        if table_name in self.data:
+            self.data.move_to_end(table_name)
+            return self.data[table_name]
+
+        base_timeframe = self.base_timeframes.get(symbol)
+        self.store.migrate_legacy_table(symbol, timeframe)
+        if base_timeframe is None or timeframe == base_timeframe or self.store.last_timestamp(symbol, timeframe) is not None:
+            return self.load_data(symbol, timeframe)
+
+        base_df = self.get_data(symbol, base_timeframe)
+        if base_df is None:
+            return None
+        try:
+            df = self._resample(base_df, base_timeframe, timeframe)
+        except ValueError as e:
+            print(f"Error deriving data for {table_name}: {e}")
+            return None
+        print(f"Derived {len(df)} {timeframe} records for {symbol} from {base_timeframe}")
+        self._remember(table_name, df)
+        return df
+
+    def iter_data(self, timeframe):
+        """Yields (symbol, data) for every registered symbol, loading them one at a time."""
+        for symbol in self.symbols:
+            df = self.get_data(symbol, timeframe)
+            if df is not None:
+                yield symbol, df
+
+    @staticmethod
+    def _resample(df, base_timeframe, timeframe):
+        """
+        Aggregates a frame of base candles into `timeframe`. A trailing candle that the
+        base data does not cover completely is dropped, so every derived candle is closed.
+        """
+        base_ms, target_ms = timeframe_to_ms(base_timeframe), timeframe_to_ms(timeframe)
+        if target_ms % base_ms:
+            raise ValueError(f"Cannot derive {timeframe} candles from {base_timeframe} candles.")
+        if df.empty:
+            return df.copy()
+
+        offset_ms = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+        timestamps = pd.DatetimeIndex(df.index).as_unit('ms').asi8
+        rows = np.column_stack([timestamps] + [df[column].to_numpy(dtype=np.float64) for column in OHLCV_COLUMNS])
+        derived = aggregate_rows(rows, target_ms, offset_ms)
+        if timestamps[-1] + base_ms < derived[-1, 0] + target_ms:
+            derived = derived[:-1]
+        return pd.DataFrame(derived[:, 1:], columns=OHLCV_COLUMNS,
+                            index=pd.DatetimeIndex(derived[:, 0].astype('datetime64[ms]'), name='timestamp'))
+
+    def _remember(self, table_name, df):
+        self.data[table_name] = df
+        self.data.move_to_end(table_name)
+        # Evict least recently used frames, but always keep the one just loaded
+        while len(self.data) > 1 and self.memory_usage > self.memory_budget:
+            evicted, _ = self.data.popitem(last=False)
+            print(f"Evicted {evicted} from memory")
 
 if __name__ == '__main__':
     # Example usage:
@@ -28,4 +131,4 @@ if __name__ == '__main__':
     btc_data = feeder.load_data('BTC/USDT', '1h')
     if btc_data is not None:
         print("Data loaded successfully:")
-        print(btc_data.head()) 
\ No newline at end of file
+        print(btc_data.head())
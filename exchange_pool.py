@@ -0,0 +1,97 @@
+"""
+Shared ccxt exchange clients for the chart servers.
+
+Building a ccxt client per HTTP request throws away its markets, its rate-limiter
+state and its keep-alive HTTP session. The pool builds one client per (exchange,
+sandbox, API key), loads its markets once, refreshes them on a timer and hands the
+same client to every request thread.
+"""
+import threading
+import time
+import ccxt
+
+class ExchangePool:
+    """
+    Args:
+        markets_refresh_seconds (float): How often the markets of every pooled client
+                                         are reloaded in the background.
+    """
+
+    def __init__(self, markets_refresh_seconds=3600):
+        self.markets_refresh_seconds = markets_refresh_seconds
+        self._exchanges = {}
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def get(self, exchange_id, sandbox=False, config=None):
+        """
+        Returns the pooled client, creating it and loading its markets on first use.
+
+        Args:
+            exchange_id (str): A ccxt exchange id, e.g. 'bitmex'.
+            sandbox (bool): Whether to use the exchange's testnet.
+            config (dict): Extra ccxt options, e.g. {'apiKey': ..., 'secret': ...}.
+        """
+        config = config or {}
+        key = (exchange_id, sandbox, config.get('apiKey'))
+        with self._lock:
+            exchange = self._exchanges.get(key)
+            if exchange is None:
+                exchange = self._create(exchange_id, sandbox, config)
+                self._exchanges[key] = exchange
+            if self._refresh_thread is None:
+                self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+                self._refresh_thread.start()
+        return exchange
+
+    @staticmethod
+    def _create(exchange_id, sandbox, config):
+        exchange = getattr(ccxt, exchange_id)({'enableRateLimit': True, **config})
+        if sandbox:
+            exchange.set_sandbox_mode(True)
+        make_throttle_thread_safe(exchange)
+        try:
+            exchange.load_markets()
+        except ccxt.BaseError as e:
+            # The first request will retry through ccxt's own lazy load
+            print(f"Could not load {exchange_id} markets: {e}")
+        return exchange
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.markets_refresh_seconds)
+            self.refresh_markets()
+
+    def refresh_markets(self):
+        """Reloads the markets of every pooled client; a failed reload keeps the old markets."""
+        with self._lock:
+            exchanges = list(self._exchanges.values())
+        for exchange in exchanges:
+            try:
+                exchange.load_markets(reload=True)
+            except ccxt.BaseError as e:
+                print(f"Could not refresh {exchange.id} markets: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._exchanges.clear()
+
+def make_throttle_thread_safe(exchange):
+    """
+    ccxt's synchronous rate limiter reads and writes lastRestRequestTimestamp without a
+    lock, so threads sharing a client can fire requests together. Serializing the
+    throttle (and stamping the request time inside it) makes them queue instead,
+    while the HTTP requests themselves still run concurrently.
+    """
+    lock = threading.Lock()
+    throttle = exchange.throttle
+
+    def locked_throttle(cost=None):
+        with lock:
+            throttle(cost)
+            exchange.lastRestRequestTimestamp = exchange.milliseconds()
+
+    exchange.throttle = locked_throttle
+
+# The pool shared by every request of the process
+exchange_pool = ExchangePool()
@@ -0,0 +1,654 @@
+"""
+In-process exchange simulator for paper trading and soak tests of the live bots.
+
+SimulatedExchange stands in for a ccxt client (the methods the bots call:
+fetch_ohlcv, fetch_positions, private_get_position, fetch_open_orders,
+create_limit_order, create_market_order, create_order, edit_order, cancel_order,
+fetch_ticker, fetch_order, fetch_balance, ...). It replays a recorded tape of
+trades, or of candles turned into four prints each (open, low/high, high/low,
+close), through a price-time priority book of the bot's own orders:
+
+- Resting limit orders fill at their price when a print trades at or through it,
+  best price first and oldest first within a price, up to the print's amount.
+- Market orders, and limit orders that cross the spread when placed, fill at
+  once at the ask/bid (last print +/- spread_ticks / 2 ticks).
+- Stop orders trigger on a print at or through their trigger price; stop-market
+  orders then fill at that print, stop-limit orders rest as limit orders.
+- Reduce-only orders never fill beyond the open position.
+
+One market is simulated, with its position and balance in the settlement
+currency (linear, or inverse like XBTUSD). Margin and liquidations are not.
+
+A SimClock drives the replay: `speed` times faster than real time, or as fast as
+possible (speed=None), where time only moves when the bot sleeps. The clock can
+replace a bot's `time` module, and its sleep() raises SimulationFinished once the
+tape is over; that is a BaseException so the bots' `except Exception` retry loops
+let it through.
+
+Soak test a bot on a recording (candles CSV with timestamp, open, high, low, close,
+volume columns; or trades CSV with timestamp, price, amount):
+
+    python exchange_simulator.py data/XBTUSD_1m.csv --candles 1m --bot lrc_grid_bot \\
+        --start 2024-03-01T00:00:00Z --speed 1000
+
+lrc_grid_bot runs the bot its config.USE_ASYNC_EXCHANGE selects, the async one on an
+AsyncSimulatedExchange; --sync runs the synchronous TradingBot instead. Bot state files
+and logs are written to a temporary directory, not over the live ones.
+"""
+import argparse
+import csv
+import functools
+import heapq
+import importlib
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import ccxt
+import numpy as np
+
+from market_data_daemon import load_trades_csv
+from ohlcv_aggregator import aggregate_rows, timeframe_to_ms, trades_to_rows
+
+class SimulationFinished(BaseException):
+    """Raised from SimClock.sleep once the simulated time passes the end of the tape."""
+
+class SimClock:
+    """
+    Simulated time starting at `start_ms`. With a `speed`, it runs that many times
+    faster than real time; with speed=None it stands still except in sleep(), so a
+    bot runs as fast as it can compute.
+
+    Has time(), monotonic(), sleep() and milliseconds(), so it can be assigned to a
+    bot module's `time` name; any other attribute comes from the time module.
+    """
+
+    def __init__(self, start_ms, speed=1.0, end_ms=None):
+        self.start_ms = start_ms
+        self.speed = speed
+        self.end_ms = end_ms
+        self._started = time.monotonic()
+        self._skipped_ms = 0.0
+
+    def milliseconds(self):
+        elapsed_ms = 0.0 if self.speed is None else (time.monotonic() - self._started) * 1000 * self.speed
+        return int(self.start_ms + elapsed_ms + self._skipped_ms)
+
+    def time(self):
+        return self.milliseconds() / 1000
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        if self.end_ms is not None and self.milliseconds() >= self.end_ms:
+            raise SimulationFinished("The recording is over.")
+        if self.speed is None:
+            self._skipped_ms += max(seconds, 0) * 1000
+        else:
+            time.sleep(max(seconds, 0) / self.speed)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+def candles_to_tape(ohlcv, timeframe) -> np.ndarray:
+    """
+    Turns candles into a tape of four prints per candle, spread over the candle:
+    open, then low and high (high and low for a down candle), then close, each with a
+    quarter of the volume. Aggregating the tape back gives the same candles.
+    """
+    candles = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    step = timeframe_to_ms(timeframe) / 4
+    opens, highs, lows, closes = candles[:, 1], candles[:, 2], candles[:, 3], candles[:, 4]
+    up = closes >= opens
+    prices = np.column_stack((opens, np.where(up, lows, highs), np.where(up, highs, lows), closes))
+    timestamps = candles[:, :1] + np.arange(4) * step
+    tape = np.zeros((len(candles) * 4, 6))
+    tape[:, 0] = timestamps.ravel()
+    tape[:, 1:5] = prices.reshape(-1, 1)
+    tape[:, 5] = np.repeat(candles[:, 5] / 4, 4)
+    return tape
+
+def load_candles_csv(path):
+    """Reads recorded candles from a CSV file with timestamp (ms), open, high, low, close and volume columns."""
+    with open(path, newline='') as f:
+        return [[int(float(row['timestamp'])), float(row['open']), float(row['high']), float(row['low']),
+                 float(row['close']), float(row['volume'])] for row in csv.DictReader(f)]
+
+def _api(method):
+    """Public methods run one at a time, after the market is replayed up to the clock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self.calls[method.__name__] += 1
+            self._advance()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class SimulatedExchange:
+    """
+    A ccxt stand-in for one market, fed by a tape of prints.
+
+    Args:
+        tape: (n, 6) rows [timestamp_ms, price, price, price, price, amount] sorted by
+              time (see candles_to_tape and from_trades). Prints before the clock's
+              start are history: fetch_ohlcv serves them but they fill nothing.
+        clock (SimClock): Simulated time; defaults to real time from the tape's start.
+        symbol (str): The unified symbol; `market_id` (default: the same) is the raw one.
+        settle (str): Currency of the balance, PnL and fees.
+        inverse (bool): Contracts are worth `contract_size` quote units (XBTUSD) instead
+                        of `contract_size` base units.
+        respect_volume (bool): Fills are limited by the amount of each print. Turn off
+                               when the recording's volume is in other units than the
+                               order amounts; every order a print crosses then fills in full.
+    """
+
+    id = 'simulator'
+
+    def __init__(self, tape, clock=None, symbol='XBTUSD', market_id=None, tick_size=0.5, spread_ticks=1,
+                 initial_balance=1.0, settle='XBT', inverse=True, contract_size=1.0,
+                 maker_fee=0.0, taker_fee=0.0, respect_volume=True):
+        self.tape = np.asarray(tape, dtype=np.float64).reshape(-1, 6)
+        if len(self.tape) == 0:
+            raise ValueError("The tape is empty.")
+        self.clock = clock or SimClock(int(self.tape[0, 0]))
+        if self.clock.end_ms is None:
+            self.clock.end_ms = int(self.tape[-1, 0])
+        self.symbol = symbol
+        self.market_id = market_id or symbol
+        self.tick_size = tick_size
+        self.half_spread = spread_ticks * tick_size / 2
+        self.settle = settle
+        self.inverse = inverse
+        self.contract_size = contract_size
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.respect_volume = respect_volume
+
+        self.has = {'fetchOHLCV': True, 'fetchPositions': True, 'editOrder': True,
+                    'createOrders': False, 'cancelOrders': False}
+        self.options = {}
+        self.markets = {symbol: {'id': self.market_id, 'symbol': symbol, 'settle': settle, 'inverse': inverse,
+                                 'linear': not inverse, 'contractSize': contract_size,
+                                 'precision': {'price': tick_size}}}
+        self.calls = Counter()
+        self.fills = 0
+
+        self._lock = threading.RLock()
+        self._cursor = int(np.searchsorted(self.tape[:, 0], self.clock.milliseconds(), side='right'))
+        self._last_price = float(self.tape[max(self._cursor - 1, 0), 4])
+        self._order_ids = itertools.count(1)
+        self._priority = itertools.count()
+        self._orders = {}
+        self._queue_position = {}
+        self._bids = []
+        self._asks = []
+        self._stops = []
+
+        self._wallet = float(initial_balance)
+        self._position = 0.0
+        self._entry_price = 0.0
+        self._realized_pnl = 0.0
+
+    @classmethod
+    def from_trades(cls, trades, **kwargs):
+        """Builds the tape from ccxt-style trades (dicts with 'timestamp', 'price' and 'amount')."""
+        return cls(trades_to_rows(trades), **kwargs)
+
+    @classmethod
+    def from_candles(cls, ohlcv, timeframe, **kwargs):
+        """Builds the tape from candles of `timeframe` ([timestamp_ms, o, h, l, c, v] rows)."""
+        return cls(candles_to_tape(ohlcv, timeframe), **kwargs)
+
+    # --- ccxt Methods ---
+    def milliseconds(self):
+        return self.clock.milliseconds()
+
+    def set_sandbox_mode(self, enabled):
+        pass
+
+    @_api
+    def load_markets(self, reload=False, params={}):
+        return self.markets
+
+    @_api
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        """Candles of the prints the clock has passed; the last one is still forming."""
+        self._check_symbol(symbol)
+        bucket_ms = timeframe_to_ms(timeframe)
+        timestamps = self.tape[:self._cursor, 0]
+        if since is not None:
+            start = np.searchsorted(timestamps, since // bucket_ms * bucket_ms)
+        elif limit:
+            start = np.searchsorted(timestamps, (self.milliseconds() // bucket_ms - limit + 1) * bucket_ms)
+        else:
+            start = 0
+        candles = aggregate_rows(self.tape[start:self._cursor], bucket_ms).tolist()
+        if limit:
+            candles = candles[:limit] if since is not None else candles[-limit:]
+        return [[int(candle[0])] + candle[1:] for candle in candles]
+
+    @_api
+    def fetch_ticker(self, symbol, params={}):
+        self._check_symbol(symbol)
+        now_ms = self.milliseconds()
+        return {'symbol': self.symbol, 'timestamp': now_ms, 'datetime': self._iso(now_ms),
+                'last': self._last_price, 'close': self._last_price,
+                'bid': self._last_price - self.half_spread, 'ask': self._last_price + self.half_spread}
+
+    @_api
+    def fetch_balance(self, params={}):
+        total = self._wallet + self._unrealized_pnl()
+        return {'info': [], 'free': {self.settle: total}, 'used': {self.settle: 0.0},
+                'total': {self.settle: total}, self.settle: {'free': total, 'used': 0.0, 'total': total}}
+
+    @_api
+    def fetch_positions(self, symbols=None, params={}):
+        side = 'long' if self._position > 0 else 'short' if self._position < 0 else None
+        return [{'symbol': self.symbol, 'side': side, 'contracts': abs(self._position),
+                 'contractSize': self.contract_size, 'entryPrice': self._entry_price or None,
+                 'markPrice': self._last_price, 'unrealizedPnl': self._unrealized_pnl(),
+                 'realizedPnl': self._realized_pnl, 'timestamp': self.milliseconds(),
+                 'info': self._raw_position()}]
+
+    @_api
+    def private_get_position(self, params={}):
+        """The raw BitMEX /position response."""
+        return [self._raw_position()]
+
+    @_api
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._check_symbol(symbol)
+        orders = [dict(order) for order in self._orders.values() if order['status'] == 'open']
+        return orders[-limit:] if limit else orders
+
+    @_api
+    def fetch_order(self, id, symbol=None, params={}):
+        return dict(self._get_order(id))
+
+    @_api
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        """Places a limit or market order; a 'stopPrice' or 'triggerPrice' param makes it a stop order."""
+        self._check_symbol(symbol)
+        if side not in ('buy', 'sell'):
+            raise ccxt.InvalidOrder(f"Invalid side '{side}'.")
+        if type not in ('limit', 'market'):
+            raise ccxt.InvalidOrder(f"Unsupported order type '{type}'.")
+        if not amount or amount <= 0:
+            raise ccxt.InvalidOrder(f"Invalid amount {amount}.")
+        if type == 'limit':
+            self._check_price(price)
+        trigger_price = params.get('stopPrice') or params.get('triggerPrice')
+        if trigger_price:
+            self._check_price(trigger_price)
+
+        now_ms = self.milliseconds()
+        order = {'id': str(next(self._order_ids)), 'clientOrderId': params.get('clientOrderId'),
+                 'timestamp': now_ms, 'datetime': self._iso(now_ms), 'lastTradeTimestamp': None,
+                 'symbol': self.symbol, 'type': type, 'side': side, 'price': price if type == 'limit' else None,
+                 'stopPrice': trigger_price, 'triggerPrice': trigger_price, 'amount': amount, 'filled': 0.0,
+                 'remaining': amount, 'cost': 0.0, 'average': None, 'status': 'open',
+                 'reduceOnly': bool(params.get('reduceOnly')), 'fee': {'cost': 0.0, 'currency': self.settle},
+                 'trades': [], 'info': {}}
+        self._orders[order['id']] = order
+
+        if trigger_price:
+            self._stops.append(order)
+        else:
+            self._execute(order, now_ms)
+        return dict(order)
+
+    def create_limit_order(self, symbol, side, amount, price, params={}):
+        return self.create_order(symbol, 'limit', side, amount, price, params)
+
+    def create_market_order(self, symbol, side, amount, price=None, params={}):
+        return self.create_order(symbol, 'market', side, amount, None, params)
+
+    def create_limit_buy_order(self, symbol, amount, price, params={}):
+        return self.create_order(symbol, 'limit', 'buy', amount, price, params)
+
+    def create_limit_sell_order(self, symbol, amount, price, params={}):
+        return self.create_order(symbol, 'limit', 'sell', amount, price, params)
+
+    def create_market_buy_order(self, symbol, amount, params={}):
+        return self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    def create_market_sell_order(self, symbol, amount, params={}):
+        return self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    @_api
+    def edit_order(self, id, symbol, type=None, side=None, amount=None, price=None, params={}):
+        """
+        Amends an open order. Like on BitMEX it keeps its place in the queue unless the
+        price changes or the size grows.
+        """
+        order = self._get_order(id)
+        if order['status'] != 'open':
+            raise ccxt.OrderNotFound(f"Order {id} is not open.")
+        trigger_price = params.get('stopPrice') or params.get('triggerPrice')
+        if price is not None and order['type'] == 'limit':
+            self._check_price(price)
+        if trigger_price:
+            self._check_price(trigger_price)
+
+        loses_priority = (price is not None and price != order['price']) or (amount is not None and amount > order['amount'])
+        if amount is not None:
+            if amount <= order['filled']:
+                raise ccxt.InvalidOrder(f"Amount {amount} is not above the filled {order['filled']}.")
+            order['amount'], order['remaining'] = amount, amount - order['filled']
+        if price is not None and order['type'] == 'limit':
+            order['price'] = price
+        if trigger_price:
+            order['stopPrice'] = order['triggerPrice'] = trigger_price
+
+        if order in self._stops:
+            return dict(order)
+        if loses_priority:
+            self._queue_position.pop(order['id'], None)
+            self._execute(order, self.milliseconds())
+        return dict(order)
+
+    @_api
+    def cancel_order(self, id, symbol=None, params={}):
+        order = self._get_order(id)
+        if order['status'] != 'open':
+            raise ccxt.OrderNotFound(f"Order {id} is already {order['status']}.")
+        self._close(order, 'canceled')
+        return dict(order)
+
+    @_api
+    def cancel_all_orders(self, symbol=None, params={}):
+        cancelled = [order for order in self._orders.values() if order['status'] == 'open']
+        for order in cancelled:
+            self._close(order, 'canceled')
+        return [dict(order) for order in cancelled]
+
+    def summary(self):
+        """Position, PnL and request counts so far, for the end of a soak test."""
+        with self._lock:
+            return {'time': self._iso(self.milliseconds()), 'last_price': self._last_price,
+                    'position': self._position, 'entry_price': self._entry_price,
+                    'realized_pnl': self._realized_pnl, 'unrealized_pnl': self._unrealized_pnl(),
+                    'balance': self._wallet + self._unrealized_pnl(), 'fills': self.fills,
+                    'open_orders': sum(order['status'] == 'open' for order in self._orders.values()),
+                    'calls': dict(self.calls)}
+
+    # --- Matching Engine ---
+    def _advance(self):
+        """Replays the prints up to the clock through the book."""
+        end = int(np.searchsorted(self.tape[:, 0], self.milliseconds(), side='right'))
+        if end <= self._cursor:
+            return
+        if not self._queue_position and not self._stops:
+            # Nothing to fill: skip straight to the last print
+            self._last_price = float(self.tape[end - 1, 4])
+            self._cursor = end
+            return
+        for timestamp, price, amount in self.tape[self._cursor:end][:, [0, 4, 5]].tolist():
+            self._cursor += 1
+            self._last_price = price
+            self._match_print(int(timestamp), price, amount)
+
+    def _match_print(self, timestamp, price, amount):
+        for order in [o for o in self._stops if self._is_triggered(o, price)]:
+            self._stops.remove(order)
+            self._execute(order, timestamp, fill_price=price)
+
+        for book, crosses in ((self._bids, lambda limit: limit >= price), (self._asks, lambda limit: limit <= price)):
+            volume = amount if self.respect_volume else float('inf')
+            while book and volume > 0:
+                _, queue_position, order_id = book[0]
+                order = self._orders[order_id]
+                if self._queue_position.get(order_id) != queue_position:
+                    heapq.heappop(book) # Cancelled, filled or re-queued since
+                    continue
+                if not crosses(order['price']):
+                    break
+                volume -= self._fill(order, min(order['remaining'], volume), order['price'], timestamp, self.maker_fee)
+
+    @staticmethod
+    def _is_triggered(order, price):
+        return price >= order['stopPrice'] if order['side'] == 'buy' else price <= order['stopPrice']
+
+    def _execute(self, order, timestamp, fill_price=None):
+        """Fills a market order, or a limit order as far as it crosses the spread, and queues the rest."""
+        is_buy = order['side'] == 'buy'
+        touch = fill_price or (self._last_price + self.half_spread if is_buy else self._last_price - self.half_spread)
+        if order['type'] == 'market':
+            self._fill(order, order['remaining'], touch, timestamp, self.taker_fee)
+            if order['status'] == 'open':
+                self._close(order, 'closed' if order['filled'] else 'canceled')
+            return
+        if (is_buy and order['price'] >= touch) or (not is_buy and order['price'] <= touch):
+            self._fill(order, order['remaining'], touch, timestamp, self.taker_fee)
+        if order['status'] == 'open':
+            queue_position = next(self._priority)
+            self._queue_position[order['id']] = queue_position
+            key = -order['price'] if is_buy else order['price']
+            heapq.heappush(self._bids if is_buy else self._asks, (key, queue_position, order['id']))
+
+    def _fill(self, order, amount, price, timestamp, fee_rate):
+        """Fills up to `amount` of an order and returns the amount filled."""
+        signed = 1 if order['side'] == 'buy' else -1
+        if order['reduceOnly']:
+            amount = min(amount, max(-signed * self._position, 0.0))
+            if amount <= 0:
+                self._close(order, 'canceled')
+                return 0.0
+        value = self._value(amount, price)
+        fee = value * fee_rate
+        self._apply_fill(signed * amount, price)
+        self._wallet -= fee
+        self.fills += 1
+
+        order['average'] = (price * amount + (order['average'] or 0.0) * order['filled']) / (order['filled'] + amount)
+        order['filled'] += amount
+        order['remaining'] = order['amount'] - order['filled']
+        order['cost'] += value
+        order['fee']['cost'] += fee
+        order['lastTradeTimestamp'] = timestamp
+        order['trades'].append({'timestamp': timestamp, 'price': price, 'amount': amount, 'fee': fee})
+        if order['remaining'] <= 1e-12:
+            self._close(order, 'closed')
+        return amount
+
+    def _close(self, order, status):
+        order['status'] = status
+        self._queue_position.pop(order['id'], None)
+        if order in self._stops:
+            self._stops.remove(order)
+
+    # --- Position Accounting ---
+    def _value(self, contracts, price):
+        """Notional value of `contracts` at `price` in the settlement currency."""
+        return contracts * self.contract_size / price if self.inverse else contracts * self.contract_size * price
+
+    def _pnl(self, signed_contracts, entry_price, exit_price):
+        if self.inverse:
+            return signed_contracts * self.contract_size * (1 / entry_price - 1 / exit_price)
+        return signed_contracts * self.contract_size * (exit_price - entry_price)
+
+    def _apply_fill(self, signed_amount, price):
+        position = self._position
+        if position == 0 or (position > 0) == (signed_amount > 0):
+            # Opening or adding: the entry is the average price (harmonic for inverse contracts)
+            size = abs(position) + abs(signed_amount)
+            if self.inverse:
+                self._entry_price = size / (abs(position) / (self._entry_price or price) + abs(signed_amount) / price)
+            else:
+                self._entry_price = (abs(position) * self._entry_price + abs(signed_amount) * price) / size
+            self._position = position + signed_amount
+            return
+
+        closing = min(abs(signed_amount), abs(position))
+        pnl = self._pnl(closing if position > 0 else -closing, self._entry_price, price)
+        self._realized_pnl += pnl
+        self._wallet += pnl
+        self._position = position + signed_amount
+        if abs(self._position) < 1e-12:
+            self._position, self._entry_price = 0.0, 0.0
+        elif (self._position > 0) != (position > 0):
+            self._entry_price = price # Flipped: the rest opened at this fill
+
+    def _unrealized_pnl(self):
+        if not self._position:
+            return 0.0
+        return self._pnl(self._position, self._entry_price, self._last_price)
+
+    def _raw_position(self):
+        return {'symbol': self.market_id, 'currentQty': self._position, 'avgEntryPrice': self._entry_price or None,
+                'isOpen': bool(self._position), 'markPrice': self._last_price, 'lastPrice': self._last_price,
+                'unrealisedPnl': self._unrealized_pnl(), 'realisedPnl': self._realized_pnl}
+
+    # --- Helpers ---
+    def _check_symbol(self, symbol):
+        if symbol is not None and symbol not in (self.symbol, self.market_id):
+            raise ccxt.BadSymbol(f"{self.id} only simulates {self.symbol}, not {symbol}.")
+
+    def _check_price(self, price):
+        if price is None or price <= 0:
+            raise ccxt.InvalidOrder(f"Invalid price {price}.")
+        ticks = price / self.tick_size
+        if abs(ticks - round(ticks)) > 1e-9:
+            raise ccxt.InvalidOrder(f"Price {price} is not a multiple of the tick size {self.tick_size}.")
+
+    def _get_order(self, id):
+        order = self._orders.get(str(id))
+        if order is None:
+            raise ccxt.OrderNotFound(f"Order {id} not found.")
+        return order
+
+    @staticmethod
+    def _iso(timestamp_ms):
+        return datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+class AsyncSimulatedExchange:
+    """
+    A SimulatedExchange with the API of a ccxt.async_support client: its API methods
+    are coroutines, everything else (milliseconds, has, the clock, ...) is passed
+    through. The calls still run one at a time and without network latency, so
+    concurrent requests overlap only in the order they are made.
+    """
+
+    def __init__(self, exchange):
+        self.sync = exchange
+
+    def __getattr__(self, name):
+        attribute = getattr(self.sync, name)
+        if not hasattr(attribute, '__wrapped__'): # Only the @_api methods are requests
+            return attribute
+
+        @functools.wraps(attribute)
+        async def request(*args, **kwargs):
+            return attribute(*args, **kwargs)
+        return request
+
+    async def close(self):
+        pass
+
+# --- Soak Tests ---
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Bot name -> (directory, module, entry function); lrc_grid_bot is run through its TradingBot class
+BOTS = {
+    'lrc_grid_bot': ('lrc_grid_bot', 'main', None),
+    'lrc_io_bot': ('lrc_io_bot', 'live_bot', 'run_bot'),
+    'crypto_bot': ('crypto_bot', 'live_bot', 'main'),
+    'in_and_out': ('In-and-outbot', 'live_bot', 'main'),
+}
+
+def run_bot(name, exchange, workdir, use_async=None):
+    """
+    Runs a live bot against the simulator until the tape is over. The bot's module gets
+    the simulator instead of its ccxt client and the simulator's clock as its `time`.
+    Files the bot writes (state, logs) go to `workdir`.
+
+    lrc_grid_bot runs as AsyncTradingBot on an AsyncSimulatedExchange when `use_async`
+    is true, as TradingBot when it is false, and as its config.USE_ASYNC_EXCHANGE
+    selects when it is None.
+    """
+    directory, module_name, entry = BOTS[name]
+    bot_dir = os.path.join(ROOT, directory)
+    if os.path.exists(os.path.join(bot_dir, 'config.json')):
+        shutil.copy(os.path.join(bot_dir, 'config.json'), workdir)
+    os.environ.pop('MARKET_DATA_ADDRESS', None) # Candles come from the simulator, not the daemon
+    os.chdir(workdir)
+    sys.path.insert(0, bot_dir)
+    module = importlib.import_module(module_name)
+    module.time = exchange.clock
+
+    if entry is not None:
+        module.initialize_exchange = lambda: exchange
+        if hasattr(module, 'get_server_time'):
+            module.get_server_time = lambda: 0
+        getattr(module, entry)()
+        return
+
+    import config
+    import lrc_calculator
+    from async_exchange_manager import AsyncExchangeManager
+    from exchange_manager import ExchangeManager
+
+    class SimulatedExchangeManager(ExchangeManager):
+        _create_client = staticmethod(lambda *args: exchange)
+
+    class AsyncSimulatedExchangeManager(AsyncExchangeManager):
+        _create_client = staticmethod(lambda *args: AsyncSimulatedExchange(exchange))
+
+    config.STATE_FILE_PATH = os.path.join(workdir, 'state.json')
+    module.lrc_calculator_module = lrc_calculator
+    module.ExchangeManager = SimulatedExchangeManager
+    module.AsyncExchangeManager = AsyncSimulatedExchangeManager
+    if use_async is None:
+        use_async = config.USE_ASYNC_EXCHANGE
+    bot = module.AsyncTradingBot() if use_async else module.TradingBot()
+    bot.scheduler.clock = exchange.clock.time
+    bot.scheduler.sleep = exchange.clock.sleep
+    bot.run()
+
+def parse_time_ms(value):
+    """Accepts Unix milliseconds or an ISO 8601 datetime."""
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak tests a live bot against a simulated exchange.")
+    parser.add_argument('recording', help="CSV of trades (timestamp, price, amount) or candles (see --candles)")
+    parser.add_argument('--candles', metavar='TIMEFRAME', help="The recording holds candles of this timeframe")
+    parser.add_argument('--bot', choices=sorted(BOTS), default='lrc_grid_bot')
+    parser.add_argument('--start', help="Simulation start (ms or ISO 8601); earlier data is the bot's history")
+    parser.add_argument('--speed', type=float, default=1000.0, help="Multiple of real time; 0 runs as fast as possible")
+    parser.add_argument('--symbol', default='XBTUSD')
+    parser.add_argument('--balance', type=float, default=1.0, help="Starting balance in XBT")
+    parser.add_argument('--ignore-volume', action='store_true',
+                        help="Fill every crossed order in full (when the recorded volume is not in contracts)")
+    parser.add_argument('--sync', action='store_true',
+                        help="Run lrc_grid_bot as the synchronous TradingBot whatever USE_ASYNC_EXCHANGE says")
+    args = parser.parse_args()
+
+    if args.candles:
+        tape = candles_to_tape(load_candles_csv(args.recording), args.candles)
+    else:
+        tape = trades_to_rows(load_trades_csv(args.recording))
+    start_ms = parse_time_ms(args.start) if args.start else int(tape[0, 0])
+    clock = SimClock(start_ms, speed=args.speed or None)
+    exchange = SimulatedExchange(tape, clock=clock, symbol=args.symbol, initial_balance=args.balance,
+                                 respect_volume=not args.ignore_volume)
+
+    workdir = tempfile.mkdtemp(prefix=f'soak_{args.bot}_')
+    print(f"Soak testing {args.bot} from {exchange._iso(start_ms)} to {exchange._iso(clock.end_ms)} "
+          f"at {'full' if not args.speed else f'{args.speed:g}x'} speed. Bot files: {workdir}")
+    started = time.monotonic()
+    try:
+        run_bot(args.bot, exchange, workdir, use_async=False if args.sync else None)
+    except (SimulationFinished, KeyboardInterrupt):
+        pass
+    print(f"Simulation finished in {time.monotonic() - started:.1f}s: {exchange.summary()}")
+
+if __name__ == '__main__':
+    main()
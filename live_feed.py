@@ -0,0 +1,253 @@
+"""
+Server-push fan-out of live market data to the chart servers.
+
+Every chart page used to poll its server, which polled the exchange, so each open
+dashboard added its own REST calls. Here a symbol has one upstream trade
+subscription (a ccxt.pro WebSocket when the exchange supports it, otherwise a
+single REST poller) no matter how many charts are open. Its trades go to every
+chart channel built on that symbol, and each channel's updates are pushed to its
+connected clients (e.g. over Server-Sent Events).
+
+A channel is any object with two methods:
+    add_trades(trades)       Applies new ccxt trades (called on the upstream thread).
+    payload(since_ms=None)   Returns the update to push: with since_ms, everything from
+                             that time on (sent to a client when it connects); without,
+                             what changed since the previous call, or None if nothing did.
+
+Channel updates are coalesced: the publisher pushes at most one payload per channel
+every `push_interval` seconds, however many trades arrived in between.
+"""
+import asyncio
+import queue
+import threading
+import time
+import ccxt
+from exchange_pool import exchange_pool
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError: # Older ccxt releases ship without the WebSocket clients
+    ccxtpro = None
+
+class TradeStream(threading.Thread):
+    """
+    One upstream trade subscription for a symbol, run on its own daemon thread.
+
+    Args:
+        on_trades (callable): Called with each batch of new trades.
+        poll_seconds (float): Interval of the REST fallback when the exchange has no
+                              WebSocket client.
+    """
+
+    def __init__(self, exchange_id, symbol, on_trades, sandbox=False, config=None, poll_seconds=1.0):
+        super().__init__(name=f"trades-{exchange_id}-{symbol}", daemon=True)
+        self.exchange_id = exchange_id
+        self.symbol = symbol
+        self.on_trades = on_trades
+        self.sandbox = sandbox
+        self.config = config or {}
+        self.poll_seconds = poll_seconds
+        self._stopped = threading.Event()
+
+    @property
+    def uses_websocket(self):
+        return ccxtpro is not None and hasattr(ccxtpro, self.exchange_id)
+
+    def stop(self):
+        """Stops the stream; a WebSocket stream exits when its next message arrives."""
+        self._stopped.set()
+
+    def run(self):
+        if self.uses_websocket:
+            asyncio.run(self._watch())
+        else:
+            self._poll()
+
+    def _emit(self, trades):
+        if trades and not self._stopped.is_set():
+            self.on_trades(trades)
+
+    async def _watch(self):
+        exchange = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True, **self.config})
+        if self.sandbox:
+            exchange.set_sandbox_mode(True)
+        backoff = 1.0
+        try:
+            while not self._stopped.is_set():
+                try:
+                    # ccxt.pro returns only the trades received since the previous call
+                    trades = await exchange.watch_trades(self.symbol)
+                    backoff = 1.0
+                except ccxt.BaseError as e:
+                    print(f"Trade stream for {self.symbol} failed: {e}. Reconnecting in {backoff:.0f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+                    continue
+                self._emit(trades)
+        finally:
+            await exchange.close()
+
+    def _poll(self):
+        exchange = exchange_pool.get(self.exchange_id, sandbox=self.sandbox, config=self.config)
+        since = exchange.milliseconds()
+        seen_ids = set() # Ids of the trades at `since`, which the next page returns again
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                trades = exchange.fetch_trades(self.symbol, since=since)
+            except ccxt.BaseError as e:
+                print(f"Could not fetch {self.symbol} trades: {e}")
+                trades = []
+            new_trades = [t for t in trades if t['timestamp'] > since or t['id'] not in seen_ids]
+            if new_trades:
+                since = max(t['timestamp'] for t in new_trades)
+                seen_ids = {t['id'] for t in trades if t['timestamp'] == since}
+                self._emit(new_trades)
+            self._stopped.wait(max(0.0, self.poll_seconds - (time.monotonic() - started)))
+
+class _Channel:
+    def __init__(self, channel, stream_key):
+        self.channel = channel
+        self.stream_key = stream_key
+        self.clients = set()
+        self.dirty = False
+        # Held while a payload is built and queued, so clients receive payloads in order
+        self.publish_lock = threading.Lock()
+
+# Put on a client's queue when the feed drops it
+_CLOSED = object()
+
+class LiveFeed:
+    """
+    Args:
+        push_interval (float): Seconds between pushes of a channel's coalesced updates.
+        client_queue_size (int): Payloads buffered per client. A client that falls this
+                                 far behind is disconnected rather than sent a partial
+                                 history; it catches up when it reconnects.
+    """
+
+    def __init__(self, push_interval=0.25, client_queue_size=64, poll_seconds=1.0):
+        self.push_interval = push_interval
+        self.client_queue_size = client_queue_size
+        self.poll_seconds = poll_seconds
+        self._streams = {}
+        self._channels = {}
+        self._client_channels = {}
+        self._lock = threading.Lock()
+        self._publisher = None
+
+    def subscribe(self, exchange_id, symbol, channel_key, make_channel, sandbox=False, config=None, since_ms=None):
+        """
+        Connects a client to the channel `channel_key`, creating the channel with
+        `make_channel()` and the symbol's upstream stream on first use.
+
+        Args:
+            since_ms (int): When given, the client is first sent everything from this
+                            time on, covering what changed since it loaded the chart.
+
+        Returns:
+            queue.Queue: The client's queue of payloads, to be read with listen().
+        """
+        stream_key = (exchange_id, sandbox, symbol)
+        with self._lock:
+            entry = self._channels.get(channel_key)
+        if entry is None:
+            # Built outside the lock: seeding a channel fetches its history
+            new_entry = _Channel(make_channel(), stream_key)
+            with self._lock:
+                entry = self._channels.setdefault(channel_key, new_entry)
+
+        client = queue.Queue(maxsize=self.client_queue_size)
+        with entry.publish_lock:
+            with self._lock:
+                # The channel may have been released while it was being seeded
+                if self._channels.get(channel_key) is not entry:
+                    self._channels[channel_key] = entry
+                entry.clients.add(client)
+                self._client_channels[client] = channel_key
+                if stream_key not in self._streams:
+                    stream = TradeStream(exchange_id, symbol, lambda trades: self._on_trades(stream_key, trades),
+                                         sandbox=sandbox, config=config, poll_seconds=self.poll_seconds)
+                    self._streams[stream_key] = stream
+                    stream.start()
+                if self._publisher is None:
+                    self._publisher = threading.Thread(target=self._publish_loop, name='live-feed-publisher',
+                                                       daemon=True)
+                    self._publisher.start()
+            if since_ms is not None:
+                try:
+                    client.put_nowait(entry.channel.payload(since_ms))
+                except Exception:
+                    self.unsubscribe(client)
+                    raise
+        return client
+
+    def unsubscribe(self, client):
+        """Disconnects a client; idle channels and upstream streams are released."""
+        with self._lock:
+            channel_key = self._client_channels.pop(client, None)
+            entry = self._channels.get(channel_key)
+            if entry is None:
+                return
+            entry.clients.discard(client)
+            if entry.clients:
+                return
+            del self._channels[channel_key]
+            if not any(other.stream_key == entry.stream_key for other in self._channels.values()):
+                self._streams.pop(entry.stream_key).stop()
+
+    def listen(self, client, keepalive_seconds=15.0):
+        """
+        Yields the client's payloads as they arrive, and None after `keepalive_seconds`
+        without one (so the caller can write a keepalive). Returns when the client is dropped.
+        """
+        while True:
+            try:
+                payload = client.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield None
+                continue
+            if payload is _CLOSED:
+                return
+            yield payload
+
+    def _on_trades(self, stream_key, trades):
+        with self._lock:
+            entries = [entry for entry in self._channels.values() if entry.stream_key == stream_key]
+        for entry in entries:
+            try:
+                entry.channel.add_trades(trades)
+                entry.dirty = True
+            except Exception as e:
+                print(f"Could not apply trades to a live channel: {e}")
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.push_interval)
+            with self._lock:
+                dirty = [entry for entry in self._channels.values() if entry.dirty]
+            for entry in dirty:
+                entry.dirty = False
+                with entry.publish_lock:
+                    try:
+                        payload = entry.channel.payload()
+                    except Exception as e:
+                        print(f"Could not build a live update: {e}")
+                        continue
+                    if payload is not None:
+                        with self._lock:
+                            clients = list(entry.clients)
+                        for client in clients:
+                            self._push(client, payload)
+
+    def _push(self, client, payload):
+        try:
+            client.put_nowait(payload)
+        except queue.Full:
+            self.unsubscribe(client)
+            with client.mutex:
+                client.queue.clear()
+            client.put_nowait(_CLOSED)
+
+# The feed shared by every request of the process
+live_feed = LiveFeed()
@@ -0,0 +1,396 @@
+"""
+Shared Linear Regression Channel maths for every bot, backtester and chart in this repository.
+
+All functions take contiguous float64 arrays (a DataFrame column such as df['close'] is used
+as a view, without copying) and regress price against the bar index, like TradingView.
+
+This module, ohlcv_aggregator.py, exchange_pool.py and the other shared modules live in the
+repository root. Each bot folder is run as a script and puts the root on sys.path only under
+__main__; tools that import the bots (sweep.py, the benchmarks) set up the path themselves.
+"""
+import numpy as np
+import pandas as pd
+from collections import deque
+
+def as_float_array(values) -> np.ndarray:
+    """Returns values as a contiguous float64 array, without copying if it already is one."""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+def first_index_at_or_after(times, timestamp) -> int:
+    """Returns the index of the first bar whose time is >= timestamp (len(times) if there is none)."""
+    return int(np.searchsorted(np.asarray(times), timestamp, side='left'))
+
+def candle_columns(data, time_key='time', price_key='close'):
+    """
+    Returns (times, closes) arrays for the supported candle containers.
+
+    Args:
+        data: A DataFrame, a dict of arrays, or a list of candle dicts.
+
+    Returns:
+        tuple: (times, closes) as NumPy arrays.
+    """
+    if isinstance(data, list):
+        times = np.array([d[time_key] for d in data])
+        closes = np.fromiter((d[price_key] for d in data), dtype=np.float64, count=len(data))
+        return times, closes
+    return np.asarray(data[time_key]), as_float_array(data[price_key])
+
+def fit_lrc(closes) -> dict:
+    """
+    Fits a Linear Regression Channel to closing prices using the closed-form least-squares solution.
+
+    Args:
+        closes (array-like): Closing prices; the bar index 0..n-1 is the x-axis.
+
+    Returns:
+        dict: 'slope', 'intercept' (price at bar 0) and 'std_dev' (population std of the
+              residuals), or an empty dict if there are fewer than two prices.
+    """
+    closes = as_float_array(closes)
+    n = len(closes)
+    if n < 2:
+        return {}
+
+    x_mean = (n - 1) / 2
+    y_mean = closes.mean()
+    # Σ(x - x̄)² over 0..n-1 has a closed form, so only one pass over the prices is needed
+    s_xx = n * (n * n - 1) / 12
+    s_xy = np.dot(np.arange(n, dtype=np.float64) - x_mean, closes - y_mean)
+
+    slope = s_xy / s_xx
+    intercept = y_mean - slope * x_mean
+    residuals = closes - (slope * np.arange(n, dtype=np.float64) + intercept)
+    std_dev = np.sqrt(np.dot(residuals, residuals) / n)
+
+    return {
+        'slope': float(slope),
+        'intercept': float(intercept),
+        'std_dev': float(std_dev)
+    }
+
+def _lrc_from_sums(n, sum_y, sum_xy, sum_yy):
+    """
+    Solves the regression from its sums, with x = 0..n-1 for every channel.
+
+    Works element-wise on arrays; channels with n < 2 come out as NaN.
+
+    Returns:
+        tuple: (slope, intercept, std_dev) arrays.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        s_xx = sum_xx - sum_x * sum_x / n
+        s_xy = sum_xy - sum_x * sum_y / n
+        s_yy = sum_yy - sum_y * sum_y / n
+
+        slope = s_xy / s_xx
+        intercept = (sum_y - slope * sum_x) / n
+        std_dev = np.sqrt(np.maximum(s_yy - slope * s_xy, 0.0) / n)
+
+    too_short = n < 2
+    if np.any(too_short):
+        slope = np.where(too_short, np.nan, slope)
+        intercept = np.where(too_short, np.nan, intercept)
+        std_dev = np.where(too_short, np.nan, std_dev)
+    return slope, intercept, std_dev
+
+LRC_ANCHOR_DTYPE = np.dtype([
+    ('anchor_index', np.int64),
+    ('num_bars', np.int64),
+    ('slope', np.float64),
+    ('intercept', np.float64),
+    ('std_dev', np.float64),
+])
+
+def calculate_lrc_for_anchors(closes, anchor_indices) -> np.ndarray:
+    """
+    Calculates the LRC parameters for many candidate inflection points in one pass.
+
+    Each anchor's channel runs from closes[anchor] to the last close, exactly like
+    fit_lrc(closes[anchor:]) would. Instead of one polyfit per
+    anchor, suffix sums of y, x*y and y² are built once so every anchor is O(1).
+    To turn inflection timestamps into anchor indices use
+    np.searchsorted(timestamps_ms, inflection_ms).
+
+    Args:
+        closes (array-like): Closing prices in chronological order.
+        anchor_indices (array-like): Bar indices where each candidate channel starts.
+
+    Returns:
+        np.ndarray: A structured array (LRC_ANCHOR_DTYPE) with one row per anchor holding
+                    'anchor_index', 'num_bars', 'slope', 'intercept' and 'std_dev'.
+                    Parameters are NaN where fit_lrc would return an empty dict.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    anchors = np.asarray(anchor_indices, dtype=np.int64).ravel()
+    total = len(closes)
+
+    result = np.zeros(len(anchors), dtype=LRC_ANCHOR_DTYPE)
+    result['anchor_index'] = anchors
+    if len(anchors) and (anchors.min() < 0 or anchors.max() >= total):
+        raise ValueError(f"Anchor indices must be within [0, {total - 1}].")
+
+    # Measure x and y from the last bar so the sums stay small for recent anchors
+    x_from_end = np.arange(total, dtype=np.float64) - (total - 1)
+    y = closes - closes[-1] if total else closes
+
+    def suffix_sum(values):
+        return np.cumsum(values[::-1])[::-1]
+
+    sum_y = suffix_sum(y)[anchors]
+    sum_xy_from_end = suffix_sum(x_from_end * y)[anchors]
+    sum_yy = suffix_sum(y * y)[anchors]
+
+    n = (total - anchors).astype(np.float64)
+    # Shift x so the anchor bar is x = 0, as fit_lrc does
+    sum_xy = sum_xy_from_end + (n - 1) * sum_y
+
+    slope, intercept, std_dev = _lrc_from_sums(n, sum_y, sum_xy, sum_yy)
+    intercept = intercept + (closes[-1] if total else 0.0)
+
+    result['num_bars'] = n.astype(np.int64)
+    result['slope'] = slope
+    result['intercept'] = intercept
+    result['std_dev'] = std_dev
+    return result
+
+def _lrc_band_series(closes, starts, deviation, origin):
+    """
+    Builds per-bar channel series where bar i is fitted over closes[starts[i]:i + 1].
+
+    Uses prefix sums so every bar costs O(1); bars whose channel has fewer than
+    two candles are NaN. x and y are measured from bar `origin` to keep the sums
+    well conditioned.
+    """
+    total = len(closes)
+    bars = np.arange(total, dtype=np.float64)
+    price_origin = closes[origin] if total else 0.0
+    y = closes - price_origin
+
+    def prefix_sum(values):
+        return np.concatenate(([0.0], np.cumsum(values)))
+
+    ends = np.arange(1, total + 1)
+    sum_y_prefix = prefix_sum(y)
+    sum_xy_prefix = prefix_sum((bars - origin) * y)
+    sum_yy_prefix = prefix_sum(y * y)
+
+    n = (ends - starts).astype(np.float64)
+    sum_y = sum_y_prefix[ends] - sum_y_prefix[starts]
+    # Re-base x so each channel's first bar is x = 0
+    sum_xy = sum_xy_prefix[ends] - sum_xy_prefix[starts] - (starts - origin) * sum_y
+    sum_yy = sum_yy_prefix[ends] - sum_yy_prefix[starts]
+
+    slope, intercept, std_dev = _lrc_from_sums(n, sum_y, sum_xy, sum_yy)
+    # The mid line is the channel's value at its own last bar
+    with np.errstate(invalid='ignore'):
+        mid = intercept + slope * (n - 1) + price_origin
+
+    return {
+        'slope': slope,
+        'mid': mid,
+        'std_dev': std_dev,
+        'upper': mid + deviation * std_dev,
+        'lower': mid - deviation * std_dev
+    }
+
+def rolling_lrc(closes, window: int, deviation: float = 1.0) -> dict:
+    """
+    Calculates the LRC a bot would see at every bar if it refit the last `window` candles each cycle.
+
+    Bar i only uses closes[i - window + 1:i + 1], so there is no look-ahead. The whole
+    series is O(N) with cumulative sums; nothing is refit per bar.
+
+    Args:
+        closes (array-like): Closing prices in chronological order.
+        window (int): Number of candles in each regression (at least 2).
+        deviation (float): Number of standard deviations for the upper/lower bands.
+
+    Returns:
+        dict: Arrays 'slope', 'mid', 'std_dev', 'upper' and 'lower', one value per bar.
+              The first window - 1 bars are NaN.
+    """
+    if window < 2:
+        raise ValueError("The rolling LRC window must be at least 2 candles.")
+    closes = as_float_array(closes)
+    starts = np.arange(len(closes)) - window + 1
+    # Bars without a full window get an empty channel, which comes out as NaN
+    starts = np.where(starts < 0, np.arange(len(closes)) + 1, starts)
+    return _lrc_band_series(closes, starts, deviation, origin=len(closes) // 2)
+
+def expanding_lrc(closes, anchor_index: int = 0, deviation: float = 1.0) -> dict:
+    """
+    Calculates the LRC a bot anchored at an inflection point would see at every bar.
+
+    Bar i uses closes[anchor_index:i + 1], matching lrc_grid_bot refitting from
+    INFLECTION_POINT_DATETIME each cycle, in O(N) overall.
+
+    Args:
+        closes (array-like): Closing prices in chronological order.
+        anchor_index (int): Bar index of the inflection point.
+        deviation (float): Number of standard deviations for the upper/lower bands.
+
+    Returns:
+        dict: Arrays 'slope', 'mid', 'std_dev', 'upper' and 'lower', one value per bar.
+              Bars before anchor_index + 1 are NaN.
+    """
+    closes = as_float_array(closes)
+    bars = np.arange(len(closes))
+    starts = np.where(bars < anchor_index, bars + 1, anchor_index)
+    return _lrc_band_series(closes, starts, deviation, origin=min(anchor_index, max(len(closes) - 1, 0)))
+
+def timestamps_to_ms(timestamps: pd.Series) -> np.ndarray:
+    """Returns the 'timestamp' column as int64 milliseconds, whether it holds ints or datetimes."""
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return pd.DatetimeIndex(timestamps).as_unit('ms').asi8
+    return timestamps.to_numpy(dtype=np.int64)
+
+class IncrementalLRC:
+    """
+    A stateful Linear Regression Channel that is updated candle by candle.
+
+    Instead of re-running np.polyfit over every candle since the inflection point,
+    it keeps the running sums of the regression (Σy, Σxy, Σy²; Σx and Σx² follow
+    directly from the candle count since x is the bar index) so that appending a
+    closed candle, updating the still-forming last candle or dropping the oldest
+    candle of a fixed lookback window are all O(1).
+
+    The parameters it returns match fit_lrc on the same candles.
+    """
+
+    def __init__(self, inflection_timestamp: int = 0):
+        """
+        Args:
+            inflection_timestamp (int): The Unix timestamp (in seconds) from which to start the calculation.
+        """
+        self.inflection_ms = inflection_timestamp * 1000
+        self.reset()
+
+    def reset(self):
+        """Clears all candles and running sums."""
+        self._timestamps = deque()
+        self._closes = deque()
+        # Prices are stored relative to the first close to keep the sums well conditioned
+        self._price_offset = None
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        self._sum_yy = 0.0
+
+    def __len__(self):
+        return len(self._closes)
+
+    def append(self, timestamp_ms: int, close: float):
+        """Adds a newly opened candle at the end of the channel."""
+        if self._price_offset is None:
+            self._price_offset = float(close)
+        x = len(self._closes)
+        y = float(close) - self._price_offset
+
+        self._timestamps.append(int(timestamp_ms))
+        self._closes.append(y)
+        self._sum_y += y
+        self._sum_xy += x * y
+        self._sum_yy += y * y
+
+    def update_last(self, close: float):
+        """Replaces the close of the last (still-forming) candle."""
+        if not self._closes:
+            return
+        x = len(self._closes) - 1
+        old_y = self._closes[-1]
+        new_y = float(close) - self._price_offset
+
+        self._closes[-1] = new_y
+        self._sum_y += new_y - old_y
+        self._sum_xy += x * (new_y - old_y)
+        self._sum_yy += new_y * new_y - old_y * old_y
+
+    def drop_first(self):
+        """Removes the oldest candle, shifting every remaining bar index down by one."""
+        if not self._closes:
+            return
+        self._timestamps.popleft()
+        y = self._closes.popleft()
+        self._sum_y -= y
+        self._sum_yy -= y * y
+        # The dropped bar had x = 0; every other bar moves from x to x - 1
+        self._sum_xy -= self._sum_y
+
+    def sync(self, df_ohlcv: pd.DataFrame) -> dict:
+        """
+        Brings the channel in line with a freshly fetched OHLCV frame and returns its parameters.
+
+        Candles that fell out of the frame are dropped, the last known candle is updated and
+        newer candles are appended. If the frame doesn't line up with the stored candles
+        (e.g. a gap in the data) the channel is rebuilt from the frame.
+
+        Args:
+            df_ohlcv (pd.DataFrame): DataFrame with 'timestamp' and 'close' columns, sorted by time.
+
+        Returns:
+            dict: Same as fit_lrc.
+        """
+        if df_ohlcv.empty:
+            self.reset()
+            return {}
+        return self.sync_arrays(timestamps_to_ms(df_ohlcv['timestamp']), df_ohlcv['close'].to_numpy(dtype=np.float64))
+
+    def sync_arrays(self, timestamps, closes) -> dict:
+        """Same as sync, for sorted int64 ms timestamps and float closes given as arrays."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        closes = as_float_array(closes)
+        mask = timestamps >= self.inflection_ms
+        timestamps, closes = timestamps[mask], closes[mask]
+        if len(timestamps) == 0:
+            self.reset()
+            return {}
+
+        while self._timestamps and self._timestamps[0] < timestamps[0]:
+            self.drop_first()
+
+        start = 0
+        if self._timestamps and self._timestamps[0] == timestamps[0]:
+            last_pos = np.searchsorted(timestamps, self._timestamps[-1])
+            if last_pos < len(timestamps) and timestamps[last_pos] == self._timestamps[-1] \
+                    and last_pos + 1 == len(self._timestamps):
+                self.update_last(closes[last_pos])
+                start = last_pos + 1
+            else:
+                self.reset()
+        else:
+            self.reset()
+
+        for timestamp_ms, close in zip(timestamps[start:].tolist(), closes[start:].tolist()):
+            self.append(timestamp_ms, close)
+
+        return self.get_params()
+
+    def get_params(self) -> dict:
+        """
+        Returns the current LRC parameters in O(1).
+
+        Returns:
+            dict: 'slope', 'intercept', 'std_dev', or an empty dict if there is not enough data.
+        """
+        n = len(self._closes)
+        if n < 2:
+            return {}
+
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        s_xx = sum_xx - sum_x * sum_x / n
+        s_xy = self._sum_xy - sum_x * self._sum_y / n
+        s_yy = self._sum_yy - self._sum_y * self._sum_y / n
+
+        slope = s_xy / s_xx
+        intercept = (self._sum_y - slope * sum_x) / n
+        residual_ss = max(s_yy - slope * s_xy, 0.0)
+        std_dev = np.sqrt(residual_ss / n)
+
+        return {
+            'slope': float(slope),
+            'intercept': float(intercept + self._price_offset),
+            'std_dev': float(std_dev)
+        }
@@ -0,0 +1,197 @@
+import asyncio
+import ccxt.async_support as ccxt_async
+import pandas as pd
+from typing import Awaitable, Callable, List, Dict, Any
+
+from exchange_manager import ExchangeManager
+
+class AsyncExchangeManager(ExchangeManager):
+    """
+    ExchangeManager on ccxt.async_support: the same methods, as coroutines, so a cycle
+    can await several requests at once with asyncio.gather. Requests still queue for
+    ccxt's (async) rate limiter. Call close() before the event loop ends.
+    """
+
+    @staticmethod
+    def _create_client(exchange_name: str, api_key: str, api_secret: str, is_testnet: bool):
+        exchange_class = getattr(ccxt_async, exchange_name)
+        exchange = exchange_class({
+            'apiKey': api_key,
+            'secret': api_secret,
+            'enableRateLimit': True,
+        })
+        if is_testnet:
+            exchange.set_sandbox_mode(True)
+        return exchange
+
+    async def close(self):
+        """Closes the client's HTTP session."""
+        await self.exchange.close()
+
+    async def fetch_ohlcv(self, timeframe: str, limit: int) -> pd.DataFrame:
+        """Fetches OHLCV data and returns it as a pandas DataFrame."""
+        try:
+            ohlcv = await self.exchange.fetch_ohlcv(self.symbol, timeframe, limit=limit)
+            df = self._ohlcv_frame(ohlcv)
+            self.logger.info(f"Fetched {len(df)} candles for {self.symbol} on {timeframe} timeframe.")
+            return df
+        except Exception as e:
+            self.logger.error(f"Error fetching OHLCV data: {e}")
+            return pd.DataFrame()
+
+    async def fetch_last_price(self) -> float:
+        """Fetches the last traded price, or None if the request fails."""
+        try:
+            ticker = await self.exchange.fetch_ticker(self.symbol)
+            return ticker.get('last')
+        except Exception as e:
+            self.logger.error(f"Error fetching ticker: {e}")
+            return None
+
+    async def fetch_balance(self) -> Dict[str, Any]:
+        """Fetches the account balance (ccxt structure), or an empty dict if the request fails."""
+        try:
+            return await self.exchange.fetch_balance()
+        except Exception as e:
+            self.logger.error(f"Error fetching balance: {e}")
+            return {}
+
+    async def get_current_position(self) -> Dict[str, Any]:
+        """Fetches the current position for the bot's symbol, or None if the request fails."""
+        try:
+            positions = await self.exchange.fetch_positions([self.symbol])
+            return self._parse_position(positions)
+        except Exception as e:
+            self.logger.error(f"Error fetching current position: {e}")
+            return None
+
+    async def place_limit_order(self, side: str, amount: float, price: float, reduce_only: bool = False) -> Dict[str, Any]:
+        """Places a single limit order."""
+        try:
+            params = {'reduceOnly': reduce_only}
+            order = await self.exchange.create_limit_order(self.symbol, side, amount, price, params=params)
+            self.logger.info(f"Placed {side} limit order for {amount} {self.symbol} at {price}. ReduceOnly: {reduce_only}")
+            return order
+        except Exception as e:
+            self.logger.error(f"Error placing limit order: {e}")
+            return {}
+
+    async def place_stop_order(self, side: str, amount: float, stop_price: float, reduce_only: bool = True) -> Dict[str, Any]:
+        """Places a stop-market order triggered at `stop_price` (for the HSL)."""
+        try:
+            params = {'stopPrice': stop_price, 'reduceOnly': reduce_only}
+            order = await self.exchange.create_order(self.symbol, 'market', side, amount, None, params=params)
+            self.logger.info(f"Placed {side} stop order for {amount} {self.symbol} at {stop_price}. ReduceOnly: {reduce_only}")
+            return order
+        except Exception as e:
+            self.logger.error(f"Error placing stop order: {e}")
+            return {}
+
+    async def _edit_order(self, order_id: str, order: Dict[str, Any]) -> Dict[str, Any]:
+        if order['is_stop']:
+            return await self.exchange.edit_order(order_id, self.symbol, 'market', order['side'], order['amount'],
+                                                  None, params={'stopPrice': order['price']})
+        return await self.exchange.edit_order(order_id, self.symbol, 'limit', order['side'], order['amount'],
+                                              order['price'])
+
+    async def amend_order(self, order_id: str, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Moves an open order to the price and size of `order` (as built by order_reconciler.desired_order)."""
+        try:
+            amended = await self._edit_order(order_id, order)
+            self.logger.info(f"Amended order {order_id} to {order['amount']} at {order['price']}")
+            return amended
+        except Exception as e:
+            self.logger.error(f"Error amending order {order_id}: {e}")
+            return {}
+
+    async def fetch_open_orders(self) -> List[Dict[str, Any]]:
+        """Fetches the open orders for the symbol, or None if the request fails."""
+        try:
+            return await self.exchange.fetch_open_orders(self.symbol)
+        except Exception as e:
+            self.logger.error(f"Error fetching open orders: {e}")
+            return None
+
+    async def place_market_order(self, side: str, amount: float, reduce_only: bool = False) -> Dict[str, Any]:
+        """Places a single market order (for HSL)."""
+        try:
+            params = {'reduceOnly': reduce_only}
+            order = await self.exchange.create_market_order(self.symbol, side, amount, params=params)
+            self.logger.warning(f"Placed EMERGENCY {side} market order for {amount} {self.symbol}. ReduceOnly: {reduce_only}")
+            return order
+        except Exception as e:
+            self.logger.error(f"Error placing market order: {e}")
+            return {}
+
+    async def cancel_order(self, order_id: str):
+        """Cancels a single order by its ID."""
+        try:
+            await self.exchange.cancel_order(order_id, self.symbol)
+            self.logger.info(f"Successfully cancelled order {order_id}")
+        except Exception as e:
+            self.logger.error(f"Error cancelling order {order_id}: {e}")
+
+    async def cancel_all_orders(self):
+        """Cancels all open orders for the symbol."""
+        try:
+            await self.exchange.cancel_all_orders(self.symbol)
+            self.logger.info(f"Cancelled all open orders for {self.symbol}.")
+        except Exception as e:
+            self.logger.error(f"Error cancelling all orders: {e}")
+
+    async def _run_parallel(self, call: Callable[[Any], Awaitable], items: list) -> List[Dict[str, Any]]:
+        """Awaits call(item) for every item with at most max_concurrency requests in flight, keeping the order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(item):
+            async with semaphore:
+                try:
+                    return {'result': await call(item), 'error': None}
+                except Exception as e:
+                    return {'result': None, 'error': str(e)}
+
+        return list(await asyncio.gather(*(run(item) for item in items)))
+
+    async def _run_bulk(self, call: Callable[[list], Awaitable], items: list) -> List[Dict[str, Any]]:
+        """Sends items through a native bulk endpoint in chunks of batch_size; a failed chunk fails all its items."""
+        outcomes = []
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            try:
+                outcomes.extend(self._bulk_outcomes(await call(chunk)))
+            except Exception as e:
+                outcomes.extend({'result': None, 'error': str(e)} for _ in chunk)
+        return outcomes
+
+    async def place_orders_batch(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Same as ExchangeManager.place_orders_batch."""
+        if not orders:
+            return []
+        requests = [self._order_request(order) for order in orders]
+        if self.exchange.has.get('createOrders'):
+            outcomes = await self._run_bulk(self.exchange.create_orders, requests)
+        else:
+            outcomes = await self._run_parallel(lambda request: self.exchange.create_order(**request), requests)
+        results = [{'order': order, **outcome} for order, outcome in zip(orders, outcomes)]
+        self._log_batch("Placed order batch", results)
+        return results
+
+    async def cancel_orders_batch(self, order_ids: List[str]) -> List[Dict[str, Any]]:
+        """Same as ExchangeManager.cancel_orders_batch."""
+        if not order_ids:
+            return []
+        if self.exchange.has.get('cancelOrders'):
+            outcomes = await self._run_bulk(lambda ids: self.exchange.cancel_orders(ids, self.symbol), order_ids)
+        else:
+            outcomes = await self._run_parallel(lambda order_id: self.exchange.cancel_order(order_id, self.symbol), order_ids)
+        results = [{'order_id': order_id, **outcome} for order_id, outcome in zip(order_ids, outcomes)]
+        self._log_batch("Cancelled order batch", results)
+        return results
+
+    async def amend_orders_batch(self, amendments: List[tuple]) -> List[Dict[str, Any]]:
+        """Same as ExchangeManager.amend_orders_batch."""
+        outcomes = await self._run_parallel(lambda amendment: self._edit_order(*amendment), amendments)
+        results = [{'order_id': order_id, **outcome} for (order_id, _), outcome in zip(amendments, outcomes)]
+        if results:
+            self._log_batch("Amended order batch", results)
+        return results
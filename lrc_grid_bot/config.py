@@ -31,7 +31,16 @@ HSL_LEVEL = 5.0
 # Time delay in seconds for the Soft Stop Loss trigger
 SSL_TIME_DELAY_SECONDS = 1800 # 30 minutes
 
+# --- Order Management ---
+ORDER_TICK_SIZE = 0.5 # XBTUSD price increment
+ORDER_LOT_SIZE = 100 # XBTUSD contracts per lot
+ORDER_PRICE_TOLERANCE_TICKS = 4 # Live orders within this many ticks of their target price are left alone
+
 # --- Operational Parameters ---
-LOOP_INTERVAL_SECONDS = 60 # How often the main bot loop runs
+CANDLE_CLOSE_LAG_SECONDS = 3 # How long after each TIMEFRAME boundary the cycle runs (exchange publishing lag)
+HSL_CHECK_INTERVAL_SECONDS = 15 # How often the price is checked against the HSL between candle closes
 STATE_FILE_PATH = 'lrc_grid_bot/state.json'
-LOG_LEVEL = 'INFO' 
\ No newline at end of file
+STATE_SNAPSHOT_EVERY = 1000 # State changes journaled before the state file is rewritten
+STATE_FSYNC_INTERVAL_SECONDS = 1.0 # Most time journaled changes wait for an fsync (also synced every cycle)
+LOG_LEVEL = 'INFO'
+USE_ASYNC_EXCHANGE = True # Fetch each cycle's candles, position, orders and balance concurrently 
\ No newline at end of file
@@ -1,21 +1,26 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
 import ccxt
 import pandas as pd
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any
+
+from exchange_pool import make_throttle_thread_safe
 
 class ExchangeManager:
-    def __init__(self, api_key: str, api_secret: str, exchange_name: str, symbol: str, is_testnet: bool, logger):
+    def __init__(self, api_key: str, api_secret: str, exchange_name: str, symbol: str, is_testnet: bool, logger,
+                 max_concurrency: int = 4, batch_size: int = 10):
+        """
+        Args:
+            max_concurrency: Requests sent at once when a batch falls back to single-order calls.
+            batch_size: Orders per request of the exchange's native bulk endpoints.
+        """
         self.logger = logger
         self.symbol = symbol
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
         
         try:
-            exchange_class = getattr(ccxt, exchange_name)
-            self.exchange = exchange_class({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'enableRateLimit': True,
-            })
-            if is_testnet:
-                self.exchange.set_sandbox_mode(True)
+            self.exchange = self._create_client(exchange_name, api_key, api_secret, is_testnet)
             self.logger.info(f"Successfully connected to {exchange_name} (Testnet: {is_testnet})")
         except AttributeError:
             self.logger.error(f"Exchange '{exchange_name}' not found in ccxt.")
@@ -24,38 +29,77 @@ class ExchangeManager:
             self.logger.error(f"Error initializing exchange: {e}")
             raise
 
+    @staticmethod
+    def _create_client(exchange_name: str, api_key: str, api_secret: str, is_testnet: bool):
+        exchange_class = getattr(ccxt, exchange_name)
+        exchange = exchange_class({
+            'apiKey': api_key,
+            'secret': api_secret,
+            'enableRateLimit': True,
+        })
+        if is_testnet:
+            exchange.set_sandbox_mode(True)
+        # Batches fall back to parallel requests, which must still queue for the rate limit
+        make_throttle_thread_safe(exchange)
+        return exchange
+
     def fetch_ohlcv(self, timeframe: str, limit: int) -> pd.DataFrame:
         """Fetches OHLCV data and returns it as a pandas DataFrame."""
         try:
             ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            # Ensure timestamp is in UTC if timezone info is present
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+            df = self._ohlcv_frame(ohlcv)
             self.logger.info(f"Fetched {len(df)} candles for {self.symbol} on {timeframe} timeframe.")
             return df
         except Exception as e:
             self.logger.error(f"Error fetching OHLCV data: {e}")
             return pd.DataFrame()
 
+    def fetch_last_price(self) -> float:
+        """Fetches the last traded price, or None if the request fails."""
+        try:
+            ticker = self.exchange.fetch_ticker(self.symbol)
+            return ticker.get('last')
+        except Exception as e:
+            self.logger.error(f"Error fetching ticker: {e}")
+            return None
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        """Fetches the account balance (ccxt structure), or an empty dict if the request fails."""
+        try:
+            return self.exchange.fetch_balance()
+        except Exception as e:
+            self.logger.error(f"Error fetching balance: {e}")
+            return {}
+
     def get_current_position(self) -> Dict[str, Any]:
-        """Fetches the current position for the bot's symbol."""
+        """Fetches the current position for the bot's symbol, or None if the request fails."""
         try:
             # ccxt unified method for fetching positions
             positions = self.exchange.fetch_positions([self.symbol])
-            if positions:
-                # Filter for the specific symbol, as fetch_positions can return multiple
-                position = next((p for p in positions if p['symbol'] == self.symbol), None)
-                if position and position.get('contracts', 0) != 0:
-                    return {
-                        'side': position.get('side'),
-                        'size_contracts': position.get('contracts'),
-                        'entry_price': position.get('entryPrice')
-                    }
-            return {'side': 'none', 'size_contracts': 0.0, 'entry_price': 0.0}
+            return self._parse_position(positions)
         except Exception as e:
             self.logger.error(f"Error fetching current position: {e}")
-            return {'side': 'none', 'size_contracts': 0.0, 'entry_price': 0.0}
+            return None
             
+    @staticmethod
+    def _ohlcv_frame(ohlcv: list) -> pd.DataFrame:
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        # Ensure timestamp is in UTC if timezone info is present
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+        return df
+
+    def _parse_position(self, positions: list) -> Dict[str, Any]:
+        if positions:
+            # Filter for the specific symbol, as fetch_positions can return multiple
+            position = next((p for p in positions if p['symbol'] == self.symbol), None)
+            if position and position.get('contracts', 0) != 0:
+                return {
+                    'side': position.get('side'),
+                    'size_contracts': position.get('contracts'),
+                    'entry_price': position.get('entryPrice')
+                }
+        return {'side': 'none', 'size_contracts': 0.0, 'entry_price': 0.0}
+
     def place_limit_order(self, side: str, amount: float, price: float, reduce_only: bool = False) -> Dict[str, Any]:
         """Places a single limit order."""
         try:
@@ -67,6 +111,46 @@ class ExchangeManager:
             self.logger.error(f"Error placing limit order: {e}")
             return {}
 
+    def place_stop_order(self, side: str, amount: float, stop_price: float, reduce_only: bool = True) -> Dict[str, Any]:
+        """Places a stop-market order triggered at `stop_price` (for the HSL)."""
+        try:
+            params = {'stopPrice': stop_price, 'reduceOnly': reduce_only}
+            order = self.exchange.create_order(self.symbol, 'market', side, amount, None, params=params)
+            self.logger.info(f"Placed {side} stop order for {amount} {self.symbol} at {stop_price}. ReduceOnly: {reduce_only}")
+            return order
+        except Exception as e:
+            self.logger.error(f"Error placing stop order: {e}")
+            return {}
+
+    @property
+    def supports_amend(self) -> bool:
+        """Whether open orders can be amended in place instead of cancelled and placed again."""
+        return bool(self.exchange.has.get('editOrder'))
+
+    def _edit_order(self, order_id: str, order: Dict[str, Any]) -> Dict[str, Any]:
+        if order['is_stop']:
+            return self.exchange.edit_order(order_id, self.symbol, 'market', order['side'], order['amount'],
+                                            None, params={'stopPrice': order['price']})
+        return self.exchange.edit_order(order_id, self.symbol, 'limit', order['side'], order['amount'], order['price'])
+
+    def amend_order(self, order_id: str, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Moves an open order to the price and size of `order` (as built by order_reconciler.desired_order)."""
+        try:
+            amended = self._edit_order(order_id, order)
+            self.logger.info(f"Amended order {order_id} to {order['amount']} at {order['price']}")
+            return amended
+        except Exception as e:
+            self.logger.error(f"Error amending order {order_id}: {e}")
+            return {}
+
+    def fetch_open_orders(self) -> List[Dict[str, Any]]:
+        """Fetches the open orders for the symbol, or None if the request fails."""
+        try:
+            return self.exchange.fetch_open_orders(self.symbol)
+        except Exception as e:
+            self.logger.error(f"Error fetching open orders: {e}")
+            return None
+
     def place_market_order(self, side: str, amount: float, reduce_only: bool = False) -> Dict[str, Any]:
         """Places a single market order (for HSL)."""
         try:
@@ -92,4 +176,112 @@ class ExchangeManager:
             self.exchange.cancel_all_orders(self.symbol)
             self.logger.info(f"Cancelled all open orders for {self.symbol}.")
         except Exception as e:
-            self.logger.error(f"Error cancelling all orders: {e}") 
\ No newline at end of file
+            self.logger.error(f"Error cancelling all orders: {e}") 
+
+    def request_count(self, order_count: int, bulk_capability: str) -> int:
+        """Requests needed for `order_count` orders, given a ccxt bulk capability such as 'createOrders'."""
+        if self.exchange.has.get(bulk_capability):
+            return math.ceil(order_count / self.batch_size)
+        return order_count
+
+    def _order_request(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds the ccxt create_order arguments for an order built by order_reconciler.desired_order."""
+        params = {'reduceOnly': order.get('reduce_only', False)}
+        if order.get('is_stop'):
+            return {'symbol': self.symbol, 'type': 'market', 'side': order['side'], 'amount': order['amount'],
+                    'price': None, 'params': {**params, 'stopPrice': order['price']}}
+        return {'symbol': self.symbol, 'type': 'limit', 'side': order['side'], 'amount': order['amount'],
+                'price': order['price'], 'params': params}
+
+    def _run_parallel(self, call: Callable, items: list) -> List[Dict[str, Any]]:
+        """Runs call(item) for every item with at most max_concurrency requests in flight, keeping the order."""
+        def run(item):
+            try:
+                return {'result': call(item), 'error': None}
+            except Exception as e:
+                return {'result': None, 'error': str(e)}
+
+        if len(items) <= 1:
+            return [run(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            return list(executor.map(run, items))
+
+    def _run_bulk(self, call: Callable, items: list) -> List[Dict[str, Any]]:
+        """Sends items through a native bulk endpoint in chunks of batch_size; a failed chunk fails all its items."""
+        outcomes = []
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            try:
+                outcomes.extend(self._bulk_outcomes(call(chunk)))
+            except Exception as e:
+                outcomes.extend({'result': None, 'error': str(e)} for _ in chunk)
+        return outcomes
+
+    @staticmethod
+    def _bulk_outcomes(results: list) -> List[Dict[str, Any]]:
+        outcomes = []
+        for result in results:
+            # Bulk endpoints report rejected orders in place instead of raising
+            rejected = not result or result.get('id') is None
+            outcomes.append({'result': None if rejected else result,
+                             'error': f"rejected: {result.get('info') if result else result}" if rejected else None})
+        return outcomes
+
+    def _log_batch(self, action: str, results: List[Dict[str, Any]]):
+        failed = [r for r in results if r['error']]
+        if failed:
+            self.logger.error(f"{action}: {len(failed)} of {len(results)} orders failed: {failed[0]['error']}")
+        else:
+            self.logger.info(f"{action}: {len(results)} orders.")
+
+    def place_orders_batch(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Places several orders (as built by order_reconciler.desired_order) in as few round
+        trips as the exchange allows: its bulk endpoint where ccxt exposes createOrders,
+        otherwise parallel single-order requests.
+
+        Returns:
+            One {'order', 'result', 'error'} dict per order, in the same order; 'result' is
+            the ccxt order, or None with the reason in 'error'.
+        """
+        if not orders:
+            return []
+        requests = [self._order_request(order) for order in orders]
+        if self.exchange.has.get('createOrders'):
+            outcomes = self._run_bulk(self.exchange.create_orders, requests)
+        else:
+            outcomes = self._run_parallel(lambda request: self.exchange.create_order(**request), requests)
+        results = [{'order': order, **outcome} for order, outcome in zip(orders, outcomes)]
+        self._log_batch("Placed order batch", results)
+        return results
+
+    def cancel_orders_batch(self, order_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Cancels several orders through the exchange's bulk endpoint where ccxt exposes
+        cancelOrders, otherwise with parallel single-order requests.
+
+        Returns:
+            One {'order_id', 'result', 'error'} dict per id, in the same order.
+        """
+        if not order_ids:
+            return []
+        if self.exchange.has.get('cancelOrders'):
+            outcomes = self._run_bulk(lambda ids: self.exchange.cancel_orders(ids, self.symbol), order_ids)
+        else:
+            outcomes = self._run_parallel(lambda order_id: self.exchange.cancel_order(order_id, self.symbol), order_ids)
+        results = [{'order_id': order_id, **outcome} for order_id, outcome in zip(order_ids, outcomes)]
+        self._log_batch("Cancelled order batch", results)
+        return results
+
+    def amend_orders_batch(self, amendments: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Amends several orders, given as (order_id, desired order) pairs, with parallel requests.
+
+        Returns:
+            One {'order_id', 'result', 'error'} dict per amendment, in the same order.
+        """
+        outcomes = self._run_parallel(lambda amendment: self._edit_order(*amendment), amendments)
+        results = [{'order_id': order_id, **outcome} for (order_id, _), outcome in zip(amendments, outcomes)]
+        if results:
+            self._log_batch("Amended order batch", results)
+        return results
@@ -0,0 +1,285 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import lrc_calculator
+from lrc_calculator import IncrementalLRC, timestamps_to_ms
+from strategy import Strategy
+from utils import setup_logger
+
+class GridBacktester:
+    """
+    Event-driven replay of the LRC grid strategy on historical OHLCV bars.
+
+    At every candle close the channel is refit the way main.run_cycle does (the last
+    LRC_LOOKBACK_CANDLES candles from the inflection point, kept up to date with
+    IncrementalLRC) and the Strategy grids are regenerated. The orders then rest
+    during the next candle, whose high/low decide which of them fill:
+
+    - Flat: the 5-order entry grid in the favorable zone of the trend.
+    - In a position: the unfilled entry suborders, the TP grid on the other side of the
+      midline (the open size split evenly across the unfilled TP levels) and the HSL.
+    - The first TP fill revokes the remaining entries; the last one closes the trade and
+      with it the SSL/HSL.
+    - SSL: a close beyond SSL_LEVEL that persists for SSL_TIME_DELAY_SECONDS exits with a
+      limit order at that close.
+    - HSL: a touch of HSL_LEVEL exits immediately at market.
+    """
+
+    def __init__(self, config, initial_capital: float = 10000.0, maker_fee: float = 0.0,
+                 taker_fee: float = 0.0, logger=None):
+        """
+        Args:
+            config: The bot configuration module (zones, grid size, stop levels, lookback).
+            initial_capital (float): Starting equity in USD.
+            maker_fee (float): Fee on limit fills, as a fraction of the traded value.
+            taker_fee (float): Fee on the HSL market exit, as a fraction of the traded value.
+            logger: Optional logger; defaults to the bot's logger.
+        """
+        self.config = config
+        self.strategy = Strategy(config, lrc_calculator)
+        self.initial_capital = initial_capital
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.logger = logger or setup_logger(config.LOG_LEVEL)
+
+    # --- Order Book Of The Simulated Bot ---
+    def _reset_position(self):
+        self.position = {'side': 'none', 'size': 0.0, 'entry_price': 0.0}
+        self.entries_filled = 0
+        self.entries_active = True
+        self.tps_filled = 0
+        self.ssl_first_breach_ms = None
+        self.trade = None
+
+    def _place_orders(self, lrc_params: dict, latest_index: int):
+        """Regenerates the resting orders at a candle close, like one live cycle would."""
+        side = self.position['side']
+        self.orders = {'side': side, 'entry': np.empty(0), 'entry_usd': 0.0, 'tp': np.empty(0), 'tp_size': 0.0, 'hsl': None}
+        direction, zones = self.strategy.get_trade_direction_and_zones(lrc_params)
+
+        if side == 'none':
+            entry_grid = self.strategy.generate_entry_grid(lrc_params, latest_index, direction, zones)
+            self.orders['side'] = direction
+        elif self.entries_active:
+            entry_grid = self.strategy.generate_entry_grid(lrc_params, latest_index, side, zones)[self.entries_filled:]
+        else:
+            entry_grid = []
+
+        if entry_grid:
+            self.orders['entry'] = np.array([order['price'] for order in entry_grid])
+            self.orders['entry_usd'] = entry_grid[0]['amount']
+
+        if side != 'none':
+            tp_grid = self.strategy.generate_tp_grid(lrc_params, latest_index, side)[self.tps_filled:]
+            self.orders['tp'] = np.array([order['price'] for order in tp_grid])
+            self.orders['tp_size'] = self.position['size'] / len(tp_grid) if tp_grid else 0.0
+            self.orders['hsl'] = self.strategy.get_stop_loss_prices(lrc_params, latest_index, side)['hsl_price']
+
+    # --- Fills ---
+    def _record_fill(self, timestamp_ms: int, kind: str, side: str, price: float, size: float, fee_rate: float):
+        fee = price * size * fee_rate
+        self.realized_pnl -= fee
+        self.fills.append({
+            'timestamp': timestamp_ms, 'kind': kind, 'side': side,
+            'price': price, 'size': size, 'fee': fee
+        })
+        self.logger.debug(f"{pd.to_datetime(timestamp_ms, unit='ms')} {kind.upper()} {side} {size:.6f} @ {price:.2f}")
+
+    def _open(self, timestamp_ms: int, side: str, price: float, size: float):
+        if self.position['side'] == 'none':
+            self.position['side'] = side
+            self.trade = {'side': side, 'entry_time': timestamp_ms, 'max_size': 0.0, 'pnl_start': self.realized_pnl}
+        total = self.position['size'] + size
+        self.position['entry_price'] = (self.position['entry_price'] * self.position['size'] + price * size) / total
+        self.position['size'] = total
+        self.trade['max_size'] = max(self.trade['max_size'], total)
+        self._record_fill(timestamp_ms, 'entry', 'buy' if side == 'long' else 'sell', price, size, self.maker_fee)
+
+    def _reduce(self, timestamp_ms: int, kind: str, price: float, size: float, fee_rate: float):
+        side = self.position['side']
+        direction = 1 if side == 'long' else -1
+        size = min(size, self.position['size'])
+        self.realized_pnl += direction * (price - self.position['entry_price']) * size
+        self.position['size'] -= size
+        self._record_fill(timestamp_ms, kind, 'sell' if side == 'long' else 'buy', price, size, fee_rate)
+
+        if self.position['size'] <= 1e-12 or kind in ('ssl', 'hsl'):
+            self.position['size'] = 0.0
+            self.trades.append({
+                'side': side,
+                'entry_time': self.trade['entry_time'],
+                'exit_time': timestamp_ms,
+                'exit_reason': kind,
+                'max_size': self.trade['max_size'],
+                'pnl': self.realized_pnl - self.trade['pnl_start'],
+            })
+            self._reset_position()
+
+    def _fill_bar(self, timestamp_ms: int, bar_open: float, high: float, low: float):
+        """Fills the resting orders against one candle's high/low."""
+        orders = self.orders
+        side = orders['side']
+        was_in_position = self.position['side'] != 'none'
+
+        # HSL first: the worst case when a candle spans several levels
+        if was_in_position and orders['hsl'] is not None:
+            hit = low <= orders['hsl'] if side == 'long' else high >= orders['hsl']
+            if hit:
+                price = min(orders['hsl'], bar_open) if side == 'long' else max(orders['hsl'], bar_open)
+                self._reduce(timestamp_ms, 'hsl', price, self.position['size'], self.taker_fee)
+                return
+
+        # Entry limits: buys fill when the low reaches them, sells when the high does
+        if len(orders['entry']):
+            if side == 'long':
+                filled = orders['entry'] >= low
+                fill_prices = np.minimum(orders['entry'][filled], bar_open)
+            else:
+                filled = orders['entry'] <= high
+                fill_prices = np.maximum(orders['entry'][filled], bar_open)
+            for price in fill_prices:
+                self._open(timestamp_ms, side, float(price), orders['entry_usd'] / price)
+            self.entries_filled += len(fill_prices)
+
+        # TP limits only exist once a position was open at the previous close
+        if was_in_position and len(orders['tp']):
+            if side == 'long':
+                filled = orders['tp'] <= high
+                fill_prices = np.maximum(orders['tp'][filled], bar_open)
+            else:
+                filled = orders['tp'] >= low
+                fill_prices = np.minimum(orders['tp'][filled], bar_open)
+            for price in fill_prices:
+                # Revoke the unfilled entries after the first TP
+                self.entries_active = False
+                self.tps_filled += 1
+                last_tp = self.tps_filled >= self.config.SUB_ORDER_COUNT
+                size = self.position['size'] if last_tp else orders['tp_size']
+                self._reduce(timestamp_ms, 'tp', float(price), size, self.maker_fee)
+                if self.position['side'] == 'none':
+                    break
+
+    def _check_ssl(self, timestamp_ms: int, close: float, lrc_params: dict, latest_index: int):
+        """Exits when the close stays beyond the SSL level for SSL_TIME_DELAY_SECONDS."""
+        side = self.position['side']
+        ssl_price = self.strategy.get_stop_loss_prices(lrc_params, latest_index, side)['ssl_price']
+        breached = close < ssl_price if side == 'long' else close > ssl_price
+        if not breached:
+            self.ssl_first_breach_ms = None
+            return
+        if self.ssl_first_breach_ms is None:
+            self.ssl_first_breach_ms = timestamp_ms
+        if timestamp_ms - self.ssl_first_breach_ms >= self.config.SSL_TIME_DELAY_SECONDS * 1000:
+            self._reduce(timestamp_ms, 'ssl', close, self.position['size'], self.maker_fee)
+
+    # --- Replay ---
+    def run(self, df_ohlcv: pd.DataFrame, inflection_timestamp: int) -> Dict[str, Any]:
+        """
+        Replays the strategy over the candles.
+
+        Args:
+            df_ohlcv (pd.DataFrame): 'timestamp' (ms or datetimes), 'open', 'high', 'low', 'close', in time order.
+            inflection_timestamp (int): The Unix timestamp (in seconds) the channel is anchored to.
+
+        Returns:
+            dict: 'fills' and 'trades' DataFrames, the 'equity' Series (one value per candle)
+                  and a 'summary' dict.
+        """
+        timestamps = timestamps_to_ms(df_ohlcv['timestamp'])
+        opens, highs, lows, closes = (df_ohlcv[column].to_numpy(dtype=np.float64) for column in ('open', 'high', 'low', 'close'))
+
+        engine = IncrementalLRC(inflection_timestamp)
+        self.fills: List[Dict[str, Any]] = []
+        self.trades: List[Dict[str, Any]] = []
+        self.realized_pnl = 0.0
+        self.orders = None
+        self._reset_position()
+
+        equity = np.full(len(closes), self.initial_capital)
+        in_position = np.zeros(len(closes), dtype=bool)
+
+        for i in range(len(closes)):
+            if self.orders is not None:
+                self._fill_bar(timestamps[i], opens[i], highs[i], lows[i])
+
+            # Candle close: refit the channel and refresh the grid
+            self.orders = None
+            if timestamps[i] >= engine.inflection_ms:
+                engine.append(timestamps[i], closes[i])
+                if len(engine) > self.config.LRC_LOOKBACK_CANDLES:
+                    engine.drop_first()
+                lrc_params = engine.get_params()
+                if lrc_params and lrc_params['std_dev'] > 0: # A channel without width has no grid
+                    latest_index = len(engine) - 1
+                    if self.position['side'] != 'none':
+                        self._check_ssl(timestamps[i], closes[i], lrc_params, latest_index)
+                    self._place_orders(lrc_params, latest_index)
+
+            unrealized = 0.0
+            if self.position['side'] != 'none':
+                direction = 1 if self.position['side'] == 'long' else -1
+                unrealized = direction * (closes[i] - self.position['entry_price']) * self.position['size']
+                in_position[i] = True
+            equity[i] = self.initial_capital + self.realized_pnl + unrealized
+
+        if self.position['side'] != 'none':
+            self.trades.append({
+                'side': self.position['side'],
+                'entry_time': self.trade['entry_time'],
+                'exit_time': None,
+                'exit_reason': 'open',
+                'max_size': self.trade['max_size'],
+                'pnl': equity[-1] - self.initial_capital - self.trade['pnl_start'],
+            })
+
+        fills = pd.DataFrame(self.fills, columns=['timestamp', 'kind', 'side', 'price', 'size', 'fee'])
+        trades = pd.DataFrame(self.trades, columns=['side', 'entry_time', 'exit_time', 'exit_reason', 'max_size', 'pnl'])
+        equity_series = pd.Series(equity, index=pd.to_datetime(timestamps, unit='ms'), name='equity')
+
+        return {
+            'fills': fills,
+            'trades': trades,
+            'equity': equity_series,
+            'summary': self._summarize(fills, trades, equity, in_position, timestamps),
+        }
+
+    def _summarize(self, fills, trades, equity, in_position, timestamps) -> Dict[str, Any]:
+        closed = trades[trades['exit_reason'] != 'open']
+        durations_s = (closed['exit_time'] - closed['entry_time']) / 1000 if len(closed) else pd.Series(dtype=float)
+        peak = np.maximum.accumulate(equity) if len(equity) else equity
+
+        return {
+            'final_equity': float(equity[-1]) if len(equity) else self.initial_capital,
+            'total_pnl': float(equity[-1] - self.initial_capital) if len(equity) else 0.0,
+            'fills': len(fills),
+            'fees': float(fills['fee'].sum()) if len(fills) else 0.0,
+            'trades': len(closed),
+            'win_rate': float((closed['pnl'] > 0).mean()) if len(closed) else 0.0,
+            'exits_by_reason': closed['exit_reason'].value_counts().to_dict(),
+            'time_in_market': float(in_position.mean()) if len(in_position) else 0.0,
+            'avg_time_in_trade_s': float(durations_s.mean()) if len(durations_s) else 0.0,
+            'max_drawdown': float((equity / peak - 1).min()) if len(equity) else 0.0,
+        }
+
+
+if __name__ == '__main__':
+    # Usage: python lrc_grid_bot/grid_backtester.py candles.csv
+    # The CSV needs 'timestamp' (ms), 'open', 'high', 'low' and 'close' columns.
+    if len(sys.argv) < 2:
+        print("Usage: python grid_backtester.py <ohlcv.csv>")
+        sys.exit(1)
+
+    candles = pd.read_csv(sys.argv[1])
+    inflection_timestamp = int(pd.Timestamp(config.INFLECTION_POINT_DATETIME).timestamp())
+
+    results = GridBacktester(config).run(candles, inflection_timestamp)
+    print("\n--- LRC Grid Backtest Results ---")
+    for key, value in results['summary'].items():
+        print(f"{key}: {value}")
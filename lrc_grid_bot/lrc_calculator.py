@@ -1,13 +1,15 @@
 import numpy as np
 import pandas as pd
 
+from lrc_core import fit_lrc, timestamps_to_ms, IncrementalLRC, calculate_lrc_for_anchors, LRC_ANCHOR_DTYPE
+
 def calculate_lrc_channel(df_ohlcv: pd.DataFrame, inflection_timestamp: int):
     """
     Calculates the parameters of a Linear Regression Channel based on closing prices.
 
     Args:
         df_ohlcv (pd.DataFrame): DataFrame with 'timestamp', 'open', 'high', 'low', 'close', 'volume'.
-                                 Timestamp should be in milliseconds.
+                                 Timestamp should be in milliseconds (datetimes also work).
         inflection_timestamp (int): The Unix timestamp (in seconds) from which to start the calculation.
 
     Returns:
@@ -19,40 +21,18 @@ def calculate_lrc_channel(df_ohlcv: pd.DataFrame, inflection_timestamp: int):
 
     # Convert inflection point from seconds to milliseconds for comparison
     inflection_ms = inflection_timestamp * 1000
-    
-    # Filter data to start from the inflection point
-    calc_data = df_ohlcv[df_ohlcv['timestamp'] >= inflection_ms].copy()
-
-    if len(calc_data) < 2:
-        return {} # Not enough data points for regression
-
-    # Use a simple range of integers as the independent variable (x-axis)
-    indices = np.arange(len(calc_data))
-    source_prices = calc_data['close'].values
-
-    # Perform linear regression
-    try:
-        slope, intercept = np.polyfit(indices, source_prices, 1)
-    except np.linalg.LinAlgError:
-        return {} # Failed to converge
-
-    # Calculate the regression line values for each point
-    regression_values = slope * indices + intercept
 
-    # Calculate the deviations from the regression line
-    deviations = source_prices - regression_values
+    # Candles are in time order, so the inflection point is a single cut and the
+    # close column can be used as a view instead of copying the filtered frame
+    timestamps = timestamps_to_ms(df_ohlcv['timestamp'])
+    start = int(np.searchsorted(timestamps, inflection_ms, side='left'))
+    source_prices = df_ohlcv['close'].to_numpy(dtype=np.float64)[start:]
 
-    # Calculate the standard deviation of these deviations
-    std_dev = np.std(deviations)
-    
-    if std_dev == 0:
-        return {} # Avoid division by zero if all prices are on the line
+    lrc_params = fit_lrc(source_prices)
+    if not lrc_params or lrc_params['std_dev'] == 0:
+        return {} # Not enough data points, or all prices are on the line
 
-    return {
-        'slope': slope,
-        'intercept': intercept,
-        'std_dev': std_dev
-    }
+    return lrc_params
 
 def get_price_at_index(lrc_params: dict, index: int, std_dev_multiplier: float = 0.0):
     """
@@ -73,4 +53,4 @@ def get_price_at_index(lrc_params: dict, index: int, std_dev_multiplier: float =
     base_price = lrc_params['slope'] * index + lrc_params['intercept']
     price_offset = std_dev_multiplier * lrc_params['std_dev']
 
-    return base_price + price_offset 
\ No newline at end of file
+    return base_price + price_offset
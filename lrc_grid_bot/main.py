@@ -1,67 +1,179 @@
+import asyncio
+import os
+import sys
 import time
 import pandas as pd
 from datetime import datetime
 
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Import project modules
 import config
 from utils import setup_logger
 from state_manager import StateManager
 from exchange_manager import ExchangeManager
-from lrc_calculator import calculate_lrc_channel, get_price_at_index
+from async_exchange_manager import AsyncExchangeManager
+from lrc_calculator import IncrementalLRC, get_price_at_index
 from strategy import Strategy
+from scheduler import CandleCloseScheduler
+from order_reconciler import OrderReconciler, desired_order
 
 class TradingBot:
     def __init__(self):
         self.logger = setup_logger(config.LOG_LEVEL)
-        self.state_manager = StateManager(config.STATE_FILE_PATH, self.logger)
-        self.exchange = ExchangeManager(
+        self.state_manager = StateManager(config.STATE_FILE_PATH, self.logger, config.STATE_SNAPSHOT_EVERY,
+                                          config.STATE_FSYNC_INTERVAL_SECONDS)
+        self.exchange = self.create_exchange()
+        self.strategy = Strategy(config, lrc_calculator_module) # Pass the module itself
+        self.inflection_timestamp = int(datetime.fromisoformat(config.INFLECTION_POINT_DATETIME.replace('Z', '+00:00')).timestamp())
+        # Keeps the regression sums between cycles so only the changed candles are refitted
+        self.lrc_engine = IncrementalLRC(self.inflection_timestamp)
+        self.scheduler = CandleCloseScheduler(
+            config.TIMEFRAME, config.CANDLE_CLOSE_LAG_SECONDS, config.HSL_CHECK_INTERVAL_SECONDS, self.logger)
+        # The open position and its HSL price as of the last candle close, for the intra-candle check
+        self.hsl_watch = None
+        self.reconciler = OrderReconciler(
+            self.exchange, config.ORDER_TICK_SIZE, config.ORDER_PRICE_TOLERANCE_TICKS, self.logger)
+
+    def create_exchange(self):
+        return ExchangeManager(
             config.API_KEY, config.API_SECRET, config.EXCHANGE_NAME, 
             config.SYMBOL, config.IS_TESTNET, self.logger
         )
-        self.strategy = Strategy(config, lrc_calculator_module) # Pass the module itself
-        self.inflection_timestamp = int(datetime.fromisoformat(config.INFLECTION_POINT_DATETIME.replace('Z', '+00:00')).timestamp())
+
+    def resolve(self, result):
+        """Returns the result of an exchange call (AsyncTradingBot awaits it)."""
+        return result
 
     def run(self):
         self.logger.info("--- Starting LRC Grid Trading Bot ---")
-        while True:
-            try:
-                self.run_cycle()
-            except Exception as e:
-                self.logger.error(f"An unexpected error occurred in the main loop: {e}", exc_info=True)
-            
-            self.logger.info(f"--- Cycle finished. Waiting for {config.LOOP_INTERVAL_SECONDS} seconds. ---")
-            time.sleep(config.LOOP_INTERVAL_SECONDS)
+        try:
+            self.scheduler.run(self.on_candle_close, self.check_hsl)
+        finally:
+            self.state_manager.close()
+
+    def on_candle_close(self, close_time: float):
+        """Runs a cycle for the candle that closed at `close_time` (Unix seconds) and logs how late it decided."""
+        try:
+            self.run_cycle(close_time)
+        except Exception as e:
+            self.logger.error(f"An unexpected error occurred in the main loop: {e}", exc_info=True)
+        self.state_manager.sync()
+
+        latency = time.time() - close_time
+        self.logger.info(f"--- Cycle finished {latency:.2f}s after the {config.TIMEFRAME} candle close. ---")
 
-    def run_cycle(self):
-        """The main logic cycle for the bot."""
+    def run_cycle(self, close_time: float = None):
+        """The main logic cycle for the bot. With `close_time`, only candles closed by then are used."""
         self.logger.info("--- Starting new trading cycle ---")
 
-        # 1. Fetch data and calculate LRC
+        # 1. Fetch the market data, position, open orders and balance
         ohlcv_df = self.exchange.fetch_ohlcv(config.TIMEFRAME, config.LRC_LOOKBACK_CANDLES)
+        live_position = self.exchange.get_current_position()
+        open_orders = self.exchange.fetch_open_orders()
+        balance = self.exchange.fetch_balance()
+
+        desired_orders = self.decide(ohlcv_df, live_position, balance, close_time)
+        if desired_orders is not None:
+            # 3. Move the live orders to the grid of the new channel
+            self.reconciler.reconcile(desired_orders, open_orders)
+
+    def decide(self, ohlcv_df, live_position, balance, close_time: float = None):
+        """Calculates the LRC and returns the orders the grid wants, or None to skip the cycle."""
         if ohlcv_df.empty:
             self.logger.warning("Could not fetch OHLCV data. Skipping cycle.")
-            return
+            return None
+        if live_position is None:
+            # Taken as flat, it would cancel the TPs and the HSL of an open position
+            self.logger.warning("Could not fetch the position. Skipping cycle.")
+            return None
+
+        if close_time is not None:
+            # Drop the candle that just opened; decisions use the one that closed
+            closed_candle_time = pd.Timestamp(close_time - self.scheduler.timeframe_seconds, unit='s', tz='UTC')
+            ohlcv_df = ohlcv_df[ohlcv_df['timestamp'] <= closed_candle_time]
+            if ohlcv_df.empty or ohlcv_df['timestamp'].iloc[-1] < closed_candle_time:
+                self.logger.warning("The exchange has not published the closed candle yet; using the latest one it has.")
+            if ohlcv_df.empty:
+                return None
 
-        lrc_params = calculate_lrc_channel(ohlcv_df, self.inflection_timestamp)
+        lrc_params = self.lrc_engine.sync(ohlcv_df)
         if not lrc_params:
             self.logger.warning("Could not calculate LRC parameters. Skipping cycle.")
-            return
+            return None
+        if lrc_params['std_dev'] == 0:
+            self.logger.warning("The channel has no width (every close is on the line). Skipping cycle.")
+            return None
 
-        # 2. Get current state and position from the exchange
+        # 2. Get current state
         current_state = self.state_manager.get_state()
-        live_position = self.exchange.get_current_position()
         
         # This is a simplified logic loop. A full implementation would need to handle:
         # - Syncing state with the live position from the exchange.
         # - Checking if existing orders have been filled.
         # - Managing the SSL time-based trigger.
-        # - Managing the HSL price-based trigger.
-        # - Placing/updating entry grid orders if no position.
-        # - Placing/updating TP grid and stop orders if in a position.
         # - Handling the revoke logic after TPs are hit.
 
-        # For this example, we'll just print the calculated values.
         self.print_status(ohlcv_df, lrc_params, current_state, live_position)
+        free_balance = {currency: amount for currency, amount in balance.get('free', {}).items() if amount}
+        self.logger.info(f"Free balance: {free_balance}")
+        self.update_hsl_watch(lrc_params, len(ohlcv_df) - 1, live_position)
+        return self.build_desired_orders(lrc_params, len(ohlcv_df) - 1, live_position)
+
+    def build_desired_orders(self, lrc_params, latest_index, live_position):
+        """The entry grid when flat; the TP grid and the HSL stop when in a position."""
+        tick_size = config.ORDER_TICK_SIZE
+        if live_position['side'] == 'none':
+            direction, zones = self.strategy.get_trade_direction_and_zones(lrc_params)
+            side = 'buy' if direction == 'long' else 'sell'
+            entry_grid = self.strategy.generate_entry_grid(lrc_params, latest_index, direction, zones)
+            # Exchanges only take whole lots, and the reconciler keeps orders by exact amount
+            lot_size = config.ORDER_LOT_SIZE
+            total = sum(order['amount'] for order in entry_grid) // lot_size * lot_size
+            return [desired_order('entry', side, amount, order['price'], tick_size)
+                    for order, amount in zip(entry_grid, split_amount(total, len(entry_grid), lot_size))]
+
+        close_side = 'sell' if live_position['side'] == 'long' else 'buy'
+        size = live_position['size_contracts']
+        tp_grid = self.strategy.generate_tp_grid(lrc_params, latest_index, live_position['side'])
+        # The TP levels run from the midline outwards, so a small position exits nearest first
+        orders = [desired_order('tp', close_side, amount, order['price'], tick_size, reduce_only=True)
+                  for order, amount in zip(tp_grid, split_amount(size, len(tp_grid), config.ORDER_LOT_SIZE))]
+
+        hsl_price = self.strategy.get_stop_loss_prices(lrc_params, latest_index, live_position['side']).get('hsl_price')
+        if hsl_price:
+            orders.append(desired_order('hsl', close_side, size, hsl_price, tick_size, reduce_only=True, is_stop=True))
+        return orders
+
+    def update_hsl_watch(self, lrc_params, latest_index, live_position):
+        """Remembers the HSL level of the open position for the checks until the next candle close."""
+        if live_position['side'] == 'none':
+            self.hsl_watch = None
+            return
+        stop_prices = self.strategy.get_stop_loss_prices(lrc_params, latest_index, live_position['side'])
+        self.hsl_watch = {**live_position, 'hsl_price': stop_prices.get('hsl_price')}
+
+    def check_hsl(self):
+        """
+        The intra-candle check: the HSL is an immediate trigger, so it cannot wait for
+        the candle close. Costs one ticker request, and only while a position is open.
+        """
+        watch = self.hsl_watch
+        if not watch or not watch.get('hsl_price'):
+            return
+        try:
+            price = self.resolve(self.exchange.fetch_last_price())
+            if price is None:
+                return
+            is_long = watch['side'] == 'long'
+            if (is_long and price <= watch['hsl_price']) or (not is_long and price >= watch['hsl_price']):
+                self.logger.warning(f"HSL hit: price {price} crossed {watch['hsl_price']}. Closing the {watch['side']} position.")
+                self.resolve(self.exchange.place_market_order('sell' if is_long else 'buy', watch['size_contracts'],
+                                                              reduce_only=True))
+                self.hsl_watch = None
+        except Exception as e:
+            self.logger.error(f"An unexpected error occurred in the HSL check: {e}", exc_info=True)
 
     def print_status(self, ohlcv_df, lrc_params, current_state, live_position):
         """Prints the current status of the bot and strategy."""
@@ -102,10 +214,68 @@ class TradingBot:
             self.logger.info(f"  - SSL (4σ): {stop_prices.get('ssl_price')}")
             self.logger.info(f"  - HSL (5σ): {stop_prices.get('hsl_price')}")
 
+class AsyncTradingBot(TradingBot):
+    """
+    TradingBot on AsyncExchangeManager: each cycle requests its candles, position, open
+    orders and balance at once, so it takes as long as the slowest request instead of
+    their sum. The scheduler stays synchronous and runs the coroutines on one event loop.
+    """
+
+    def create_exchange(self):
+        self.loop = asyncio.new_event_loop()
+        return AsyncExchangeManager(
+            config.API_KEY, config.API_SECRET, config.EXCHANGE_NAME,
+            config.SYMBOL, config.IS_TESTNET, self.logger
+        )
+
+    def resolve(self, result):
+        return self.loop.run_until_complete(result)
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.loop.run_until_complete(self.exchange.close())
+
+    def run_cycle(self, close_time: float = None):
+        self.loop.run_until_complete(self.run_cycle_async(close_time))
+
+    async def run_cycle_async(self, close_time: float = None):
+        """Same as TradingBot.run_cycle, with the inputs fetched concurrently."""
+        self.logger.info("--- Starting new trading cycle ---")
+
+        # 1. Fetch the market data, position, open orders and balance at once
+        ohlcv_df, live_position, open_orders, balance = await asyncio.gather(
+            self.exchange.fetch_ohlcv(config.TIMEFRAME, config.LRC_LOOKBACK_CANDLES),
+            self.exchange.get_current_position(),
+            self.exchange.fetch_open_orders(),
+            self.exchange.fetch_balance(),
+        )
+
+        desired_orders = self.decide(ohlcv_df, live_position, balance, close_time)
+        if desired_orders is not None:
+            # 3. Move the live orders to the grid of the new channel
+            await self.reconciler.reconcile_async(desired_orders, open_orders)
+
+def split_amount(total, parts, lot_size):
+    """
+    Splits `total` into at most `parts` amounts of whole lots, for grid levels ordered
+    nearest first. When `total` does not cover a lot per level, fewer levels are used;
+    a remainder below one lot goes to the nearest level. Below one lot there is nothing
+    the exchange would accept, so no amounts are returned.
+    """
+    lots = int(total // lot_size)
+    parts = min(parts, lots)
+    if parts == 0:
+        return []
+    # Lots that don't divide evenly go to the nearest levels, one each
+    amounts = [(lots // parts + (i < lots % parts)) * lot_size for i in range(parts)]
+    amounts[0] += total - lots * lot_size
+    return amounts
 
 if __name__ == '__main__':
     # We need to pass the lrc_calculator module to the Strategy class
     import lrc_calculator as lrc_calculator_module
     
-    bot = TradingBot()
+    bot = AsyncTradingBot() if config.USE_ASYNC_EXCHANGE else TradingBot()
     bot.run() 
\ No newline at end of file
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Tuple
+
+def round_to_tick(price: float, tick_size: float) -> float:
+    """Rounds a price to the exchange's tick size."""
+    return round(round(price / tick_size) * tick_size, 10)
+
+def desired_order(role: str, side: str, amount: float, price: float, tick_size: float,
+                  reduce_only: bool = False, is_stop: bool = False) -> Dict[str, Any]:
+    """
+    Describes an order the grid wants on the book.
+
+    Args:
+        role: 'entry', 'tp', 'ssl' or 'hsl' (for logging only).
+        price: The limit price, or the trigger price of a stop order.
+        is_stop: A stop-market order triggered at `price` instead of a resting limit order.
+    """
+    return {'role': role, 'side': side, 'amount': amount, 'price': round_to_tick(price, tick_size),
+            'reduce_only': reduce_only, 'is_stop': is_stop}
+
+def _live_price(order: Dict[str, Any]) -> float:
+    return order.get('triggerPrice') or order.get('stopPrice') or order.get('price') or 0.0
+
+def _group_key(side, is_stop, reduce_only) -> Tuple:
+    return side, bool(is_stop), bool(reduce_only)
+
+def _live_group_key(order: Dict[str, Any]) -> Tuple:
+    is_stop = bool(order.get('triggerPrice') or order.get('stopPrice'))
+    return _group_key(order['side'], is_stop, order.get('reduceOnly'))
+
+class OrderReconciler:
+    """
+    Moves the live open orders towards the desired grid with as few API calls as possible.
+
+    Following a channel that moves every candle by cancelling everything and placing
+    the grid again costs 1 + N calls per cycle and loses queue priority on every
+    order. Instead, desired and live orders of the same side, kind (limit or stop)
+    and reduce-only flag are matched by price:
+      - a live order within `tolerance_ticks` of a desired price with the desired
+        size is left alone,
+      - remaining live orders are amended to the remaining desired prices and sizes
+        (one call each, or cancel + create where the exchange cannot amend),
+      - whatever is left over is cancelled or created.
+    Changes are applied in batched phases: cancels first (freeing margin), then amends,
+    then new orders.
+    """
+
+    def __init__(self, exchange_manager, tick_size: float, tolerance_ticks: int, logger):
+        self.exchange = exchange_manager
+        self.tick_size = tick_size
+        self.tolerance = tolerance_ticks * tick_size
+        self.logger = logger
+
+    def plan(self, desired: List[Dict[str, Any]], live: List[Dict[str, Any]]) -> Dict[str, list]:
+        """
+        Diffs the desired orders against the live ones.
+
+        Returns:
+            dict: 'keep' (live orders), 'amend' ((live order, desired order) pairs),
+                  'cancel' (live orders) and 'create' (desired orders).
+        """
+        plan = {'keep': [], 'amend': [], 'cancel': [], 'create': []}
+        groups = {}
+        for order in desired:
+            groups.setdefault(_group_key(order['side'], order['is_stop'], order['reduce_only']), ([], []))[0].append(order)
+        for order in live:
+            groups.setdefault(_live_group_key(order), ([], []))[1].append(order)
+
+        for wanted, existing in groups.values():
+            wanted = sorted(wanted, key=lambda o: o['price'])
+            existing = sorted(existing, key=_live_price)
+
+            # Orders already close enough to a desired one keep their place in the queue
+            unmatched_wanted = []
+            for order in wanted:
+                match = next((live_order for live_order in existing
+                              if abs(_live_price(live_order) - order['price']) <= self.tolerance
+                              and abs(live_order['amount'] - order['amount']) < 1e-9), None)
+                if match is None:
+                    unmatched_wanted.append(order)
+                else:
+                    existing.remove(match)
+                    plan['keep'].append(match)
+
+            # Pair the rest in price order, so each amend moves an order the least
+            pairs = min(len(unmatched_wanted), len(existing))
+            plan['amend'].extend(zip(existing[:pairs], unmatched_wanted[:pairs]))
+            plan['cancel'].extend(existing[pairs:])
+            plan['create'].extend(unmatched_wanted[pairs:])
+        return plan
+
+    def api_calls(self, plan: Dict[str, list]) -> int:
+        """Requests the plan costs on this exchange, counting each native bulk request once."""
+        amends = len(plan['amend']) if self.exchange.supports_amend else 0
+        # Without amends, a moved order is cancelled and placed again
+        moved = 0 if self.exchange.supports_amend else len(plan['amend'])
+        return (self.exchange.request_count(len(plan['cancel']) + moved, 'cancelOrders') + amends
+                + self.exchange.request_count(len(plan['create']) + moved, 'createOrders'))
+
+    def reconcile(self, desired: List[Dict[str, Any]], live: List[Dict[str, Any]] = None) -> Dict[str, list]:
+        """
+        Applies the diff between the desired and the live orders (fetched when not given)
+        and returns the plan that was applied.
+        """
+        if live is None:
+            live = self.exchange.fetch_open_orders()
+        plan, cancel_ids, amendments, creates = self._prepare(desired, live)
+        self.exchange.cancel_orders_batch(cancel_ids)
+        self.exchange.amend_orders_batch(amendments)
+        self.exchange.place_orders_batch(creates)
+        return plan
+
+    async def reconcile_async(self, desired: List[Dict[str, Any]], live: List[Dict[str, Any]] = None) -> Dict[str, list]:
+        """Same as reconcile, for an AsyncExchangeManager."""
+        if live is None:
+            live = await self.exchange.fetch_open_orders()
+        plan, cancel_ids, amendments, creates = self._prepare(desired, live)
+        await self.exchange.cancel_orders_batch(cancel_ids)
+        await self.exchange.amend_orders_batch(amendments)
+        await self.exchange.place_orders_batch(creates)
+        return plan
+
+    def _prepare(self, desired: List[Dict[str, Any]], live: List[Dict[str, Any]]) -> Tuple:
+        """Plans the diff and splits it into the cancel, amend and create batches."""
+        if live is None:
+            self.logger.warning("Could not fetch open orders. Leaving the grid unchanged.")
+            return {'keep': [], 'amend': [], 'cancel': [], 'create': []}, [], [], []
+
+        plan = self.plan(desired, live)
+        calls = self.api_calls(plan)
+        # What cancelling everything and placing the whole grid again would have cost
+        replace_all_calls = (1 if live else 0) + len(desired)
+        self.logger.info(
+            f"Grid reconcile: {len(plan['keep'])} kept, {len(plan['amend'])} amended, "
+            f"{len(plan['cancel'])} cancelled, {len(plan['create'])} created "
+            f"({calls} calls instead of {replace_all_calls}).")
+
+        cancel_ids = [order['id'] for order in plan['cancel']]
+        creates = list(plan['create'])
+        amendments = [(live_order['id'], order) for live_order, order in plan['amend']]
+        if not self.exchange.supports_amend:
+            cancel_ids += [order_id for order_id, _ in amendments]
+            creates = [order for _, order in amendments] + creates
+            amendments = []
+        return plan, cancel_ids, amendments, creates
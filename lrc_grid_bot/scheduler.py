@@ -0,0 +1,65 @@
+import time
+from typing import Callable, Optional
+
+from ohlcv_aggregator import timeframe_to_ms
+
+class CandleCloseScheduler:
+    """
+    Wakes the bot at every candle close instead of at a fixed interval after the
+    previous cycle, so decisions are made right after the candle they depend on.
+
+    Candle boundaries are epoch-aligned like exchange candles. Each wake-up is
+    `lag_seconds` after the boundary, giving the exchange time to publish the closed
+    candle. Between boundaries `on_check` runs every `check_interval_seconds`.
+
+    The clock and sleep functions can be replaced, e.g. to run the schedule in tests.
+    """
+
+    def __init__(self, timeframe: str, lag_seconds: float, check_interval_seconds: Optional[float] = None,
+                 logger=None, clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.timeframe_seconds = timeframe_to_ms(timeframe) // 1000
+        self.lag_seconds = lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.logger = logger
+        self.clock = clock
+        self.sleep = sleep
+
+    def next_close(self, now: float) -> float:
+        """The first candle boundary (Unix seconds) whose wake-up time is still ahead of `now`."""
+        shifted = now - self.lag_seconds
+        return (shifted // self.timeframe_seconds + 1) * self.timeframe_seconds
+
+    def run(self, on_close: Callable[[float], None], on_check: Optional[Callable[[], None]] = None,
+            max_closes: Optional[int] = None):
+        """
+        Calls on_close(close_time) after every candle close, and on_check() in between.
+
+        Args:
+            on_close: Receives the boundary (Unix seconds) of the candle that just closed.
+            on_check: The light intra-candle check, e.g. a hard stop loss price check.
+            max_closes: Stops after this many closes (runs forever by default).
+        """
+        close_time = self.next_close(self.clock())
+        closes = 0
+        while max_closes is None or closes < max_closes:
+            self._wait_until(close_time + self.lag_seconds, on_check)
+            on_close(close_time)
+            closes += 1
+
+            next_close_time = self.next_close(self.clock())
+            missed = int((next_close_time - close_time) / self.timeframe_seconds) - 1
+            if missed > 0 and self.logger:
+                self.logger.warning(f"The cycle overran {missed} candle close(s); skipping to the next one.")
+            close_time = next_close_time
+
+    def _wait_until(self, wake_time: float, on_check: Optional[Callable[[], None]]):
+        while True:
+            remaining = wake_time - self.clock()
+            if remaining <= 0:
+                return
+            if on_check is None or not self.check_interval_seconds:
+                self.sleep(remaining)
+                continue
+            self.sleep(min(self.check_interval_seconds, remaining))
+            if self.clock() < wake_time:
+                on_check()
@@ -1,55 +1,179 @@
+import copy
 import json
 import os
-from typing import Dict, Any
-
-# Define a default state structure
-DEFAULT_STATE = {
-    "position": {
-        "side": "none",  # 'long', 'short', or 'none'
-        "size_contracts": 0.0,
-        "entry_price": 0.0
-    },
-    "active_orders": {
-        "entry": [],  # List of entry order dicts
-        "tp": [],     # List of take-profit order dicts
-        "ssl": {},    # The Soft Stop Loss order dict
-        "hsl": {}     # The Hard Stop Loss order dict
-    },
-    "ssl_trigger": {
-        "is_active": False,
-        "first_breach_timestamp": 0
+import time
+from typing import Dict, Any, List
+
+def default_state() -> Dict[str, Any]:
+    """Returns a fresh default state (a new dict every call, so no state is shared)."""
+    return {
+        "position": {
+            "side": "none",  # 'long', 'short', or 'none'
+            "size_contracts": 0.0,
+            "entry_price": 0.0
+        },
+        "active_orders": {
+            "entry": [],  # List of entry order dicts
+            "tp": [],     # List of take-profit order dicts
+            "ssl": {},    # The Soft Stop Loss order dict
+            "hsl": {}     # The Hard Stop Loss order dict
+        },
+        "ssl_trigger": {
+            "is_active": False,
+            "first_breach_timestamp": 0
+        }
     }
-}
 
 class StateManager:
-    def __init__(self, state_file_path: str, logger):
+    """
+    Keeps the bot state in a snapshot file plus a journal of changes.
+
+    Every update appends one compact JSON line ({"seq", "op", "path", "value"}) to
+    `<state file>.journal`, so persisting a fill costs the size of the change, not of
+    the whole state. Lines reach the OS at once (a crashed process loses nothing);
+    fsync is batched to at most once per `fsync_interval_seconds` and at sync().
+    Every `snapshot_every` changes the state is written to a temporary file that is
+    renamed over the state file, and the journal starts over.
+
+    On startup the snapshot is loaded and the journal entries newer than it are
+    replayed; a line torn by a crash mid-write is dropped.
+
+    get_state() returns the live dict: change it through update_state or update_path,
+    not in place, or the change is not persisted.
+    """
+
+    def __init__(self, state_file_path: str, logger, snapshot_every: int = 1000,
+                 fsync_interval_seconds: float = 1.0):
         self.state_file_path = state_file_path
+        self.journal_path = state_file_path + '.journal'
         self.logger = logger
+        self.snapshot_every = snapshot_every
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.seq = 0
+        self.journal_entries = 0
+        self.last_fsync = time.monotonic()
         self.state = self._load_state()
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
 
     def _load_state(self) -> Dict[str, Any]:
-        """Loads the state from the JSON file, or returns a default state if not found."""
+        """Loads the snapshot and replays the journal, or returns a default state if neither exists."""
+        state = default_state()
         if os.path.exists(self.state_file_path):
             try:
                 with open(self.state_file_path, 'r') as f:
                     self.logger.info(f"Loading existing state from {self.state_file_path}")
-                    return json.load(f)
+                    snapshot = json.load(f)
+                # State files written before the journal hold the bare state
+                if 'seq' in snapshot and 'state' in snapshot:
+                    state, self.seq = snapshot['state'], snapshot['seq']
+                else:
+                    state = snapshot
             except (json.JSONDecodeError, IOError) as e:
-                self.logger.error(f"Error loading state file: {e}. Starting with a fresh state.")
-                return DEFAULT_STATE
+                self.logger.error(f"Error loading state file: {e}. Rebuilding the state from the journal alone.")
         else:
             self.logger.info("No state file found. Starting with a fresh state.")
-            return DEFAULT_STATE
+
+        return self._replay_journal(state)
+
+    def _replay_journal(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if not os.path.exists(self.journal_path):
+            return state
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete line")
+                    entry = json.loads(line)
+                except ValueError as e:
+                    self.logger.warning(f"Dropping a torn journal entry ({e}); the bot stopped mid-write.")
+                    break
+                valid_bytes += len(line)
+                self.journal_entries += 1
+                if entry['seq'] > self.seq:
+                    state = self._apply(state, entry['op'], entry['path'], entry['value'])
+                    self.seq = entry['seq']
+                    replayed += 1
+        if valid_bytes < os.path.getsize(self.journal_path):
+            # Cut the torn tail so new entries start on a line of their own
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        if replayed:
+            self.logger.info(f"Replayed {replayed} journal entries on top of the snapshot.")
+        return state
+
+    @staticmethod
+    def _apply(state: Dict[str, Any], op: str, path: List, value: Any) -> Dict[str, Any]:
+        """Applies one change; `path` is a list of dict keys and list indices ([] is the whole state)."""
+        if not path:
+            return value
+        parent = state
+        for key in path[:-1]:
+            parent = parent[key]
+        if op == 'append':
+            parent[path[-1]].append(value)
+        else:
+            parent[path[-1]] = value
+        return state
+
+    def _record(self, op: str, path: List, value: Any):
+        """Applies a change to the state and appends it to the journal."""
+        self.state = self._apply(self.state, op, path, copy.deepcopy(value))
+        self.seq += 1
+        entry = {'seq': self.seq, 'op': op, 'path': path, 'value': value}
+        try:
+            self.journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.journal.flush()
+            self.journal_entries += 1
+            if self.journal_entries >= self.snapshot_every:
+                self.save_state()
+            elif time.monotonic() - self.last_fsync >= self.fsync_interval_seconds:
+                self.sync()
+        except (IOError, OSError) as e:
+            self.logger.error(f"Could not write to the state journal {self.journal_path}: {e}")
+
+    def sync(self):
+        """Forces the journal entries written so far to disk."""
+        os.fsync(self.journal.fileno())
+        self.last_fsync = time.monotonic()
 
     def save_state(self):
-        """Saves the current state to the JSON file."""
+        """Writes a snapshot of the current state atomically and starts a new journal."""
+        temp_path = self.state_file_path + '.tmp'
         try:
-            with open(self.state_file_path, 'w') as f:
-                json.dump(self.state, f, indent=4)
-            self.logger.debug("Successfully saved state.")
-        except IOError as e:
+            with open(temp_path, 'w') as f:
+                json.dump({'seq': self.seq, 'state': self.state}, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.state_file_path)
+            self._fsync_directory()
+            # Entries up to seq are in the snapshot; replay skips them even if this truncate is lost
+            self.journal.truncate(0)
+            self.journal.seek(0)
+            self.journal_entries = 0
+            self.sync()
+            self.logger.debug("Successfully saved a state snapshot.")
+        except (IOError, OSError) as e:
             self.logger.error(f"Could not save state to {self.state_file_path}: {e}")
 
+    def _fsync_directory(self):
+        """Makes the rename itself durable (not supported on Windows)."""
+        if os.name != 'posix':
+            return
+        directory = os.open(os.path.dirname(os.path.abspath(self.state_file_path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def close(self):
+        """Syncs and closes the journal."""
+        try:
+            self.sync()
+        finally:
+            self.journal.close()
+
     def get_state(self) -> Dict[str, Any]:
         """Returns the current state."""
         return self.state
@@ -57,13 +181,19 @@ class StateManager:
     def update_state(self, key: str, value: Any):
         """Updates a top-level key in the state and saves it."""
         if key in self.state:
-            self.state[key] = value
-            self.save_state()
+            self._record('set', [key], value)
         else:
             self.logger.warning(f"Attempted to update a non-existent key '{key}' in state.")
 
+    def update_path(self, path: List, value: Any, append: bool = False):
+        """
+        Sets a nested value, e.g. update_path(['position', 'size_contracts'], 300), or with
+        append=True adds `value` to the list at `path`, e.g. one fill to ['active_orders', 'entry'].
+        """
+        self._record('append' if append else 'set', list(path), value)
+
     def reset_state(self):
         """Resets the state to its default and saves it."""
         self.logger.info("Resetting bot state to default.")
-        self.state = DEFAULT_STATE
-        self.save_state() 
\ No newline at end of file
+        self._record('set', [], default_state())
+        self.save_state()
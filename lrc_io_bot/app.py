@@ -1,61 +1,87 @@
 from flask import Flask, jsonify, render_template, request
-import ccxt
-import pandas as pd
 import numpy as np
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 from config import BITMEX_TESTNET_API_KEY, BITMEX_TESTNET_API_SECRET
 
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lrc_core import IncrementalLRC, candle_columns, first_index_at_or_after, fit_lrc
+from ohlcv_aggregator import OHLCVAggregator, aggregate_rows, timeframe_to_ms, to_chart_candles, trades_to_rows
+from ohlcv_cache import candle_cache
+from exchange_pool import exchange_pool
+from live_feed import live_feed
+
 app = Flask(__name__)
 
 # --- LRC Calculation Logic ---
-def calculate_lrc_parameters_for_api(data, use_date_range=False, start_timestamp=None, inflection_timestamp=None):
-    if not data:
+def calculate_lrc_parameters_for_api(data, use_date_range=False, start_timestamp=None, inflection_timestamp=None,
+                                     lrc_engine=None):
+    """
+    Calculates the channel drawn on the chart. `data` holds 'time' and 'close', either as
+    a dict of arrays (used without copying) or as a list of candle dicts.
+
+    With an IncrementalLRC as `lrc_engine`, the regression is updated from the sums it
+    kept from the previous call instead of being refitted over every candle.
+    """
+    times, closes = candle_columns(data)
+    if len(closes) == 0:
         return {}
 
     # 1. Get the full data range from the start date forward.
-    full_data = data
+    first_bar_index = 0
     if use_date_range and start_timestamp:
-        full_data = [d for d in data if d['time'] >= start_timestamp]
+        first_bar_index = first_index_at_or_after(times, start_timestamp)
+    full_times = times[first_bar_index:]
+    full_prices = closes[first_bar_index:]
 
-    if len(full_data) < 2:
+    if len(full_prices) < 2:
         return {}
 
     # --- Determine calculation and drawing ranges ---
     is_projection = use_date_range and inflection_timestamp and inflection_timestamp > start_timestamp
 
-    calc_data = full_data
+    calc_prices = full_prices
     draw_start_index = 0
-    draw_end_index = len(full_data) - 1
+    draw_end_index = len(full_prices) - 1
 
     if is_projection:
-        try:
+        inflection_bar_index = first_index_at_or_after(full_times, inflection_timestamp)
+        # If the inflection point is out of bounds, this is no longer a projection.
+        if inflection_bar_index < len(full_times):
             # For projections, calculation data ends at the inflection point
-            inflection_bar_index = next(i for i, d in enumerate(full_data) if d['time'] >= inflection_timestamp)
-            calc_data = full_data[:inflection_bar_index + 1]
+            calc_prices = full_prices[:inflection_bar_index + 1]
             # And drawing starts from the inflection point
             draw_start_index = inflection_bar_index
-        except StopIteration:
-            # Inflection point is out of bounds, so this is no longer a projection.
-            pass
 
-    if len(calc_data) < 2:
+    if len(calc_prices) < 2:
         return {}
         
     # 3. Perform regression on the calculation data.
-    calc_indices = np.arange(len(calc_data))
-    calc_prices = np.array([d['close'] for d in calc_data])
-    
-    slope, intercept = np.polyfit(calc_indices, calc_prices, 1)
-    std_dev = np.std(calc_prices - (slope * calc_indices + intercept))
+    if lrc_engine is not None:
+        calc_times_ms = np.rint(np.asarray(full_times[:len(calc_prices)], dtype=np.float64) * 1000).astype(np.int64)
+        lrc_params = lrc_engine.sync_arrays(calc_times_ms, calc_prices)
+        if not lrc_params:
+            return {}
+    else:
+        lrc_params = fit_lrc(calc_prices)
+    slope = lrc_params['slope']
+    intercept = lrc_params['intercept']
+    std_dev = lrc_params['std_dev']
 
     # 4. Project the price to the drawing start and end points
     # The indices of our regression are relative to the start of `full_data`.
     draw_start_price = slope * draw_start_index + intercept
     draw_end_price = slope * draw_end_index + intercept
 
-    draw_start_time = full_data[draw_start_index]['time']
-    draw_end_time = full_data[draw_end_index]['time']
+    draw_start_time = full_times[draw_start_index].item()
+    draw_end_time = full_times[draw_end_index].item()
 
     return {
         'start_time': draw_start_time,
@@ -67,15 +93,36 @@ def calculate_lrc_parameters_for_api(data, use_date_range=False, start_timestamp
         'intercept': intercept
     }
 
+# Regression sums kept between polls, one engine per chart configuration and channel
+MAX_LRC_ENGINES = 64
+_lrc_engines = OrderedDict()
+_lrc_engines_lock = threading.Lock()
+
+def _lrc_engine(key):
+    """Returns the IncrementalLRC for a chart configuration (callers hold _lrc_engines_lock)."""
+    engine = _lrc_engines.pop(key, None) or IncrementalLRC()
+    _lrc_engines[key] = engine
+    if len(_lrc_engines) > MAX_LRC_ENGINES:
+        _lrc_engines.popitem(last=False)
+    return engine
+
+def chart_etag(chart_key, ohlcv_array):
+    """Identifies a chart state by its configuration, its first candle and its (possibly forming) last candle."""
+    digest = hashlib.sha1(repr(chart_key).encode())
+    digest.update(np.int64(len(ohlcv_array)).tobytes())
+    digest.update(ohlcv_array[0, 0].tobytes())
+    digest.update(ohlcv_array[-1].tobytes())
+    return digest.hexdigest()
+
 # --- Exchange Connection ---
+EXCHANGE_CONFIG = {
+    'apiKey': BITMEX_TESTNET_API_KEY,
+    'secret': BITMEX_TESTNET_API_SECRET,
+}
+
 def initialize_exchange():
-    exchange = ccxt.bitmex({
-        'apiKey': BITMEX_TESTNET_API_KEY,
-        'secret': BITMEX_TESTNET_API_SECRET,
-        'enableRateLimit': True,
-    })
-    exchange.set_sandbox_mode(True)
-    return exchange
+    """Returns the process-wide BitMEX testnet client (markets loaded once, shared by all requests)."""
+    return exchange_pool.get('bitmex', sandbox=True, config=EXCHANGE_CONFIG)
 
 @app.route('/')
 def index():
@@ -83,137 +130,205 @@ def index():
     return render_template('index.html')
 
 def aggregate_trades_to_ohlcv(trades, bin_size_seconds):
+    """Bins ccxt trades into candles of `bin_size_seconds`, as an (n, 6) [timestamp_ms, o, h, l, c, v] array."""
     if not trades:
-        return []
-    
-    df = pd.DataFrame(trades)
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('datetime', inplace=True)
-    
-    period = f"{bin_size_seconds}S"
-    
-    ohlc = df['price'].resample(period).ohlc()
-    volume = df['amount'].resample(period).sum()
-    
-    # Combine OHLC with Volume
-    df_resampled = ohlc.join(volume)
-    df_resampled.rename(columns={'amount': 'volume'}, inplace=True)
-
-    # Convert back to list of dicts format expected by the frontend
-    candles = []
-    for index, row in df_resampled.iterrows():
-        if pd.notna(row['open']):
-            candles.append({
-                'time': index.timestamp(),
-                'open': row['open'],
-                'high': row['high'],
-                'low': row['low'],
-                'close': row['close'],
-                'volume': row['volume']
-            })
-            
-    return candles
+        return np.empty((0, 6))
+    return aggregate_rows(trades_to_rows(trades), bin_size_seconds * 1000)
 
 def resample_ohlcv(ohlcv_list, period):
-    if not ohlcv_list:
-        return []
-
-    df = pd.DataFrame(ohlcv_list, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('datetime', inplace=True)
-
-    # Define aggregation rules
-    agg_rules = {
-        'open': 'first',
-        'high': 'max',
-        'low': 'min',
-        'close': 'last',
-        'volume': 'sum'
+    """Aggregates base candles into `period` candles (a timeframe such as '15m' or '4h')."""
+    if len(ohlcv_list) == 0:
+        return np.empty((0, 6))
+    return aggregate_rows(ohlcv_list, timeframe_to_ms(period))
+
+def chart_since(exchange, timeframe, limit, days=30):
+    """Start of the chart window: the last `limit` candles, going back at most `days`."""
+    window_start = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
+    return max(window_start, exchange.milliseconds() - limit * exchange.parse_timeframe(timeframe) * 1000)
+
+CHART_SYMBOL = 'XBTUSD'
+CHART_LIMIT = 1000
+
+# Base timeframes for intervals the exchange does not serve
+RESAMPLING_MAP = {
+    '15m': ('5m', '15m'),
+    '4h': ('1h', '4h')
+}
+
+def chart_config(args):
+    """Parses the chart parameters shared by the polling and streaming endpoints."""
+    deviations_str = args.get('deviations', '1,2')
+    return {
+        'bin_size': args.get('binSize', '1h'),
+        'use_date': args.get('useDateRange', 'false').lower() == 'true',
+        'start_ts': int(args.get('startTimestamp', 0)),
+        'inflection_ts': int(args.get('inflectionTimestamp', 0)),
+        'deviations_str': deviations_str,
+        'deviations': [float(d) for d in deviations_str.split(',')],
     }
 
-    df_resampled = df.resample(period).agg(agg_rules)
-    df_resampled.dropna(inplace=True)
-
-    # Convert back to list of lists
-    resampled_list = []
-    for index, row in df_resampled.iterrows():
-        resampled_list.append([
-            int(index.timestamp() * 1000),
-            row['open'],
-            row['high'],
-            row['low'],
-            row['close'],
-            row['volume']
-        ])
-    return resampled_list
+def load_chart_ohlcv(exchange, bin_size):
+    """Fetches (or builds) the candles of a chart as an (n, 6) [timestamp_ms, o, h, l, c, v] array."""
+    if bin_size == '10s':
+        since = int((datetime.now() - timedelta(minutes=20)).timestamp() * 1000)
+        trades = exchange.fetch_trades(CHART_SYMBOL, since=since, limit=CHART_LIMIT)
+        return aggregate_trades_to_ohlcv(trades, 10)
+
+    if bin_size in RESAMPLING_MAP:
+        base_timeframe, resample_period = RESAMPLING_MAP[bin_size]
+        since = chart_since(exchange, base_timeframe, CHART_LIMIT)
+        base_ohlcv = candle_cache.get_candles(exchange, CHART_SYMBOL, base_timeframe, since)
+        return resample_ohlcv(base_ohlcv, resample_period)
+
+    # For standard timeframes directly supported by the API
+    # Closed candles come from the process-wide cache; only the tail is fetched
+    since = chart_since(exchange, bin_size, CHART_LIMIT)
+    return candle_cache.get_candles(exchange, CHART_SYMBOL, bin_size, since)
+
+def chart_channels(ohlcv_array, config, projected_engine, full_engine):
+    """Computes the projected and full channels of a chart, updating the given IncrementalLRC engines."""
+    # Regress straight on the OHLCV columns
+    lrc_input = {'time': ohlcv_array[:, 0] / 1000, 'close': ohlcv_array[:, 4]}
+    use_date, start_ts = config['use_date'], config['start_ts']
+    lrc_projected_params = calculate_lrc_parameters_for_api(
+        lrc_input, use_date, start_ts, config['inflection_ts'], lrc_engine=projected_engine)
+    lrc_full_params = calculate_lrc_parameters_for_api(
+        lrc_input, use_date, start_ts, None, lrc_engine=full_engine)
+    return {
+        'lrc': {
+            'params': lrc_projected_params,
+            'deviations': config['deviations']
+        },
+        'lrc_full': {
+            'params': lrc_full_params,
+            'deviations': config['deviations']
+        }
+    }
 
 @app.route('/api/lrc-data')
 def get_lrc_data():
     """Provides OHLCV and LRC data to the frontend chart."""
     try:
         # --- Get parameters from request ---
-        bin_size = request.args.get('binSize', '1h')
-        use_date = request.args.get('useDateRange', 'false').lower() == 'true'
-        start_ts = int(request.args.get('startTimestamp', 0))
-        inflection_ts = int(request.args.get('inflectionTimestamp', 0))
-        deviations_str = request.args.get('deviations', '1,2')
-        deviations = [float(d) for d in deviations_str.split(',')]
+        config = chart_config(request.args)
+        bin_size = config['bin_size']
+        # Delta polling: only candles at or after `since` (seconds) are returned
+        since_ts = request.args.get('since', type=float)
 
         # --- Fetch data from exchange ---
-        exchange = initialize_exchange()
-        limit = 1000
-        ohlcv = []
+        ohlcv = load_chart_ohlcv(initialize_exchange(), bin_size)
+        if len(ohlcv) == 0:
+            return jsonify({'error': f'Could not fetch or generate data for timeframe {bin_size}'})
 
-        # Define base timeframes for unsupported intervals
-        resampling_map = {
-            '15m': ('5m', '15T'),
-            '4h': ('1h', '4H')
-        }
+        ohlcv_array = np.asarray(ohlcv, dtype=np.float64)
 
-        if bin_size == '10s':
-            since = int((datetime.now() - timedelta(minutes=20)).timestamp() * 1000)
-            trades = exchange.fetch_trades('XBTUSD', since=since, limit=limit)
-            ohlcv_from_trades = aggregate_trades_to_ohlcv(trades, 10)
-            ohlcv = [[d['time'] * 1000, d['open'], d['high'], d['low'], d['close'], d.get('volume', 0)] for d in ohlcv_from_trades]
-        
-        elif bin_size in resampling_map:
-            base_timeframe, resample_period = resampling_map[bin_size]
-            since = int((datetime.now() - timedelta(days=30)).timestamp() * 1000)
-            base_ohlcv = exchange.fetch_ohlcv('XBTUSD', base_timeframe, since=since, limit=limit)
-            ohlcv = resample_ohlcv(base_ohlcv, resample_period)
-
-        else:
-            # For standard timeframes directly supported by the API
-            since = int((datetime.now() - timedelta(days=30)).timestamp() * 1000)
-            ohlcv = exchange.fetch_ohlcv('XBTUSD', bin_size, since=since, limit=limit)
-        
-        if not ohlcv:
-            return jsonify({'error': f'Could not fetch or generate data for timeframe {bin_size}'})
+        # Nothing changed since the client's copy: answer with an empty 304
+        chart_key = (bin_size, config['use_date'], config['start_ts'], config['inflection_ts'],
+                     config['deviations_str'], since_ts)
+        etag = chart_etag(chart_key, ohlcv_array)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
 
-        candles = [
-            {'time': t / 1000, 'open': o, 'high': h, 'low': l, 'close': c}
-            for t, o, h, l, c, v in ohlcv
-        ]
+        delta_rows = ohlcv_array if since_ts is None else ohlcv_array[ohlcv_array[:, 0] >= since_ts * 1000]
 
         # --- Calculate Both LRCs ---
-        lrc_projected_params = calculate_lrc_parameters_for_api(candles, use_date, start_ts, inflection_ts)
-        lrc_full_params = calculate_lrc_parameters_for_api(candles, use_date, start_ts, None)
-
-        return jsonify({
-            'candles': candles,
-            'lrc': {
-                'params': lrc_projected_params,
-                'deviations': deviations
-            },
-            'lrc_full': {
-                'params': lrc_full_params,
-                'deviations': deviations
-            }
+        # The regression sums kept from the previous poll are updated, not refitted
+        engine_key = chart_key[:4]
+        with _lrc_engines_lock:
+            channels = chart_channels(ohlcv_array, config,
+                                      _lrc_engine(engine_key + ('projected',)), _lrc_engine(engine_key + ('full',)))
+
+        response = jsonify({
+            'candles': to_chart_candles(delta_rows),
+            'delta': since_ts is not None,
+            **channels
         })
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         print(f"Error in /api/lrc-data: {e}")
         return jsonify({'error': str(e)}), 500
 
+class LiveChart:
+    """
+    A chart configuration kept up to date from the live trade stream, shared by every
+    client streaming it. It is seeded with the same candles /api/lrc-data serves;
+    trades then update the forming candle and open new ones.
+    """
+
+    def __init__(self, config):
+        exchange = initialize_exchange()
+        self.config = config
+        # Trades already counted in the seeded forming candle are skipped
+        self.seeded_at_ms = exchange.milliseconds()
+        ohlcv = np.asarray(load_chart_ohlcv(exchange, config['bin_size']), dtype=np.float64).reshape(-1, 6)
+        if len(ohlcv) == 0:
+            raise ValueError(f"Could not fetch or generate data for timeframe {config['bin_size']}")
+        # The window slides like the polled chart's: one candle in, one out
+        self.aggregator = OHLCVAggregator(timeframe_to_ms(config['bin_size']), max_candles=max(len(ohlcv) - 1, 1))
+        self.aggregator.add_candles(ohlcv)
+        self.engines = (IncrementalLRC(), IncrementalLRC())
+        self.changed_from_ms = None
+        self.lock = threading.Lock()
+
+    def add_trades(self, trades):
+        trades = [t for t in trades if t['timestamp'] >= self.seeded_at_ms]
+        if not trades:
+            return
+        with self.lock:
+            changed = self.aggregator.add_trades(trades)
+            if len(changed):
+                first_changed = int(changed[0, 0])
+                if self.changed_from_ms is None or first_changed < self.changed_from_ms:
+                    self.changed_from_ms = first_changed
+
+    def payload(self, since_ms=None):
+        with self.lock:
+            if since_ms is None:
+                if self.changed_from_ms is None:
+                    return None
+                since_ms, self.changed_from_ms = self.changed_from_ms, None
+            ohlcv_array = self.aggregator.candles
+            return {
+                'candles': to_chart_candles(ohlcv_array[ohlcv_array[:, 0] >= since_ms]),
+                'delta': True,
+                **chart_channels(ohlcv_array, self.config, *self.engines)
+            }
+
+@app.route('/api/lrc-stream')
+def stream_lrc_data():
+    """
+    Pushes candle and channel updates as Server-Sent Events, each event carrying the
+    same payload as a delta poll of /api/lrc-data. `since` (seconds) is the last
+    candle the client already has.
+    """
+    try:
+        config = chart_config(request.args)
+        since_ts = request.args.get('since', type=float)
+        chart_key = (config['bin_size'], config['use_date'], config['start_ts'], config['inflection_ts'],
+                     config['deviations_str'])
+        client = live_feed.subscribe(
+            'bitmex', CHART_SYMBOL, chart_key, lambda: LiveChart(config), sandbox=True, config=EXCHANGE_CONFIG,
+            since_ms=None if since_ts is None else int(since_ts * 1000))
+    except Exception as e:
+        print(f"Error in /api/lrc-stream: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    def events():
+        try:
+            for payload in live_feed.listen(client):
+                # A comment line keeps proxies from closing an idle stream
+                yield ': keepalive\n\n' if payload is None else f"data: {json.dumps(payload)}\n\n"
+        finally:
+            live_feed.unsubscribe(client)
+
+    return app.response_class(events(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5001) 
\ No newline at end of file
+    initialize_exchange() # Load the markets before the first chart request
+    # Each open stream holds a worker thread
+    app.run(debug=True, port=5001, threaded=True) 
\ No newline at end of file
@@ -4,6 +4,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import json
+import os
+import sys
 
 from config import BITMEX_TESTNET_API_KEY, BITMEX_TESTNET_API_SECRET
 
@@ -13,21 +15,20 @@ TIMEFRAME = '1h'
 DEVIATION = 1.0    # Number of standard deviations for the channel
 ORDER_SIZE = 100   # Number of contracts to trade
 POLL_INTERVAL_S = 60 # Check every 60 seconds
+# Address of market_data_daemon.py (e.g. 127.0.0.1:8765). When set, the bot runs on
+# every closed candle it publishes instead of polling REST every POLL_INTERVAL_S.
+MARKET_DATA_ADDRESS = os.getenv('MARKET_DATA_ADDRESS')
 
-# --- LRC Calculation Logic (adapted from backtester) ---
-def calculate_lrc_parameters(data):
-    if len(data) < 2:
-        return {}
-    
-    source_prices = np.array([d['close'] for d in data])
-    indices = np.arange(len(source_prices))
-    slope, intercept = np.polyfit(indices, source_prices, 1)
-    
-    regression_values = slope * indices + intercept
-    deviations = source_prices - regression_values
-    std_dev = np.std(deviations)
-    
-    return {'slope': slope, 'intercept': intercept, 'std_dev': std_dev}
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- LRC Calculation Logic ---
+from lrc_core import fit_lrc
+from market_data_client import MarketDataClient
+
+def calculate_lrc_parameters(closes):
+    """Fits the channel to an array or Series of closing prices."""
+    return fit_lrc(closes)
 
 # --- Exchange Interaction ---
 def initialize_exchange():
@@ -63,10 +64,27 @@ def get_current_position(exchange, symbol):
         print(f"Error fetching position: {e}")
         return 0
 
+def connect_market_data():
+    """Subscribes to the daemon's closed candles, or returns None to poll REST."""
+    if not MARKET_DATA_ADDRESS:
+        return None
+    feed = MarketDataClient(MARKET_DATA_ADDRESS)
+    feed.subscribe('bitmex', SYMBOL, TIMEFRAME, history=100, sandbox=True)
+    print(f"Receiving {TIMEFRAME} candles from the market data daemon at {MARKET_DATA_ADDRESS}")
+    return feed
+
+def wait_for_next_cycle(feed):
+    """Waits for the next closed candle, or the poll interval without the daemon."""
+    if feed is None:
+        time.sleep(POLL_INTERVAL_S)
+    else:
+        feed.wait_for_close()
+
 # --- Main Bot Logic ---
 def run_bot():
     print("--- Starting Live LRC I/O Bot on BitMEX Testnet ---")
     exchange = initialize_exchange()
+    feed = connect_market_data()
     
     print(f"Bot configured for {SYMBOL} on {TIMEFRAME} timeframe.")
     print(f"Trading with {DEVIATION} std deviations and order size of {ORDER_SIZE} contracts.")
@@ -75,18 +93,19 @@ def run_bot():
         try:
             print(f"\n[{datetime.now().isoformat()}] --- New Cycle ---")
             
-            # 1. Fetch data
-            ohlcv = exchange.fetch_ohlcv(SYMBOL, TIMEFRAME, limit=100) # Fetch 100 candles
+            # 1. Fetch data (closed candles only when they come from the daemon)
+            if feed is None:
+                ohlcv = exchange.fetch_ohlcv(SYMBOL, TIMEFRAME, limit=100) # Fetch 100 candles
+            else:
+                ohlcv = feed.candles('bitmex', SYMBOL, TIMEFRAME, sandbox=True)
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
             
-            data_for_lrc = [{'close': row['close'], 'time': int(row['timestamp'].timestamp())} for index, row in df.iterrows()]
-            
             # 2. Calculate LRC
-            lrc_params = calculate_lrc_parameters(data_for_lrc)
+            lrc_params = calculate_lrc_parameters(df['close'])
             if not lrc_params:
                 print("Could not calculate LRC params. Waiting for next cycle.")
-                time.sleep(POLL_INTERVAL_S)
+                wait_for_next_cycle(feed)
                 continue
                 
             slope = lrc_params['slope']
@@ -138,7 +157,7 @@ def run_bot():
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
 
-        time.sleep(POLL_INTERVAL_S)
+        wait_for_next_cycle(feed)
 
 if __name__ == '__main__':
     run_bot() 
\ No newline at end of file
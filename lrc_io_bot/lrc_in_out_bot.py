@@ -1,65 +1,76 @@
 import pandas as pd
-from sqlalchemy import create_engine
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+from lrc_core import candle_columns, first_index_at_or_after, fit_lrc, rolling_lrc
+from backtest_engine import lrc_inout_positions, signal_transitions, simulate_all_in_portfolio
+
+from candle_store import CandleStore
+from candle_cache import CandleCache
 
 # --- LRC Calculation Logic (from stable_v3/lrc_calculator.py) ---
 def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
     """
     Calculates the key parameters of a Linear Regression Channel.
+
+    `data` is a DataFrame with a 'close' column and either a 'time' column or a
+    DatetimeIndex (its columns are used without copying), or a list of candle dicts.
     """
-    if not isinstance(data, list) or not data:
-        # If data is a DataFrame, convert it to list of dicts
-        if isinstance(data, pd.DataFrame):
-            data = data.to_dict('records')
+    if isinstance(data, pd.DataFrame):
+        if 'time' in data.columns:
+            times, closes = candle_columns(data)
         else:
-            return {}
+            times = pd.DatetimeIndex(data.index).as_unit('s').asi8
+            closes = data['close'].to_numpy(dtype=np.float64)
+    elif isinstance(data, list) and data:
+        times, closes = candle_columns(data)
+    else:
+        return {}
 
     # --- 1. Filter Data by Date Range ---
     first_valid_bar_index = 0
     if use_date_range and start_timestamp:
-        for i, d in enumerate(data):
-            if d['time'] >= start_timestamp:
-                first_valid_bar_index = i
-                break
-        else:
+        first_valid_bar_index = first_index_at_or_after(times, start_timestamp)
+        if first_valid_bar_index == len(times):
             return {}
     
-    calc_data = data[first_valid_bar_index:]
+    calc_times = times[first_valid_bar_index:]
+    calc_prices = closes[first_valid_bar_index:]
     
-    if len(calc_data) < 2:
+    if len(calc_prices) < 2:
         return {}
 
-    # --- 2. Perform Linear Regression against BAR INDEX ---
-    source_prices = np.array([d['close'] for d in calc_data])
-    indices = np.arange(len(source_prices))
-    slope, intercept = np.polyfit(indices, source_prices, 1)
-
-    # --- 3. Calculate Standard Deviation ---
-    regression_values = slope * indices + intercept
-    deviations = source_prices - regression_values
-    std_dev = np.std(deviations)
+    # --- 2 & 3. Regress against BAR INDEX and measure the Standard Deviation ---
+    lrc_params = fit_lrc(calc_prices)
+    slope = lrc_params['slope']
+    intercept = lrc_params['intercept']
+    std_dev = lrc_params['std_dev']
 
     # --- 4. Return the essential parameters ---
     start_point_index = 0
-    end_point_index = len(indices) - 1
+    end_point_index = len(calc_prices) - 1
 
     start_price = slope * start_point_index + intercept
     end_price = slope * end_point_index + intercept
     
     # Ensure time is in the correct format (pd.Timestamp to unix)
-    start_time_val = calc_data[start_point_index]['time']
-    end_time_val = calc_data[end_point_index]['time']
+    start_time_val = calc_times[start_point_index]
+    end_time_val = calc_times[end_point_index]
 
     if isinstance(start_time_val, pd.Timestamp):
         start_time = int(start_time_val.timestamp())
     else:
-        start_time = start_time_val
+        start_time = start_time_val.item() if isinstance(start_time_val, np.generic) else start_time_val
 
     if isinstance(end_time_val, pd.Timestamp):
         end_time = int(end_time_val.timestamp())
     else:
-        end_time = end_time_val
+        end_time = end_time_val.item() if isinstance(end_time_val, np.generic) else end_time_val
         
     return {
         'start_time': start_time,
@@ -74,17 +85,17 @@ def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
 # --- DataFeeder Logic (from In-and-outbot/backtester.py) ---
 class DataFeeder:
     def __init__(self, db_path='In-and-outbot/data/market_data.db'):
-        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.store = CandleStore(db_path)
+        self.cache = CandleCache(self.store)
         self.data = {}
 
-    def load_data(self, symbol, timeframe):
+    def load_data(self, symbol, timeframe, start=None, end=None):
         table_name = f"{symbol.replace('/', '_')}_{timeframe}"
         try:
-            # Load data and set the index to 'timestamp'
-            df = pd.read_sql(f'SELECT * FROM "{table_name}"', self.engine)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
-            
+            # Zero-copy views on the memory-mapped candle cache, indexed by 'timestamp'
+            self.store.migrate_legacy_table(symbol, timeframe)
+            df = self.cache.load_dataframe(symbol, timeframe, start, end)
+
             print(f"Loaded {len(df)} records for {table_name}")
             self.data[table_name] = df
             return df
@@ -94,19 +105,23 @@ class DataFeeder:
 
 # --- New TradingBot Logic (LRC Strategy) ---
 class TradingBot:
-    def __init__(self, data, deviation=1.0):
+    def __init__(self, data, deviation=1.0, window=None):
+        """
+        `window` switches from one regression over the whole dataset to a channel refit
+        on the last `window` candles at every bar, like the live bots do (no look-ahead).
+        """
         self.data = data
         self.deviation = deviation
-        # The 'time' column for calculation needs to be unix timestamp
-        data_for_lrc = self.data.reset_index()
-        data_for_lrc['time'] = data_for_lrc['timestamp'].apply(lambda x: int(x.timestamp()))
-        self.lrc_params = calculate_lrc_parameters(data_for_lrc.to_dict('records'))
+        self.window = window
+        # The DatetimeIndex supplies the unix times, so no per-row conversion is needed
+        self.lrc_params = calculate_lrc_parameters(self.data)
         self.signals = self._generate_signals()
 
-    def _generate_signals(self):
-        if not self.lrc_params:
-            print("Could not generate signals: LRC parameters not calculated.")
-            return pd.DataFrame()
+    def _calculate_bands(self):
+        """Returns the (upper, lower) channel band for every bar."""
+        if self.window:
+            bands = rolling_lrc(self.data['close'], self.window, self.deviation)
+            return bands['upper'], bands['lower']
 
         slope = self.lrc_params['slope']
         intercept = self.lrc_params['intercept']
@@ -114,30 +129,33 @@ class TradingBot:
 
         indices = np.arange(len(self.data))
         lrc_center = slope * indices + intercept
-        lrc_upper = lrc_center + self.deviation * std_dev
-        lrc_lower = lrc_center - self.deviation * std_dev
+        return lrc_center + self.deviation * std_dev, lrc_center - self.deviation * std_dev
+
+    def _generate_signals(self):
+        if not self.lrc_params:
+            print("Could not generate signals: LRC parameters not calculated.")
+            return pd.DataFrame()
+
+        lrc_upper, lrc_lower = self._calculate_bands()
 
         signals = pd.DataFrame(index=self.data.index)
         signals['price'] = self.data['close']
         signals['lrc_upper'] = lrc_upper
         signals['lrc_lower'] = lrc_lower
-        signals['signal'] = 0.0  # 0 for out, 1 for in
-
-        position = 0
-        for i in range(len(signals)):
-            if position == 0 and self.data['low'].iloc[i] < signals['lrc_lower'].iloc[i]:
-                position = 1
-            elif position == 1 and self.data['high'].iloc[i] > signals['lrc_upper'].iloc[i]:
-                position = 0
-            signals['signal'].iloc[i] = position
+        # 0 for out, 1 for in
+        signals['signal'] = lrc_inout_positions(
+            self.data['low'], self.data['high'], lrc_lower, lrc_upper
+        ).astype(float)
 
         signals['positions'] = signals['signal'].diff().fillna(0)
         return signals
 
 # --- Backtester Logic (from In-and-outbot/backtester.py) ---
 class Backtester:
-    def __init__(self, initial_capital=10000.0):
+    def __init__(self, initial_capital=10000.0, fee_rate=0.0, slippage=0.0):
         self.initial_capital = initial_capital
+        self.fee_rate = fee_rate # Fraction of the traded value paid per fill
+        self.slippage = slippage # Fraction of the price lost per fill
 
     def run(self, signals):
         if signals.empty:
@@ -147,28 +165,17 @@ class Backtester:
         portfolio = pd.DataFrame(index=signals.index)
         portfolio['price'] = signals['price']
         portfolio['signal'] = signals['signal']
-        portfolio['cash'] = self.initial_capital
-        portfolio['holdings'] = 0.0
-        
-        portfolio.loc[portfolio.index[0], 'cash'] = self.initial_capital
-
-        for i in range(1, len(portfolio)):
-            prev_signal = portfolio['signal'].iloc[i-1]
-            current_signal = portfolio['signal'].iloc[i]
-            price = portfolio['price'].iloc[i]
-            
-            portfolio['cash'].iloc[i] = portfolio['cash'].iloc[i-1]
-            portfolio['holdings'].iloc[i] = portfolio['holdings'].iloc[i-1]
-
-            if current_signal > prev_signal: # Buy signal
-                portfolio['holdings'].iloc[i] = portfolio['cash'].iloc[i-1] / price
-                portfolio['cash'].iloc[i] = 0.0
 
-            elif current_signal < prev_signal: # Sell signal
-                portfolio['cash'].iloc[i] = portfolio['holdings'].iloc[i-1] * price
-                portfolio['holdings'].iloc[i] = 0.0
+        # Buy with all cash when the signal rises, sell everything when it falls
+        entry_bars, exit_bars = signal_transitions(portfolio['signal'])
+        result = simulate_all_in_portfolio(
+            portfolio['price'].to_numpy(), entry_bars, exit_bars,
+            initial_capital=self.initial_capital, fee_rate=self.fee_rate, slippage=self.slippage
+        )
 
-        portfolio['total'] = portfolio['cash'] + (portfolio['holdings'] * portfolio['price'])
+        portfolio['cash'] = result['cash']
+        portfolio['holdings'] = result['holdings']
+        portfolio['total'] = result['total']
         return portfolio
 
     def plot_performance(self, portfolio, signals):
@@ -0,0 +1,143 @@
+"""
+Blocking client of market_data_daemon.py for the live bots.
+
+A bot subscribes to the series it trades, reads their history from candles() and
+calls wait_for_close() where it used to sleep, so it runs once per closed candle
+instead of once per poll interval. If the daemon restarts, the client reconnects,
+subscribes again and reports the candles that closed in the meantime.
+"""
+import json
+import socket
+import time
+from collections import deque
+from market_data_daemon import DEFAULT_ADDRESS, parse_address
+
+class MarketDataClient:
+    """
+    Args:
+        address (str): The daemon's 'host:port' or 'unix:/path/to.sock'.
+        reconnect_seconds (float): Delay between reconnection attempts.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, reconnect_seconds=5.0):
+        self.address = address
+        self.reconnect_seconds = reconnect_seconds
+        self._sock = None
+        self._buffer = b''
+        self._subscriptions = {}
+        self._candles = {}
+        self._pending = deque()
+
+    @staticmethod
+    def series_key(exchange_id, symbol, timeframe, sandbox=False):
+        return exchange_id, bool(sandbox), symbol, timeframe
+
+    def subscribe(self, exchange_id, symbol, timeframe, history=100, sandbox=False):
+        """
+        Subscribes to the closed candles of a series and waits for its history.
+
+        Returns:
+            list: The last `history` closed candles as [timestamp_ms, o, h, l, c, v] rows.
+        """
+        key = self.series_key(exchange_id, symbol, timeframe, sandbox)
+        self._subscriptions[key] = history
+        self._connect()
+        self._send_subscribe(key)
+        while key not in self._candles:
+            self._handle(self._read_message(None))
+        return self.candles(exchange_id, symbol, timeframe, sandbox)
+
+    def candles(self, exchange_id, symbol, timeframe, sandbox=False):
+        """The closed candles of a subscribed series received so far, oldest first."""
+        return list(self._candles[self.series_key(exchange_id, symbol, timeframe, sandbox)])
+
+    def wait_for_close(self, timeout=None):
+        """
+        Blocks until a candle of any subscribed series closes.
+
+        Returns:
+            tuple: (series key, candle), or None if `timeout` seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                self._handle(self._read_message(remaining))
+            except (ConnectionError, OSError) as e:
+                print(f"Lost the market data daemon: {e}. Reconnecting in {self.reconnect_seconds}s")
+                self._disconnect()
+                time.sleep(self.reconnect_seconds)
+                self._resubscribe()
+        return self._pending.popleft()
+
+    def close(self):
+        self._disconnect()
+
+    def _connect(self):
+        if self._sock is not None:
+            return
+        kind, *location = parse_address(self.address)
+        if kind == 'unix':
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(location[0])
+        else:
+            self._sock = socket.create_connection(tuple(location))
+        self._buffer = b''
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _resubscribe(self):
+        try:
+            self._connect()
+            for key in self._subscriptions:
+                self._send_subscribe(key)
+        except OSError as e:
+            print(f"Could not reconnect to the market data daemon: {e}")
+            self._disconnect()
+
+    def _send_subscribe(self, key):
+        exchange_id, sandbox, symbol, timeframe = key
+        message = {'op': 'subscribe', 'exchange': exchange_id, 'symbol': symbol, 'timeframe': timeframe,
+                   'history': self._subscriptions[key], 'sandbox': sandbox}
+        self._sock.sendall((json.dumps(message) + '\n').encode())
+
+    def _read_message(self, timeout):
+        """Returns the next message, or None on timeout."""
+        if self._sock is None:
+            raise ConnectionError("not connected")
+        while b'\n' not in self._buffer:
+            self._sock.settimeout(timeout)
+            try:
+                chunk = self._sock.recv(65536)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise ConnectionError("the daemon closed the connection")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def _handle(self, message):
+        if message is None:
+            return
+        if message['type'] == 'error':
+            raise ValueError(f"Market data daemon error: {message['message']}")
+
+        key = self.series_key(message['exchange'], message['symbol'], message['timeframe'], message['sandbox'])
+        history = self._subscriptions.get(key)
+        if history is None:
+            return
+        if message['type'] == 'snapshot':
+            previous = self._candles.get(key)
+            self._candles[key] = deque(message['candles'], maxlen=history)
+            # After a reconnect, report the candles that closed while the daemon was away
+            if previous:
+                self._pending.extend((key, candle) for candle in message['candles'] if candle[0] > previous[-1][0])
+        elif message['type'] == 'candle':
+            self._candles[key].append(message['candle'])
+            self._pending.append((key, message['candle']))
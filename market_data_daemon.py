@@ -0,0 +1,373 @@
+"""
+Market data ingestion daemon for the live bots.
+
+Every bot used to poll fetch_ohlcv over REST once a minute, so each one added its
+own calls and noticed a closed candle up to a minute late. This daemon keeps one
+streaming trade subscription per (exchange, symbol), builds the candles of every
+requested timeframe locally, and publishes each candle to the subscribed bots the
+moment it closes (plus a short grace period for late trades).
+
+Bots connect over a Unix socket or localhost TCP and speak newline-delimited JSON:
+
+    -> {"op": "subscribe", "exchange": "bitmex", "symbol": "XBTUSD", "timeframe": "1h",
+        "history": 100, "sandbox": true}
+    <- {"type": "snapshot", "exchange": ..., "symbol": ..., "timeframe": ..., "sandbox": ...,
+        "candles": [[timestamp_ms, open, high, low, close, volume], ...]}
+    <- {"type": "candle", "exchange": ..., "symbol": ..., "timeframe": ..., "sandbox": ...,
+        "candle": [timestamp_ms, open, high, low, close, volume]}
+    <- {"type": "error", "message": ...}
+
+The history of a series is fetched once over REST when it is first subscribed.
+market_data_client.py is the blocking client the bots use.
+
+Usage:
+    python market_data_daemon.py --listen 127.0.0.1:8765
+    python market_data_daemon.py --listen unix:/tmp/market_data.sock --replay trades.csv --speed 1000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import deque
+import ccxt
+from ohlcv_aggregator import aggregate_rows, timeframe_to_ms, trades_to_rows
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError: # Older ccxt releases ship without the WebSocket clients
+    ccxtpro = None
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+MAX_CLIENT_BUFFER_BYTES = 1024 * 1024 # A bot this far behind is disconnected
+
+def parse_address(address):
+    """Splits 'unix:/path/to.sock' or 'host:port' into ('unix', path) or ('tcp', host, port)."""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return 'tcp', host or '127.0.0.1', int(port)
+
+class CandleBuilder:
+    """
+    Builds the closed candles of one timeframe from a trade stream.
+
+    Candles are epoch-aligned like exchange candles. A bucket without trades closes
+    as a flat candle at the previous close with zero volume, as exchanges report it.
+
+    Args:
+        history (int): Closed candles kept for the snapshots sent to new subscribers.
+    """
+
+    def __init__(self, timeframe, history=1000):
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.closed = deque(maxlen=history)
+        self.forming = None # [timestamp_ms, open, high, low, close, volume]
+        self.seeded_at_ms = 0
+
+    def seed(self, ohlcv, now_ms):
+        """Starts from exchange candles; trades before now_ms are assumed to be in them."""
+        rows = sorted([int(row[0])] + [float(value) for value in row[1:6]] for row in ohlcv)
+        self.closed.clear()
+        self.closed.extend(row for row in rows if row[0] + self.timeframe_ms <= now_ms)
+        self.forming = rows[-1] if rows and rows[-1][0] + self.timeframe_ms > now_ms else None
+        self.seeded_at_ms = now_ms
+
+    def add_trade(self, timestamp, price, amount):
+        """Adds a trade. Returns the candles it closed."""
+        if timestamp < self.seeded_at_ms:
+            return []
+        bucket = timestamp - timestamp % self.timeframe_ms
+        closed = self._close_before(bucket)
+        current = self.forming[0] if self.forming is not None else (
+            self.closed[-1][0] + self.timeframe_ms if self.closed else bucket)
+        if bucket < current:
+            return closed # A late trade of a candle that is already published
+        if self.forming is None:
+            self.forming = [bucket, price, price, price, price, amount]
+        else:
+            self.forming[2] = max(self.forming[2], price)
+            self.forming[3] = min(self.forming[3], price)
+            self.forming[4] = price
+            self.forming[5] += amount
+        return closed
+
+    def close_until(self, now_ms):
+        """Closes every candle that ended at or before now_ms. Returns them."""
+        return self._close_before(now_ms - now_ms % self.timeframe_ms)
+
+    def _close_before(self, bucket):
+        closed = []
+        if self.forming is not None:
+            if self.forming[0] >= bucket:
+                return closed
+            closed.append(self.forming)
+            self.forming = None
+        if not closed and not self.closed:
+            return closed
+
+        last = closed[-1] if closed else self.closed[-1]
+        start = max(last[0] + self.timeframe_ms, bucket - self.closed.maxlen * self.timeframe_ms)
+        price = last[4]
+        closed.extend([timestamp, price, price, price, price, 0.0]
+                      for timestamp in range(start, bucket, self.timeframe_ms))
+        self.closed.extend(closed)
+        return closed
+
+def make_exchange(exchange_id, sandbox):
+    """Creates the ccxt.pro client of an exchange (public streams need no API keys)."""
+    if ccxtpro is None or not hasattr(ccxtpro, exchange_id):
+        raise ValueError(f"Exchange '{exchange_id}' has no WebSocket client in this ccxt version.")
+    exchange = getattr(ccxtpro, exchange_id)({'enableRateLimit': True})
+    if sandbox:
+        exchange.set_sandbox_mode(True)
+    return exchange
+
+class MarketDataDaemon:
+    """
+    Args:
+        exchange_factory (callable): (exchange_id, sandbox) -> async ccxt-like client with
+                                     watch_trades, fetch_ohlcv, milliseconds and close.
+        grace_ms (int): How long after a candle's end late trades are still counted.
+        tick_seconds (float): How often candles without new trades are checked for closing.
+    """
+
+    def __init__(self, exchange_factory=make_exchange, grace_ms=1000, tick_seconds=0.1):
+        self.exchange_factory = exchange_factory
+        self.grace_ms = grace_ms
+        self.tick_seconds = tick_seconds
+        self._exchanges = {}
+        self._feeds = {}
+        self._builders = {}
+        self._subscribers = {}
+        self._series_locks = {}
+        self._clock = None
+
+    async def serve(self, address=DEFAULT_ADDRESS):
+        """Listens for bots until cancelled."""
+        kind, *location = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(location[0]):
+                os.unlink(location[0]) # Left behind by a previous run
+            server = await asyncio.start_unix_server(self._handle_client, path=location[0])
+        else:
+            server = await asyncio.start_server(self._handle_client, *location)
+        print(f"Market data daemon listening on {address}")
+        self._clock = asyncio.ensure_future(self._run_clock())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        tasks = list(self._feeds.values()) + ([self._clock] if self._clock else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for exchange in self._exchanges.values():
+            await exchange.close()
+        self._feeds.clear()
+        self._exchanges.clear()
+
+    async def _handle_client(self, reader, writer):
+        subscribed = set()
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    if message.get('op') != 'subscribe':
+                        raise ValueError(f"Unknown op {message.get('op')!r}")
+                    subscribed.add(await self._subscribe(writer, message))
+                except (ValueError, KeyError, ccxt.BaseError) as e:
+                    self._send(writer, {'type': 'error', 'message': str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            for key in subscribed:
+                self._unsubscribe(writer, key)
+            writer.close()
+
+    async def _subscribe(self, writer, message):
+        exchange_id, symbol, timeframe = message['exchange'], message['symbol'], message['timeframe']
+        sandbox = bool(message.get('sandbox', False))
+        key = (exchange_id, sandbox, symbol, timeframe)
+        builder = await self._builder(key, int(message.get('history', 100)))
+
+        self._send(writer, {**self._series_fields(key), 'type': 'snapshot',
+                            'candles': list(builder.closed)[-int(message.get('history', 100)):]})
+        self._subscribers.setdefault(key, set()).add(writer)
+        feed_key = key[:3]
+        if feed_key not in self._feeds:
+            self._feeds[feed_key] = asyncio.ensure_future(self._run_feed(feed_key))
+        print(f"Subscribed a bot to {symbol} {timeframe} on {exchange_id}")
+        return key
+
+    def _unsubscribe(self, writer, key):
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(writer)
+        if subscribers:
+            return
+        # Nobody listens to the series any more: drop it, and its feed if that was the last one
+        del self._subscribers[key]
+        self._builders.pop(key, None)
+        feed_key = key[:3]
+        if not any(other[:3] == feed_key for other in self._builders):
+            feed = self._feeds.pop(feed_key, None)
+            if feed is not None:
+                feed.cancel()
+
+    def _exchange(self, exchange_id, sandbox):
+        if (exchange_id, sandbox) not in self._exchanges:
+            self._exchanges[(exchange_id, sandbox)] = self.exchange_factory(exchange_id, sandbox)
+        return self._exchanges[(exchange_id, sandbox)]
+
+    async def _builder(self, key, history):
+        """Returns the series' builder, seeding it over REST on first use or when more history is asked for."""
+        lock = self._series_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            builder = self._builders.get(key)
+            if builder is None or builder.closed.maxlen < history:
+                exchange_id, sandbox, symbol, timeframe = key
+                exchange = self._exchange(exchange_id, sandbox)
+                new_builder = CandleBuilder(timeframe, history=max(history, builder.closed.maxlen if builder else 0))
+                now_ms = exchange.milliseconds()
+                ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=new_builder.closed.maxlen + 1)
+                new_builder.seed(ohlcv, now_ms)
+                self._builders[key] = builder = new_builder
+            return builder
+
+    async def _run_feed(self, feed_key):
+        exchange_id, sandbox, symbol = feed_key
+        exchange = self._exchange(exchange_id, sandbox)
+        backoff = 1.0
+        while True:
+            try:
+                # ccxt.pro returns only the trades received since the previous call
+                trades = await exchange.watch_trades(symbol)
+                backoff = 1.0
+            except ccxt.BaseError as e:
+                print(f"Trade stream for {symbol} on {exchange_id} failed: {e}. Reconnecting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+                continue
+            builders = [(key, builder) for key, builder in self._builders.items() if key[:3] == feed_key]
+            for trade in trades:
+                for key, builder in builders:
+                    closed = builder.add_trade(int(trade['timestamp']), float(trade['price']), float(trade['amount'] or 0.0))
+                    self._publish(key, closed)
+
+    async def _run_clock(self):
+        """Closes candles whose period ended without a trade of the next period arriving."""
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            for key, builder in list(self._builders.items()):
+                exchange = self._exchanges.get(key[:2])
+                if exchange is not None:
+                    self._publish(key, builder.close_until(exchange.milliseconds() - self.grace_ms))
+
+    def _publish(self, key, candles):
+        if not candles:
+            return
+        for writer in list(self._subscribers.get(key, ())):
+            for candle in candles:
+                self._send(writer, {**self._series_fields(key), 'type': 'candle', 'candle': candle})
+
+    def _send(self, writer, message):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER_BYTES:
+            print("Disconnecting a bot that stopped reading")
+            writer.close()
+            return
+        writer.write((json.dumps(message) + '\n').encode())
+
+    @staticmethod
+    def _series_fields(key):
+        exchange_id, sandbox, symbol, timeframe = key
+        return {'exchange': exchange_id, 'sandbox': sandbox, 'symbol': symbol, 'timeframe': timeframe}
+
+class ReplayExchange:
+    """
+    Stands in for a ccxt.pro exchange by replaying recorded trades, for tests and
+    offline runs. Its clock starts at `start_ms` and runs `speed` times faster than
+    real time; trades before `start_ms` make up the history served by fetch_ohlcv.
+
+    Args:
+        trades (list): ccxt-style trade dicts with 'timestamp', 'price' and 'amount'.
+    """
+
+    id = 'replay'
+
+    def __init__(self, trades, speed=1.0, start_ms=None):
+        self.trades = sorted(trades, key=lambda t: t['timestamp'])
+        self.speed = speed
+        self.start_ms = self.trades[0]['timestamp'] if start_ms is None and self.trades else (start_ms or 0)
+        self._started = time.monotonic()
+        self._cursor = next((i for i, t in enumerate(self.trades) if t['timestamp'] >= self.start_ms), len(self.trades))
+        self.exhausted = asyncio.Event()
+
+    def milliseconds(self):
+        return int(self.start_ms + (time.monotonic() - self._started) * 1000 * self.speed)
+
+    def parse_timeframe(self, timeframe):
+        return timeframe_to_ms(timeframe) // 1000
+
+    async def watch_trades(self, symbol, since=None, limit=None, params={}):
+        """Returns the next trades once the replay clock reaches them."""
+        if self._cursor >= len(self.trades):
+            self.exhausted.set()
+            await asyncio.Event().wait() # The recording is over: stay silent like a quiet market
+        wait_ms = self.trades[self._cursor]['timestamp'] - self.milliseconds()
+        if wait_ms > 0:
+            await asyncio.sleep(wait_ms / 1000 / self.speed)
+        now_ms = self.milliseconds()
+        end = self._cursor
+        while end < len(self.trades) and self.trades[end]['timestamp'] <= now_ms:
+            end += 1
+        batch, self._cursor = self.trades[self._cursor:end], end
+        return batch
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        """Candles aggregated from the trades the replay clock has passed."""
+        now_ms = self.milliseconds()
+        past = [t for t in self.trades if t['timestamp'] <= now_ms and (since is None or t['timestamp'] >= since)]
+        if not past:
+            return []
+        candles = aggregate_rows(trades_to_rows(past), timeframe_to_ms(timeframe)).tolist()
+        return candles[-limit:] if limit else candles
+
+    async def close(self):
+        pass
+
+def load_trades_csv(path):
+    """Reads recorded trades from a CSV file with timestamp (ms), price and amount columns."""
+    with open(path, newline='') as f:
+        return [{'timestamp': int(float(row['timestamp'])), 'price': float(row['price']),
+                 'amount': float(row['amount'])} for row in csv.DictReader(f)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams trades and publishes closed candles to local bots.")
+    parser.add_argument('--listen', default=DEFAULT_ADDRESS, help="host:port or unix:/path/to.sock")
+    parser.add_argument('--replay', help="Replay the trades of this CSV file instead of connecting to exchanges")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed as a multiple of real time")
+    parser.add_argument('--grace-ms', type=int, default=1000, help="How long late trades are waited for after a candle ends")
+    args = parser.parse_args()
+
+    exchange_factory = make_exchange
+    if args.replay:
+        replay = ReplayExchange(load_trades_csv(args.replay), speed=args.speed)
+        exchange_factory = lambda exchange_id, sandbox: replay
+
+    daemon = MarketDataDaemon(exchange_factory, grace_ms=args.grace_ms)
+    try:
+        asyncio.run(daemon.serve(args.listen))
+    except KeyboardInterrupt:
+        print("Market data daemon stopped.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Array-based OHLCV aggregation for the chart servers.
+
+Trades or base candles are binned into epoch-aligned buckets of any size (10s, 15m,
+4h, ...). Input rows are sorted by time, so every bucket is one contiguous run and
+is reduced with np.*.reduceat instead of a pandas resample plus a Python loop.
+Aggregated candles are (n, 6) float64 arrays of [timestamp_ms, open, high, low,
+close, volume], the same layout ccxt uses for fetch_ohlcv.
+"""
+import numpy as np
+
+CHART_KEYS = ('time', 'open', 'high', 'low', 'close')
+TIMEFRAME_UNITS_MS = {'s': 1_000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+def timeframe_to_ms(timeframe) -> int:
+    """Converts a fixed-length timeframe string such as '10s', '15m', '4h' or '1w' to milliseconds."""
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Unsupported timeframe '{timeframe}'.")
+    return int(amount) * TIMEFRAME_UNITS_MS[unit]
+
+def trades_to_rows(trades) -> np.ndarray:
+    """
+    Converts ccxt trades (dicts with 'timestamp', 'price' and 'amount') into base rows
+    where each trade is a candle with open = high = low = close = price, sorted by time.
+    """
+    count = len(trades)
+    timestamps = np.fromiter((t['timestamp'] for t in trades), dtype=np.float64, count=count)
+    prices = np.fromiter((t['price'] for t in trades), dtype=np.float64, count=count)
+    amounts = np.fromiter((t['amount'] or 0.0 for t in trades), dtype=np.float64, count=count)
+    rows = np.column_stack((timestamps, prices, prices, prices, prices, amounts))
+    if count > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+        rows = rows[np.argsort(timestamps, kind='stable')]
+    return rows
+
+def aggregate_rows(rows, bucket_ms, offset_ms=0) -> np.ndarray:
+    """
+    Aggregates time-sorted base rows [timestamp_ms, open, high, low, close, volume]
+    into buckets of `bucket_ms`, starting `offset_ms` after the epoch-aligned boundaries.
+    Empty buckets are skipped.
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    if len(rows) == 0:
+        return np.empty((0, 6))
+
+    buckets = (rows[:, 0].astype(np.int64) - offset_ms) // bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+
+    aggregated = np.empty((len(starts), 6))
+    aggregated[:, 0] = buckets[starts] * bucket_ms + offset_ms
+    aggregated[:, 1] = rows[starts, 1]
+    aggregated[:, 2] = np.maximum.reduceat(rows[:, 2], starts)
+    aggregated[:, 3] = np.minimum.reduceat(rows[:, 3], starts)
+    aggregated[:, 4] = rows[ends - 1, 4]
+    aggregated[:, 5] = np.add.reduceat(rows[:, 5], starts)
+    return aggregated
+
+def to_chart_candles(ohlcv) -> list:
+    """Serializes aggregated candles into the {'time' (seconds), 'open', ...} dicts the chart expects."""
+    ohlcv = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    columns = ohlcv[:, :5].copy()
+    columns[:, 0] /= 1000
+    return [dict(zip(CHART_KEYS, row)) for row in columns.tolist()]
+
+class OHLCVAggregator:
+    """
+    Incrementally aggregates a live stream of trades or base candles.
+
+    Closed buckets are kept as aggregated rows; the base rows of the latest (open)
+    bucket are kept separately so it can be re-aggregated when they change. Each
+    update therefore costs O(new rows + rows in the open bucket), not O(history).
+    """
+
+    def __init__(self, bucket_ms, max_candles=None):
+        self.bucket_ms = bucket_ms
+        self.max_candles = max_candles
+        self.closed = np.empty((0, 6))
+        self.open_rows = np.empty((0, 6))
+
+    def add_trades(self, trades) -> np.ndarray:
+        """Adds trades newer than the ones already seen. Returns the candles that changed."""
+        return self._update(trades_to_rows(trades), replace_from_first=False)
+
+    def add_candles(self, ohlcv) -> np.ndarray:
+        """
+        Adds base candles. A candle at or after the first new timestamp replaces the stored
+        one (exchanges resend the forming candle). Returns the candles that changed.
+        """
+        return self._update(np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6), replace_from_first=True)
+
+    def _update(self, rows, replace_from_first):
+        if len(rows) == 0:
+            return np.empty((0, 6))
+
+        open_rows = self.open_rows
+        if replace_from_first:
+            open_rows = open_rows[open_rows[:, 0] < rows[0, 0]]
+        # Rows older than the open bucket belong to candles that are already closed
+        if len(self.closed):
+            rows = rows[rows[:, 0] >= self.closed[-1, 0] + self.bucket_ms]
+
+        merged = np.concatenate((open_rows, rows))
+        if len(merged) == 0:
+            return np.empty((0, 6))
+        changed = aggregate_rows(merged, self.bucket_ms)
+
+        last_bucket_start = changed[-1, 0]
+        self.open_rows = merged[merged[:, 0] >= last_bucket_start]
+        self.closed = np.concatenate((self.closed, changed[:-1]))
+        if self.max_candles and len(self.closed) > self.max_candles:
+            self.closed = self.closed[-self.max_candles:]
+        return changed
+
+    @property
+    def open_candle(self):
+        """The aggregated open bucket, or None before any data arrives."""
+        return aggregate_rows(self.open_rows, self.bucket_ms)[0] if len(self.open_rows) else None
+
+    @property
+    def candles(self) -> np.ndarray:
+        """All candles, closed ones followed by the open one."""
+        if not len(self.open_rows):
+            return self.closed
+        return np.concatenate((self.closed, aggregate_rows(self.open_rows, self.bucket_ms)))
@@ -0,0 +1,122 @@
+"""
+Process-wide cache of exchange candles for the chart servers.
+
+Each (exchange, symbol, timeframe) series keeps its closed candles in memory. A
+request only fetches what the cache does not have: history older than anything
+requested so far, and the tail from the last closed candle onward, which includes
+the candle that is still forming. That candle is returned but never cached. With a
+warm cache a chart reload costs a single small fetch_ohlcv call.
+
+Requests for the same series are serialized by a per-series lock, so parallel
+requests wait for the one fetch in flight and then answer from memory.
+"""
+import threading
+import time
+import numpy as np
+
+class _Series:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.closed = np.empty((0, 6))
+        self.covered_from_ms = None # Earliest `since` already fetched from the exchange
+        self.forming = None
+        self.refreshed_at = 0.0
+
+class OHLCVCache:
+    """
+    Args:
+        page_limit (int): Candles requested per fetch_ohlcv call.
+        refresh_seconds (float): How long a fetched tail is served before asking the
+                                 exchange again (parallel requests within this window
+                                 share one fetch).
+        max_candles (int): Closed candles kept per series; the oldest are dropped beyond this.
+    """
+
+    def __init__(self, page_limit=500, refresh_seconds=1.0, max_candles=200_000):
+        self.page_limit = page_limit
+        self.refresh_seconds = refresh_seconds
+        self.max_candles = max_candles
+        self._series = {}
+        self._series_lock = threading.Lock()
+
+    @staticmethod
+    def series_key(exchange, symbol, timeframe):
+        """Keys testnet and live data of the same exchange separately."""
+        exchange_key = exchange.id + (':sandbox' if getattr(exchange, 'isSandboxModeEnabled', False) else '')
+        return exchange_key, symbol, timeframe
+
+    def _get_series(self, key):
+        with self._series_lock:
+            if key not in self._series:
+                self._series[key] = _Series()
+            return self._series[key]
+
+    def _fetch_pages(self, exchange, symbol, timeframe, since_ms, end_ms=None):
+        """Pages forward from since_ms until the exchange runs out of candles or end_ms is reached."""
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        pages = []
+        while True:
+            page = exchange.fetch_ohlcv(symbol, timeframe, since=since_ms, limit=self.page_limit)
+            if page:
+                pages.append(np.asarray(page, dtype=np.float64).reshape(-1, 6))
+            if len(page) < self.page_limit or (end_ms is not None and page[-1][0] >= end_ms):
+                break
+            since_ms = int(page[-1][0]) + timeframe_ms
+        return np.concatenate(pages) if pages else np.empty((0, 6))
+
+    def get_candles(self, exchange, symbol, timeframe, since_ms):
+        """
+        Returns the candles from since_ms onward, closed ones plus the one still forming.
+
+        Args:
+            exchange: A ccxt exchange (rate limiting is left to its enableRateLimit).
+            since_ms (int): Start of the range in milliseconds.
+
+        Returns:
+            np.ndarray: (n, 6) float64 rows of [timestamp_ms, open, high, low, close, volume].
+        """
+        series = self._get_series(self.series_key(exchange, symbol, timeframe))
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+
+        with series.lock:
+            fetched = []
+            if series.covered_from_ms is None or since_ms < series.covered_from_ms:
+                # Older history than anything cached: fetch it up to the first cached candle
+                end_ms = series.closed[0, 0] if len(series.closed) else None
+                history = self._fetch_pages(exchange, symbol, timeframe, since_ms, end_ms)
+                fetched.append(history[history[:, 0] < end_ms] if end_ms is not None else history)
+                series.covered_from_ms = since_ms
+                series.refreshed_at = 0.0 if end_ms is not None else time.monotonic()
+                series.forming = None
+
+            if time.monotonic() - series.refreshed_at >= self.refresh_seconds:
+                tail_since = int(series.closed[-1, 0]) + timeframe_ms if len(series.closed) else since_ms
+                fetched.append(self._fetch_pages(exchange, symbol, timeframe, tail_since))
+                series.refreshed_at = time.monotonic()
+                series.forming = None
+
+            if fetched:
+                rows = np.concatenate([series.closed] + fetched)
+                # Keep one row per timestamp, the most recently fetched
+                _, last_positions = np.unique(rows[::-1, 0], return_index=True)
+                rows = rows[len(rows) - 1 - last_positions]
+                is_closed = rows[:, 0] + timeframe_ms <= exchange.milliseconds()
+                series.closed = rows[is_closed][-self.max_candles:]
+                if len(series.closed) == self.max_candles:
+                    # Dropped history has to be fetched again if it is asked for
+                    series.covered_from_ms = max(series.covered_from_ms, int(series.closed[0, 0]))
+                forming = rows[~is_closed]
+                if len(forming):
+                    series.forming = forming[-1:]
+
+            closed = series.closed[np.searchsorted(series.closed[:, 0], since_ms, side='left'):]
+            if series.forming is not None:
+                return np.concatenate((closed, series.forming))
+            return closed.copy()
+
+    def clear(self):
+        with self._series_lock:
+            self._series.clear()
+
+# The cache shared by every request of the process
+candle_cache = OHLCVCache()
@@ -2,8 +2,8 @@ import sys
 import os
 import time
 import requests
-import ccxt
 import json
+import numpy as np
 
 # Check if running in virtual environment
 if not hasattr(sys, 'real_prefix') and not hasattr(sys, 'base_prefix') or sys.base_prefix == sys.prefix:
@@ -20,7 +20,12 @@ import threading
 import sqlite3
 from playwright.sync_api import sync_playwright
 import logging
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from lrc_calculator import calculate_lrc_parameters
+from ohlcv_cache import candle_cache
+from exchange_pool import exchange_pool
 
 app = Flask(__name__)
 
@@ -126,41 +131,6 @@ def get_historical_data():
         print("Fallback data on error:", fallback_data)
         return jsonify(fallback_data)
 
-def _fetch_all_candles_since(exchange, symbol, timeframe, start_timestamp_sec):
-    """Fetches all candles from a start date by paginating through the API."""
-    since_ms = start_timestamp_sec * 1000
-    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
-    
-    all_ohlcv = []
-    
-    while True:
-        # Safety check: do not try to fetch data from the future.
-        if since_ms > exchange.milliseconds():
-            break
-
-        print(f"Fetching {symbol} {timeframe} candles since {datetime.fromtimestamp(since_ms/1000).isoformat()}...")
-        # We use a limit of 500, a common and safe number for many exchanges.
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since_ms, limit=500)
-        
-        if not ohlcv:
-            break
-            
-        all_ohlcv.extend(ohlcv)
-        
-        # If the exchange returns fewer candles than the limit, we've reached the end of the available data.
-        if len(ohlcv) < 500:
-            break
-            
-        # The 'since' for the next fetch should be the timestamp of the last candle we received.
-        since_ms = ohlcv[-1][0] + timeframe_ms
-        
-        # Be polite to the API to avoid being rate-limited.
-        time.sleep(exchange.rateLimit / 1000)
-
-    # In case of any overlap, filter for unique candles and sort them.
-    unique_candles = {c[0]: c for c in all_ohlcv}
-    return sorted(unique_candles.values(), key=lambda x: x[0])
-
 @app.route('/api/lrc-data')
 def get_lrc_data():
     try:
@@ -183,15 +153,14 @@ def get_lrc_data():
         if not inflection_timestamp:
             inflection_timestamp = fetch_start_timestamp
 
-        exchange = ccxt.bitmex({
-            'enableRateLimit': True,
-        })
-        exchange.set_sandbox_mode(True) # Use the official method for testnet
+        # Shared testnet client: markets, rate limiter and HTTP session survive between requests
+        exchange = exchange_pool.get('bitmex', sandbox=True)
         
-        # --- 2. Fetch all data since the start date ---
-        ohlcv = _fetch_all_candles_since(exchange, 'XBTUSD', bin_size, fetch_start_timestamp)
+        # --- 2. Get all data since the start date ---
+        # Served from the process-wide cache; only the candles after the last closed one are fetched
+        ohlcv = candle_cache.get_candles(exchange, 'XBTUSD', bin_size, fetch_start_timestamp * 1000)
         
-        if not ohlcv:
+        if len(ohlcv) == 0:
             return jsonify({'error': 'No data found for the specified date range.'}), 404
 
         candles = [{
@@ -210,7 +179,10 @@ def get_lrc_data():
             return jsonify({"error": "Invalid deviations format. Use comma-separated numbers."}), 400
 
         # --- 4. Calculate LRC ---
-        lrc_params = calculate_lrc_parameters(candles, use_date_range=use_date_range, start_timestamp=inflection_timestamp)
+        # Regress straight on the OHLCV columns rather than on the per-candle dicts
+        ohlcv_array = np.asarray(ohlcv, dtype=np.float64)
+        lrc_input = {'time': (ohlcv_array[:, 0] // 1000).astype(np.int64), 'close': ohlcv_array[:, 4]}
+        lrc_params = calculate_lrc_parameters(lrc_input, use_date_range=use_date_range, start_timestamp=inflection_timestamp)
 
         if not lrc_params:
             return jsonify({"candles": candles, "lrc": None})
@@ -362,5 +334,6 @@ if __name__ == '__main__':
     cur.execute("DELETE FROM funding_rates WHERE UPPER(symbol) NOT LIKE 'BTC%' AND UPPER(symbol) NOT LIKE 'XBT%'")
     conn.commit()
     conn.close()
+    exchange_pool.get('bitmex', sandbox=True) # Load the markets before the first chart request
     # Running with use_reloader=False to prevent zombie processes from locking the port.
     app.run(debug=True, use_reloader=False, port=5004)
\ No newline at end of file
@@ -2,14 +2,22 @@ import ccxt
 import json
 import time
 import os
+import sys
 from datetime import datetime
 import numpy as np
 
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_data_client import MarketDataClient
+
 # --- Constants ---
 SYMBOL = 'BTC/USDT'
 # TIMEFRAME will be loaded from params file
 PARAMS_FILE = 'stable_v3/lrc_params.json'
 POLL_INTERVAL_S = 60 # Check for signals every 60 seconds
+# Address of market_data_daemon.py (e.g. 127.0.0.1:8765). When set, signals are checked
+# on every closed candle it publishes, and the parameters still reloaded every POLL_INTERVAL_S.
+MARKET_DATA_ADDRESS = os.getenv('MARKET_DATA_ADDRESS')
 
 # --- Exchange Credentials (from app.py) ---
 # For your security, please REVOKE these keys from your Binance account after this session.
@@ -41,7 +49,34 @@ def initialize_exchange():
     })
     return exchange
 
-def check_for_signal(exchange, lrc_data):
+def connect_market_data():
+    """Connects to the market data daemon, or returns None to poll REST."""
+    if not MARKET_DATA_ADDRESS:
+        return None
+    print(f"Receiving candles from the market data daemon at {MARKET_DATA_ADDRESS}")
+    return MarketDataClient(MARKET_DATA_ADDRESS)
+
+def fetch_latest_candle(exchange, feed, timeframe):
+    """
+    The latest candle: the last closed one from the daemon, subscribing to the timeframe
+    the first time it is used, or the one still forming over REST.
+    """
+    if feed is None:
+        return exchange.fetch_ohlcv(SYMBOL, timeframe, limit=1)[0]
+    try:
+        candles = feed.candles('binance', SYMBOL, timeframe)
+    except KeyError:
+        candles = feed.subscribe('binance', SYMBOL, timeframe, history=1)
+    return candles[-1]
+
+def wait_for_next_cycle(feed):
+    """Waits for the next closed candle, at most the poll interval (or just that without the daemon)."""
+    if feed is None:
+        time.sleep(POLL_INTERVAL_S)
+    else:
+        feed.wait_for_close(timeout=POLL_INTERVAL_S)
+
+def check_for_signal(exchange, lrc_data, feed=None):
     """
     Checks for a trading signal based on the latest candle and LRC data.
     """
@@ -63,7 +98,7 @@ def check_for_signal(exchange, lrc_data):
     print("Fetching latest candle...")
     try:
         timeframe_seconds = exchange.parse_timeframe(timeframe)
-        latest_candle = exchange.fetch_ohlcv(SYMBOL, timeframe, limit=1)[0]
+        latest_candle = fetch_latest_candle(exchange, feed, timeframe)
         # [timestamp, open, high, low, close, volume]
         latest_candle_ts = latest_candle[0] / 1000 # ms to s
         close_price = latest_candle[4]
@@ -134,6 +169,7 @@ def main():
     """Main bot loop."""
     print("--- LRC Trading Bot Starting ---")
     exchange = initialize_exchange()
+    feed = connect_market_data()
     
     print(f"Bot configured for {SYMBOL}.")
     print(f"Polling for signals every {POLL_INTERVAL_S} seconds.")
@@ -143,11 +179,11 @@ def main():
         lrc_data = load_lrc_params()
         
         if lrc_data:
-            check_for_signal(exchange, lrc_data)
+            check_for_signal(exchange, lrc_data, feed)
         else:
             print("Waiting for LRC parameters to be generated from the web UI...")
 
-        time.sleep(POLL_INTERVAL_S)
+        wait_for_next_cycle(feed)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-import numpy as np
+from lrc_core import candle_columns, first_index_at_or_after, fit_lrc
 
 def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
     """
@@ -8,7 +8,8 @@ def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
     This version regresses against the BAR INDEX to match TradingView's method.
 
     Args:
-        data (list of dicts): A list of candlestick data points.
+        data: Candles with 'time' and 'close' - a dict of arrays or DataFrame (used
+              without copying), or a list of candlestick dicts.
         use_date_range (bool): If True, calculation starts from start_timestamp.
         start_timestamp (int): The Unix timestamp to start the calculation from.
 
@@ -16,43 +17,38 @@ def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
         dict: A dictionary containing the slope, intercept, standard deviation,
               and start/end points of the channel.
     """
-    if not data:
+    times, closes = candle_columns(data)
+    if len(closes) == 0:
         return {}
 
     # --- 1. Filter Data by Date Range ---
     first_valid_bar_index = 0
     if use_date_range and start_timestamp:
-        for i, d in enumerate(data):
-            if d['time'] >= start_timestamp:
-                first_valid_bar_index = i
-                break
-        else:
+        first_valid_bar_index = first_index_at_or_after(times, start_timestamp)
+        if first_valid_bar_index == len(times):
             return {}
-    
-    calc_data = data[first_valid_bar_index:]
-    
-    if len(calc_data) < 2:
-        return {}
 
-    # --- 2. Perform Linear Regression against BAR INDEX ---
-    source_prices = np.array([d['close'] for d in calc_data])
-    indices = np.arange(len(source_prices))
-    slope, intercept = np.polyfit(indices, source_prices, 1)
+    calc_times = times[first_valid_bar_index:]
+    calc_prices = closes[first_valid_bar_index:]
+
+    if len(calc_prices) < 2:
+        return {}
 
-    # --- 3. Calculate Standard Deviation ---
-    regression_values = slope * indices + intercept
-    deviations = source_prices - regression_values
-    std_dev = np.std(deviations)
+    # --- 2 & 3. Regress against BAR INDEX and measure the Standard Deviation ---
+    lrc_params = fit_lrc(calc_prices)
+    slope = lrc_params['slope']
+    intercept = lrc_params['intercept']
+    std_dev = lrc_params['std_dev']
 
     # --- 4. Return the essential parameters, not the wobbly point-by-point line ---
     start_point_index = 0
-    end_point_index = len(indices) - 1
+    end_point_index = len(calc_prices) - 1
 
     start_price = slope * start_point_index + intercept
     end_price = slope * end_point_index + intercept
     
-    start_time = calc_data[start_point_index]['time']
-    end_time = calc_data[end_point_index]['time']
+    start_time = calc_times[start_point_index].item()
+    end_time = calc_times[end_point_index].item()
 
     # --- 5. Calculate channel lines based on the single regression ---
     # The standard deviation is a fixed vertical offset from the main line.
@@ -70,9 +66,9 @@ def calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
     lower_channel_end = {'time': end_time, 'price': end_price - std_dev}
 
     return {
-        'start_time': calc_data[start_point_index]['time'],
+        'start_time': start_time,
         'start_price': start_price,
-        'end_time': calc_data[end_point_index]['time'],
+        'end_time': end_time,
         'end_price': end_price,
         'std_dev': std_dev,
         'slope': slope,
@@ -0,0 +1,219 @@
+"""
+Parallel parameter sweep for the backtesters.
+
+Loads the OHLCV table once, puts it in shared memory and runs every point of a
+parameter grid through TradingBot + Backtester in a process pool. Workers map the
+shared block instead of receiving a pickled DataFrame.
+
+Examples:
+    python sweep.py lrc --grid deviation=1,1.5,2,2.5 window=0,200,500
+    python sweep.py sma --grid sma_window=20,50,100,200 --workers 8
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# --- Shared OHLCV Block ---
+class SharedOHLCV:
+    """
+    Holds OHLCV data in one shared memory block: an int64 nanosecond timestamp
+    column followed by the float64 OHLCV columns.
+    """
+
+    def __init__(self, shm, num_rows):
+        self.shm = shm
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Copies a DataFrame indexed by timestamp into a new shared memory block."""
+        num_rows = len(df)
+        shm = shared_memory.SharedMemory(create=True, size=max(num_rows * 8 * (1 + len(OHLCV_COLUMNS)), 1))
+        block = cls(shm, num_rows)
+        timestamps, values = block.arrays()
+        timestamps[:] = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+        values[:] = df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+        return block
+
+    @classmethod
+    def attach(cls, name, num_rows):
+        """Maps an existing block created by another process."""
+        return cls(shared_memory.SharedMemory(name=name), num_rows)
+
+    def arrays(self):
+        """Returns (timestamps, values) as views on the shared buffer."""
+        timestamps = np.ndarray((self.num_rows,), dtype=np.int64, buffer=self.shm.buf)
+        values = np.ndarray((self.num_rows, len(OHLCV_COLUMNS)), dtype=np.float64,
+                            buffer=self.shm.buf, offset=self.num_rows * 8)
+        return timestamps, values
+
+    def to_dataframe(self):
+        """Builds a DataFrame whose columns are views on the shared buffer."""
+        timestamps, values = self.arrays()
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'), name='timestamp')
+        return pd.DataFrame({name: values[:, i] for i, name in enumerate(OHLCV_COLUMNS)}, index=index, copy=False)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+# --- Strategies ---
+def _load_strategy(strategy):
+    """Returns the (TradingBot, Backtester) classes for a strategy name."""
+    # Both backtesters read their candles through data/candle_store.py
+    sys.path.append(os.path.join(ROOT_DIR, 'data'))
+    if strategy == 'lrc':
+        sys.path.append(os.path.join(ROOT_DIR, 'lrc_io_bot'))
+        import lrc_in_out_bot as module
+    elif strategy == 'sma':
+        import backtester as module
+    else:
+        raise ValueError(f"Unknown strategy '{strategy}'. Use 'lrc' or 'sma'.")
+    return module.TradingBot, module.Backtester
+
+def _run_backtest(strategy, data, params, initial_capital):
+    TradingBot, Backtester = _load_strategy(strategy)
+    bot_params = dict(params)
+    if strategy == 'lrc' and not bot_params.get('window'):
+        bot_params['window'] = None # window=0 means one fit over the whole dataset
+
+    signals = TradingBot(data, **bot_params).signals
+    backtester = Backtester(initial_capital=initial_capital)
+    if signals.empty:
+        return signals, pd.DataFrame()
+    if strategy == 'sma':
+        return signals, backtester.run(signals, data)
+    return signals, backtester.run(signals)
+
+# --- Metrics ---
+def summarize_backtest(signals, portfolio, initial_capital):
+    """Returns final value, annualized Sharpe ratio, max drawdown and trade count for one run."""
+    if portfolio.empty:
+        return {'final_value': initial_capital, 'sharpe': np.nan, 'max_drawdown': 0.0, 'trades': 0}
+
+    total = portfolio['total'].to_numpy(dtype=np.float64)
+    returns = np.diff(total) / total[:-1]
+
+    # Annualize with the bar size, e.g. 365*24 periods a year for hourly bars
+    bar_seconds = np.median(np.diff(pd.DatetimeIndex(portfolio.index).as_unit('ns').asi8)) / 1e9 if len(portfolio) > 1 else 0
+    periods_per_year = 365 * 24 * 3600 / bar_seconds if bar_seconds else 0
+    std = returns.std(ddof=1) if len(returns) > 1 else 0
+    sharpe = returns.mean() / std * periods_per_year ** 0.5 if std else np.nan
+
+    drawdown = total / np.maximum.accumulate(total) - 1
+
+    return {
+        'final_value': total[-1],
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min(),
+        'trades': int((signals['positions'] == 1.0).sum())
+    }
+
+# --- Worker Process ---
+_worker_data = None
+
+def _init_worker(shm_name, num_rows):
+    """Maps the shared OHLCV block once per worker process."""
+    global _worker_data
+    block = SharedOHLCV.attach(shm_name, num_rows)
+    _worker_data = block.to_dataframe()
+    # Keep the mapping alive for the life of the worker
+    _init_worker.block = block
+
+def _run_point(strategy, params, initial_capital):
+    started = time.perf_counter()
+    # The backtesters print as they go; keep the workers quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        signals, portfolio = _run_backtest(strategy, _worker_data, params, initial_capital)
+    result = dict(params)
+    result.update(summarize_backtest(signals, portfolio, initial_capital))
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+# --- Sweep ---
+def parameter_grid(grid):
+    """Expands {'deviation': [1, 2], 'window': [0, 200]} into a list of parameter dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def run_sweep(data, strategy, grid, initial_capital=10000.0, workers=None):
+    """
+    Runs every point of the grid in parallel and returns a results DataFrame.
+
+    Args:
+        data (pd.DataFrame): OHLCV indexed by timestamp.
+        strategy (str): 'lrc' or 'sma'.
+        grid (dict): Parameter name -> list of values passed to TradingBot.
+        initial_capital (float): Starting cash for every run.
+        workers (int): Number of processes; defaults to all cores.
+
+    Returns:
+        pd.DataFrame: One row per grid point with the parameters, 'final_value',
+                      'sharpe', 'max_drawdown', 'trades' and 'seconds'.
+    """
+    points = parameter_grid(grid)
+    block = SharedOHLCV.from_dataframe(data)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(block.shm.name, block.num_rows)) as pool:
+            futures = [pool.submit(_run_point, strategy, params, initial_capital) for params in points]
+            results = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+    return pd.DataFrame(results).sort_values('final_value', ascending=False, ignore_index=True)
+
+def _parse_grid(items):
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        if not values:
+            raise argparse.ArgumentTypeError(f"Grid entries look like name=v1,v2,... (got '{item}').")
+        grid[name] = [int(v) if v.lstrip('-').isdigit() else float(v) for v in values.split(',')]
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a backtest parameter sweep across all cores.")
+    parser.add_argument('strategy', choices=['lrc', 'sma'])
+    parser.add_argument('--grid', nargs='+', required=True, help="e.g. deviation=1,1.5,2 window=0,200")
+    parser.add_argument('--db', default='data/market_data.db')
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--capital', type=float, default=10000.0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    from backtester import DataFeeder
+    data = DataFeeder(args.db).load_data(args.symbol, args.timeframe)
+    if data is None or data.empty:
+        print("Could not load data for the sweep.")
+        return
+
+    grid = _parse_grid(args.grid)
+    print(f"Running {len(parameter_grid(grid))} backtests on {len(data)} bars...")
+    started = time.perf_counter()
+    results = run_sweep(data, args.strategy, grid, args.capital, args.workers)
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+
+    results.to_csv(args.output, index=False)
+    print(results.head(10).to_string(index=False))
+    print(f"\nFull results saved to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared modules live in the repository root; lrc_grid_bot imports its modules flat
+# (`import config`), the way it runs from its own directory
+for path in (ROOT, os.path.join(ROOT, 'lrc_grid_bot')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
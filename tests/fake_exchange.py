@@ -0,0 +1,98 @@
+"""
+In-memory ccxt stand-ins for the lrc_grid_bot tests.
+
+FakeExchange keeps open orders and counts every API call, so tests can check how many
+requests a cycle costs. AsyncFakeExchange serves the same data as coroutines with a
+fixed latency and records when each call ran, so tests can check which ones overlapped.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import Counter
+
+class FakeExchange:
+    def __init__(self, edit_order=True, ohlcv=None, positions=None, balance=None):
+        self.has = {'editOrder': edit_order, 'createOrders': False, 'cancelOrders': False}
+        self.ohlcv = ohlcv or []
+        self.positions = positions or []
+        self.balance = balance or {'free': {}, 'used': {}, 'total': {}}
+        self.orders = {}
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def order_calls(self) -> int:
+        """Requests that changed orders (everything but the fetches)."""
+        return sum(count for name, count in self.calls.items() if not name.startswith('fetch_'))
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self._count('fetch_ohlcv')
+        return self.ohlcv[-limit:] if limit else list(self.ohlcv)
+
+    def fetch_positions(self, symbols=None, params={}):
+        self._count('fetch_positions')
+        return list(self.positions)
+
+    def fetch_balance(self, params={}):
+        self._count('fetch_balance')
+        return self.balance
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._count('fetch_open_orders')
+        with self._lock:
+            return [dict(order) for order in self.orders.values()]
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._count('create_order')
+        stop_price = params.get('stopPrice')
+        with self._lock:
+            order = {'id': str(next(self._ids)), 'symbol': symbol, 'type': type, 'side': side, 'amount': amount,
+                     'price': price, 'stopPrice': stop_price, 'triggerPrice': stop_price,
+                     'reduceOnly': bool(params.get('reduceOnly')), 'status': 'open'}
+            self.orders[order['id']] = order
+        return dict(order)
+
+    def edit_order(self, id, symbol, type, side, amount=None, price=None, params={}):
+        self._count('edit_order')
+        with self._lock:
+            order = self.orders[id]
+            order.update(amount=amount, price=price)
+            if params.get('stopPrice'):
+                order.update(stopPrice=params['stopPrice'], triggerPrice=params['stopPrice'])
+        return dict(order)
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self._count('cancel_order')
+        with self._lock:
+            return self.orders.pop(id)
+
+class AsyncFakeExchange:
+    """FakeExchange as coroutines that each take `latency` seconds."""
+
+    def __init__(self, latency=0.1, **kwargs):
+        self.sync = FakeExchange(**kwargs)
+        self.has = self.sync.has
+        self.latency = latency
+        self.intervals = {}
+        self.closed = False
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+        if not callable(method) or name in ('order_calls',):
+            return method
+
+        async def call(*args, **kwargs):
+            started = time.monotonic()
+            await asyncio.sleep(self.latency)
+            result = method(*args, **kwargs)
+            self.intervals.setdefault(name, []).append((started, time.monotonic()))
+            return result
+        return call
+
+    async def close(self):
+        self.closed = True
@@ -0,0 +1,121 @@
+"""
+AsyncExchangeManager and AsyncTradingBot (the default bot, USE_ASYNC_EXCHANGE) on a
+fake exchange whose calls each take LATENCY seconds.
+"""
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import config
+import lrc_calculator
+import main
+from async_exchange_manager import AsyncExchangeManager
+from fake_exchange import AsyncFakeExchange
+from test_order_reconciler import make_manager
+
+LATENCY = 0.2
+FETCHES = ('fetch_ohlcv', 'fetch_positions', 'fetch_open_orders', 'fetch_balance')
+HOUR_MS = 3_600_000
+
+def make_ohlcv(count=250, start_ms=1_780_000_000_000):
+    rng = np.random.default_rng(3)
+    closes = 60000 + np.cumsum(rng.normal(0, 80, count))
+    return [[start_ms + i * HOUR_MS, c, c + 40, c - 40, c, 1000.0] for i, c in enumerate(closes.tolist())]
+
+@pytest.fixture
+def fake():
+    return AsyncFakeExchange(latency=LATENCY, ohlcv=make_ohlcv(),
+                             balance={'free': {'XBT': 1.0}, 'used': {}, 'total': {'XBT': 1.0}})
+
+@pytest.fixture
+def bot(fake, tmp_path, monkeypatch):
+    class FakeAsyncExchangeManager(AsyncExchangeManager):
+        _create_client = staticmethod(lambda *args: fake)
+
+    monkeypatch.setattr(config, 'STATE_FILE_PATH', str(tmp_path / 'state.json'))
+    monkeypatch.setattr(main, 'AsyncExchangeManager', FakeAsyncExchangeManager)
+    # main.py imports the calculator module for Strategy only when run as a script
+    monkeypatch.setattr(main, 'lrc_calculator_module', lrc_calculator, raising=False)
+    bot = main.AsyncTradingBot()
+    yield bot
+    bot.loop.run_until_complete(bot.exchange.close())
+    bot.loop.close()
+    bot.state_manager.close()
+
+def test_default_bot_is_async():
+    assert config.USE_ASYNC_EXCHANGE
+
+def test_cycle_fetches_concurrently_and_places_the_grid(bot, fake):
+    started = time.monotonic()
+    bot.run_cycle()
+    elapsed = time.monotonic() - started
+
+    fetch_intervals = [fake.intervals[name][0] for name in FETCHES]
+    # Every fetch started before any of them finished
+    assert max(start for start, _ in fetch_intervals) < min(end for _, end in fetch_intervals)
+    assert max(end for _, end in fetch_intervals) - min(start for start, _ in fetch_intervals) < 1.5 * LATENCY
+    # Four fetches, then five creates four at a time: three round trips, not nine
+    assert elapsed < 4 * LATENCY
+
+    orders = list(fake.sync.orders.values())
+    assert len(orders) == config.SUB_ORDER_COUNT
+    assert sum(order['amount'] for order in orders) == config.MAIN_ORDER_SIZE_USD
+    assert fake.sync.calls['create_order'] == config.SUB_ORDER_COUNT
+
+def test_next_cycle_keeps_the_grid(bot, fake):
+    bot.run_cycle()
+    order_ids = set(fake.sync.orders)
+    bot.run_cycle()
+    assert set(fake.sync.orders) == order_ids
+    assert fake.sync.order_calls() == config.SUB_ORDER_COUNT
+
+def test_reconcile_async_applies_the_plan(fake):
+    from order_reconciler import OrderReconciler, desired_order
+    manager = make_manager(fake, AsyncExchangeManager)
+    reconciler = OrderReconciler(manager, 0.5, 4, manager.logger)
+    live = [fake.sync.create_order('XBTUSD', 'limit', 'buy', 100, price) for price in (29000.0, 29500.0, 30000.0)]
+
+    desired = [desired_order('entry', 'buy', 100, 30001.0, 0.5),   # keeps the order at 30000
+               desired_order('entry', 'buy', 100, 29700.0, 0.5),   # moves the order at 29500
+               desired_order('entry', 'buy', 100, 28000.0, 0.5),   # moves the order at 29000
+               desired_order('entry', 'buy', 100, 27500.0, 0.5)]   # new
+    plan = asyncio.run(reconciler.reconcile_async(desired, live))
+
+    assert (len(plan['keep']), len(plan['amend']), len(plan['cancel']), len(plan['create'])) == (1, 2, 0, 1)
+    assert sorted(order['price'] for order in fake.sync.orders.values()) == [27500.0, 28000.0, 29700.0, 30000.0]
+    assert fake.sync.calls['edit_order'] == 2
+
+def test_cycle_is_skipped_on_a_channel_without_width(bot, fake):
+    fake.sync.ohlcv = [[timestamp, 60000.0, 60000.0, 60000.0, 60000.0, 0.0] for timestamp, *_ in make_ohlcv()]
+    bot.run_cycle()
+    assert fake.sync.order_calls() == 0
+
+def test_cycle_is_skipped_when_the_position_cannot_be_fetched(bot, fake):
+    fake.sync.positions = [{'symbol': config.SYMBOL, 'side': 'long', 'contracts': 300, 'entryPrice': 60000.0}]
+    bot.run_cycle()
+    exit_orders = {order_id: dict(order) for order_id, order in fake.sync.orders.items()}
+    assert exit_orders and all(order['reduceOnly'] for order in exit_orders.values())
+    order_calls = fake.sync.order_calls()
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("timeout")
+    fake.fetch_positions = fail
+    bot.run_cycle()
+
+    # Not taken as flat: the TPs and the HSL stay, and no entry grid is placed
+    assert fake.sync.orders == exit_orders
+    assert fake.sync.order_calls() == order_calls
+
+def test_split_amount_uses_whole_lots():
+    assert main.split_amount(500, 5, 100) == [100, 100, 100, 100, 100]
+    assert main.split_amount(350, 5, 100) == [150, 100, 100] # The remainder goes to the nearest level
+    assert main.split_amount(50, 5, 100) == []               # Below one lot the exchange rejects the order
+    assert main.split_amount(0, 5, 100) == []
+
+def test_position_below_one_lot_only_gets_the_hsl(bot, fake):
+    fake.sync.positions = [{'symbol': config.SYMBOL, 'side': 'long', 'contracts': 50, 'entryPrice': 60000.0}]
+    bot.run_cycle()
+    orders = list(fake.sync.orders.values())
+    assert len(orders) == 1 and orders[0]['amount'] == 50 and orders[0]['reduceOnly']
@@ -0,0 +1,214 @@
+"""
+Parity of lrc_core with the regressions it replaced.
+
+The reference_* functions are the pre-refactor implementations (np.polyfit over
+the selected candles), copied here so the shared maths stays pinned to them.
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+from lrc_core import IncrementalLRC, calculate_lrc_for_anchors, fit_lrc, rolling_lrc
+import lrc_calculator
+
+# stable_v3 has its own lrc_calculator module, so it is loaded under another name
+_spec = importlib.util.spec_from_file_location('stable_v3_lrc_calculator', os.path.join(ROOT, 'stable_v3', 'lrc_calculator.py'))
+stable_v3_lrc_calculator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stable_v3_lrc_calculator)
+calculate_lrc_parameters = stable_v3_lrc_calculator.calculate_lrc_parameters
+
+# --- Pre-refactor implementations ---
+def reference_calculate_lrc_channel(df_ohlcv, inflection_timestamp):
+    """lrc_grid_bot/lrc_calculator.py calculate_lrc_channel before lrc_core."""
+    if df_ohlcv.empty:
+        return {}
+    inflection_ms = inflection_timestamp * 1000
+    calc_data = df_ohlcv[df_ohlcv['timestamp'] >= inflection_ms].copy()
+    if len(calc_data) < 2:
+        return {}
+    indices = np.arange(len(calc_data))
+    source_prices = calc_data['close'].values
+    slope, intercept = np.polyfit(indices, source_prices, 1)
+    regression_values = slope * indices + intercept
+    std_dev = np.std(source_prices - regression_values)
+    if std_dev == 0:
+        return {}
+    return {'slope': slope, 'intercept': intercept, 'std_dev': std_dev}
+
+def reference_calculate_lrc_parameters(data, use_date_range=False, start_timestamp=None):
+    """stable_v3/lrc_calculator.py calculate_lrc_parameters before lrc_core."""
+    if not data:
+        return {}
+    first_valid_bar_index = 0
+    if use_date_range and start_timestamp:
+        for i, d in enumerate(data):
+            if d['time'] >= start_timestamp:
+                first_valid_bar_index = i
+                break
+        else:
+            return {}
+    calc_data = data[first_valid_bar_index:]
+    if len(calc_data) < 2:
+        return {}
+    source_prices = np.array([d['close'] for d in calc_data])
+    indices = np.arange(len(source_prices))
+    slope, intercept = np.polyfit(indices, source_prices, 1)
+    std_dev = np.std(source_prices - (slope * indices + intercept))
+    end_point_index = len(indices) - 1
+    return {
+        'start_time': calc_data[0]['time'],
+        'start_price': intercept,
+        'end_time': calc_data[end_point_index]['time'],
+        'end_price': slope * end_point_index + intercept,
+        'std_dev': std_dev,
+        'slope': slope,
+        'intercept': intercept
+    }
+
+# --- Fixed data ---
+START_MS = 1_700_000_000_000
+HOUR_MS = 3_600_000
+
+@pytest.fixture(scope='module')
+def closes():
+    rng = np.random.default_rng(7)
+    return 30000 + np.cumsum(rng.normal(0, 40, 500)) + np.linspace(0, 2000, 500)
+
+@pytest.fixture(scope='module')
+def ohlcv_df(closes):
+    return pd.DataFrame({'timestamp': START_MS + np.arange(len(closes)) * HOUR_MS, 'close': closes})
+
+def assert_params_close(actual, expected):
+    assert actual.keys() >= {'slope', 'intercept', 'std_dev'}
+    for key in ('slope', 'intercept', 'std_dev'):
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-9)
+
+# --- Tests ---
+@pytest.mark.parametrize('start, stop', [(0, 500), (0, 2), (123, 400), (450, 500)])
+def test_fit_lrc_matches_polyfit(closes, start, stop):
+    window = closes[start:stop]
+    indices = np.arange(len(window))
+    slope, intercept = np.polyfit(indices, window, 1)
+    std_dev = np.std(window - (slope * indices + intercept))
+    assert_params_close(fit_lrc(window), {'slope': slope, 'intercept': intercept, 'std_dev': std_dev})
+
+def test_fit_lrc_needs_two_prices():
+    assert fit_lrc([]) == {}
+    assert fit_lrc([100.0]) == {}
+
+@pytest.mark.parametrize('inflection_index', [0, 1, 250, 498])
+def test_calculate_lrc_channel_matches_reference(ohlcv_df, inflection_index):
+    inflection_timestamp = (START_MS + inflection_index * HOUR_MS) // 1000
+    assert_params_close(lrc_calculator.calculate_lrc_channel(ohlcv_df, inflection_timestamp),
+                        reference_calculate_lrc_channel(ohlcv_df, inflection_timestamp))
+
+def test_calculate_lrc_channel_empty_cases(ohlcv_df):
+    after_last = (START_MS + 500 * HOUR_MS) // 1000
+    assert lrc_calculator.calculate_lrc_channel(ohlcv_df, after_last) == reference_calculate_lrc_channel(ohlcv_df, after_last) == {}
+    # Prices exactly on a line: polyfit left ~1e-16 of rounding in std_dev, the closed form gives 0
+    flat = pd.DataFrame({'timestamp': [START_MS, START_MS + HOUR_MS, START_MS + 2 * HOUR_MS], 'close': [5.0, 5.0, 5.0]})
+    assert lrc_calculator.calculate_lrc_channel(flat, 0) == {}
+    assert reference_calculate_lrc_channel(flat, 0)['std_dev'] < 1e-9
+
+@pytest.mark.parametrize('use_date_range, start_index', [(False, None), (True, 0), (True, 321), (True, 499)])
+def test_calculate_lrc_parameters_matches_reference(closes, use_date_range, start_index):
+    candles = [{'time': START_MS // 1000 + i * 3600, 'close': c} for i, c in enumerate(closes.tolist())]
+    start_timestamp = None if start_index is None else candles[start_index]['time']
+    actual = calculate_lrc_parameters(candles, use_date_range, start_timestamp)
+    expected = reference_calculate_lrc_parameters(candles, use_date_range, start_timestamp)
+    if not expected:
+        assert actual == {}
+        return
+    assert actual['start_time'] == expected['start_time']
+    assert actual['end_time'] == expected['end_time']
+    for key in ('slope', 'intercept', 'std_dev', 'start_price', 'end_price'):
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9)
+
+def test_calculate_lrc_parameters_after_last_candle(closes):
+    candles = [{'time': i, 'close': c} for i, c in enumerate(closes[:10].tolist())]
+    assert calculate_lrc_parameters(candles, True, 100) == reference_calculate_lrc_parameters(candles, True, 100) == {}
+
+def test_incremental_lrc_matches_reference(ohlcv_df, closes):
+    engine = IncrementalLRC()
+    window = 200
+    timestamps = ohlcv_df['timestamp'].to_numpy()
+    for i in range(window):
+        engine.append(timestamps[i], closes[i])
+    for i in range(window, 300):
+        # The forming candle opens at one price and closes at another, then the window slides
+        engine.append(timestamps[i], closes[i] + 35.0)
+        engine.update_last(closes[i])
+        engine.drop_first()
+        frame = ohlcv_df.iloc[i - window + 1:i + 1]
+        expected = reference_calculate_lrc_channel(frame, int(frame['timestamp'].iloc[0]) // 1000)
+        assert_params_close(engine.get_params(), expected)
+
+def test_incremental_lrc_sync_matches_reference(ohlcv_df):
+    inflection_timestamp = (START_MS + 50 * HOUR_MS) // 1000
+    engine = IncrementalLRC(inflection_timestamp)
+    for end in range(200, 260, 7):
+        frame = ohlcv_df.iloc[end - 200:end]
+        assert_params_close(engine.sync(frame), reference_calculate_lrc_channel(frame, inflection_timestamp))
+
+def test_incremental_lrc_flat_series_matches_fit_lrc():
+    engine = IncrementalLRC()
+    timestamps = START_MS + np.arange(400) * HOUR_MS
+    prices = np.concatenate((np.full(200, 30000.0), 30000.0 + 0.5 * np.arange(200)))
+    for i in range(200):
+        engine.append(timestamps[i], prices[i])
+    assert engine.get_params() == fit_lrc(prices[:200]) == {'slope': 0.0, 'intercept': 30000.0, 'std_dev': 0.0}
+    # Slide onto a rising line: every close on it, so the channel has no width either
+    for i in range(200, 400):
+        engine.append(timestamps[i], prices[i])
+        engine.drop_first()
+    assert_params_close(engine.get_params(), fit_lrc(prices[200:]))
+    assert engine.get_params()['std_dev'] == pytest.approx(0.0, abs=1e-6)
+
+    frame = pd.DataFrame({'timestamp': timestamps[:200], 'close': prices[:200]})
+    assert IncrementalLRC().sync(frame) == {'slope': 0.0, 'intercept': 30000.0, 'std_dev': 0.0}
+
+def test_calculate_lrc_for_anchors_matches_reference(ohlcv_df):
+    anchors = np.array([0, 1, 17, 250, 497, 498, 499])
+    result = calculate_lrc_for_anchors(ohlcv_df['close'], anchors)
+    # One bar has no channel; two bars are exactly on their line, where polyfit's std_dev is rounding noise
+    assert np.isnan([result['slope'][-1], result['intercept'][-1], result['std_dev'][-1]]).all()
+    assert_params_close({key: result[-2][key] for key in ('slope', 'intercept', 'std_dev')}, fit_lrc(ohlcv_df['close'][-2:]))
+    for row in result[:-2]:
+        inflection_timestamp = (START_MS + int(row['anchor_index']) * HOUR_MS) // 1000
+        expected = reference_calculate_lrc_channel(ohlcv_df, inflection_timestamp)
+        assert row['num_bars'] == len(ohlcv_df) - row['anchor_index']
+        assert_params_close({key: row[key] for key in ('slope', 'intercept', 'std_dev')}, expected)
+
+def test_calculate_lrc_for_anchors_flat_series_matches_fit_lrc():
+    closes = np.full(50, 30000.0)
+    result = calculate_lrc_for_anchors(closes, [0, 25, 48])
+    for row in result:
+        expected = fit_lrc(closes[row['anchor_index']:])
+        assert expected == {'slope': 0.0, 'intercept': 30000.0, 'std_dev': 0.0}
+        assert_params_close({key: row[key] for key in ('slope', 'intercept', 'std_dev')}, expected)
+
+def test_calculate_lrc_for_anchors_rejects_out_of_range(closes):
+    with pytest.raises(ValueError):
+        calculate_lrc_for_anchors(closes, [len(closes)])
+
+def test_rolling_lrc_matches_refitting_every_bar(closes):
+    window, deviation = 30, 2.0
+    bands = rolling_lrc(closes, window, deviation)
+    assert np.isnan(bands['mid'][:window - 1]).all()
+    for i in range(window - 1, len(closes), 13):
+        expected = reference_calculate_lrc_channel(
+            pd.DataFrame({'timestamp': np.arange(window), 'close': closes[i - window + 1:i + 1]}), 0)
+        mid = expected['slope'] * (window - 1) + expected['intercept']
+        assert bands['slope'][i] == pytest.approx(expected['slope'], rel=1e-9)
+        assert bands['mid'][i] == pytest.approx(mid, rel=1e-9)
+        assert bands['std_dev'][i] == pytest.approx(expected['std_dev'], rel=1e-7)
+        assert bands['upper'][i] == pytest.approx(mid + deviation * expected['std_dev'], rel=1e-9)
+        assert bands['lower'][i] == pytest.approx(mid - deviation * expected['std_dev'], rel=1e-9)
+
+def test_rolling_lrc_rejects_short_window(closes):
+    with pytest.raises(ValueError):
+        rolling_lrc(closes, 1)
@@ -0,0 +1,75 @@
+"""
+MarketDataDaemon serving a ReplayExchange on a temporary port, read by MarketDataClient.
+"""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from market_data_client import MarketDataClient
+from market_data_daemon import MarketDataDaemon, ReplayExchange
+
+MINUTE_MS = 60_000
+T0 = 1_779_999_960_000 # On a minute boundary
+SPEED = 120 # A replay minute takes half a second
+HISTORY_TRADES = [{'timestamp': T0 - k * MINUTE_MS + offset, 'price': 90.0 + k + step, 'amount': 1.0}
+                  for k in (5, 4, 3, 2, 1) for step, offset in ((0, 10_000), (5, 30_000))]
+LIVE_TRADES = [{'timestamp': T0 + 20_000, 'price': 100.0, 'amount': 1.0},
+               {'timestamp': T0 + 40_000, 'price': 104.0, 'amount': 2.0},
+               # Nothing trades in the minute from T0 + 1m
+               {'timestamp': T0 + 2 * MINUTE_MS + 20_000, 'price': 101.0, 'amount': 1.0}]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def address():
+    address = f'127.0.0.1:{free_port()}'
+    replay = ReplayExchange(HISTORY_TRADES + LIVE_TRADES, speed=SPEED, start_ms=T0)
+    daemon = MarketDataDaemon(lambda exchange_id, sandbox: replay, grace_ms=1000, tick_seconds=0.01)
+    loop = asyncio.new_event_loop()
+    server = loop.create_task(daemon.serve(address))
+    thread = threading.Thread(target=loop.run_until_complete, args=(asyncio.gather(server, return_exceptions=True),))
+    thread.start()
+    yield address
+    loop.call_soon_threadsafe(server.cancel)
+    thread.join(5)
+    loop.close()
+
+def connect(address, timeout=5.0):
+    """Subscribes once the daemon's thread has started listening."""
+    client = MarketDataClient(address)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client, client.subscribe('replay', 'XBTUSD', '1m', history=3)
+        except ConnectionRefusedError:
+            client.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+def test_snapshot_then_closed_candles_including_an_empty_bucket(address):
+    client, snapshot = connect(address)
+    try:
+        # The last three complete minutes of history, two trades each
+        assert snapshot == [[T0 - k * MINUTE_MS, 90.0 + k, 95.0 + k, 90.0 + k, 95.0 + k, 2.0] for k in (3, 2, 1)]
+
+        closed = []
+        while len(closed) < 3:
+            message = client.wait_for_close(timeout=5)
+            assert message is not None, f"only {len(closed)} candles closed"
+            key, candle = message
+            assert key == ('replay', False, 'XBTUSD', '1m')
+            closed.append(candle)
+
+        assert closed == [[T0, 100.0, 104.0, 100.0, 104.0, 3.0],
+                          [T0 + MINUTE_MS, 104.0, 104.0, 104.0, 104.0, 0.0], # Flat at the previous close
+                          [T0 + 2 * MINUTE_MS, 101.0, 101.0, 101.0, 101.0, 1.0]]
+        assert client.candles('replay', 'XBTUSD', '1m') == closed
+    finally:
+        client.close()
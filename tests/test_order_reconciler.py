@@ -0,0 +1,93 @@
+"""
+OrderReconciler against a call-counting fake exchange, over cycles of a drifting channel.
+"""
+import logging
+
+import pytest
+
+from exchange_manager import ExchangeManager
+from fake_exchange import FakeExchange
+from order_reconciler import OrderReconciler, desired_order
+
+TICK_SIZE = 0.5
+TOLERANCE_TICKS = 4
+LOGGER = logging.getLogger('test_order_reconciler')
+
+def make_manager(fake, manager_class=ExchangeManager):
+    class FakeExchangeManager(manager_class):
+        _create_client = staticmethod(lambda *args: fake)
+    return FakeExchangeManager('key', 'secret', 'fake', 'XBTUSD', True, LOGGER)
+
+def entry_grid(mid, levels=5):
+    return [desired_order('entry', 'buy', 100, mid - 50 * level, TICK_SIZE) for level in range(levels)]
+
+def exit_grid(mid):
+    return [desired_order('tp', 'sell', 100, mid + 40, TICK_SIZE, reduce_only=True),
+            desired_order('tp', 'sell', 100, mid + 80, TICK_SIZE, reduce_only=True),
+            desired_order('hsl', 'sell', 200, mid - 300, TICK_SIZE, reduce_only=True, is_stop=True)]
+
+# (desired grid, expected keep/amend/cancel/create, calls with editOrder, calls without)
+CYCLES = [
+    (entry_grid(30000.0), (0, 0, 0, 5), 5, 5),     # Empty book: place the grid
+    (entry_grid(30001.0), (5, 0, 0, 0), 0, 0),     # Drift within the tolerance: nothing to do
+    (entry_grid(30011.0), (0, 5, 0, 0), 5, 10),    # Drift beyond it: move every order
+    (entry_grid(30011.0, 4), (4, 0, 1, 0), 1, 1),  # One level fewer
+    (exit_grid(30020.0), (0, 0, 4, 3), 7, 7),      # Filled: entries make way for the TPs and the HSL
+    (exit_grid(30040.0), (0, 3, 0, 0), 3, 6),      # The exit orders follow the channel
+]
+
+@pytest.mark.parametrize('edit_order', [True, False])
+def test_drifting_channel_cycles(edit_order):
+    fake = FakeExchange(edit_order=edit_order)
+    reconciler = OrderReconciler(make_manager(fake), TICK_SIZE, TOLERANCE_TICKS, LOGGER)
+    total_calls = replace_all_calls = 0
+
+    for desired, split, calls_with_edit, calls_without_edit in CYCLES:
+        live = list(fake.orders.values())
+        expected_calls = calls_with_edit if edit_order else calls_without_edit
+        before = fake.order_calls()
+
+        plan = reconciler.reconcile(desired, [dict(order) for order in live])
+
+        assert tuple(len(plan[key]) for key in ('keep', 'amend', 'cancel', 'create')) == split
+        assert reconciler.api_calls(plan) == expected_calls
+        assert fake.order_calls() - before == expected_calls
+        total_calls += expected_calls
+        replace_all_calls += (1 if live else 0) + len(desired)
+
+        # The book now holds the desired grid, kept orders within the tolerance of their target
+        book = sorted((o['side'], o['reduceOnly'], o['amount'], o['stopPrice'] or o['price']) for o in fake.orders.values())
+        wanted = sorted((o['side'], o['reduce_only'], o['amount'], o['price']) for o in desired)
+        assert [order[:3] for order in book] == [order[:3] for order in wanted]
+        assert all(abs(live_order[3] - order[3]) <= TOLERANCE_TICKS * TICK_SIZE for live_order, order in zip(book, wanted))
+
+    assert total_calls == (21 if edit_order else 29)
+    assert replace_all_calls == 30
+    assert fake.calls['edit_order'] == (8 if edit_order else 0)
+
+def test_plan_keeps_orders_within_tolerance_only():
+    reconciler = OrderReconciler(make_manager(FakeExchange()), TICK_SIZE, TOLERANCE_TICKS, LOGGER)
+    live = [{'id': '1', 'side': 'buy', 'price': 30000.0, 'amount': 100, 'reduceOnly': False},
+            {'id': '2', 'side': 'buy', 'price': 29900.0, 'amount': 100, 'reduceOnly': False}]
+    desired = [desired_order('entry', 'buy', 100, 30002.0, TICK_SIZE),  # 4 ticks away: kept
+               desired_order('entry', 'buy', 100, 29897.5, TICK_SIZE)]  # 5 ticks away: amended
+    plan = reconciler.plan(desired, live)
+    assert [order['id'] for order in plan['keep']] == ['1']
+    assert [(order['id'], wanted['price']) for order, wanted in plan['amend']] == [('2', 29897.5)]
+
+def test_plan_never_matches_across_sides_kinds_or_reduce_only():
+    reconciler = OrderReconciler(make_manager(FakeExchange()), TICK_SIZE, TOLERANCE_TICKS, LOGGER)
+    live = [{'id': '1', 'side': 'sell', 'price': 30000.0, 'amount': 100, 'reduceOnly': False}]
+    desired = [desired_order('tp', 'sell', 100, 30000.0, TICK_SIZE, reduce_only=True)]
+    plan = reconciler.plan(desired, live)
+    assert (len(plan['keep']), len(plan['amend']), len(plan['cancel']), len(plan['create'])) == (0, 0, 1, 1)
+
+def test_reconcile_leaves_the_grid_when_open_orders_cannot_be_fetched():
+    fake = FakeExchange()
+    def fetch_open_orders(*args, **kwargs):
+        raise ConnectionError("timeout")
+    fake.fetch_open_orders = fetch_open_orders
+    reconciler = OrderReconciler(make_manager(fake), TICK_SIZE, TOLERANCE_TICKS, LOGGER)
+    plan = reconciler.reconcile(entry_grid(30000.0))
+    assert plan == {'keep': [], 'amend': [], 'cancel': [], 'create': []}
+    assert fake.order_calls() == 0